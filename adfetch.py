@@ -0,0 +1,182 @@
+"""广告数据和图片的网络请求：共享连接池 + 磁盘缓存（不依赖 Qt）"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+AD_API_URL = os.environ.get("IMGCOMP_AD_API_URL",
+                            "http://www.firemail.wang:8880/api/admin/api/record/fetch")
+AD_REQUEST_BODY = {
+    "classId": 1274,
+    "syncTime": 1519297787000
+}
+# 不能放在 ResultCache 的目录（~/.imgcomp_cache）里，否则会被计入压缩缓存的大小
+AD_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".imgcomp_http_cache")
+AD_LIST_TTL = 10 * 60  # 广告列表缓存有效期（秒）
+AD_IMAGE_TTL = 24 * 60 * 60  # 广告图片缓存有效期（秒）
+REQUEST_TIMEOUT = 10
+POOL_SIZE = 4
+
+
+class FetchError(Exception):
+    """网络请求失败且没有可用的缓存"""
+
+
+class CachedFetcher:
+    """带磁盘缓存的 HTTP 客户端，所有请求共用一个 keep-alive 的 Session
+
+    缓存在 ttl 秒内直接返回；过期后带 If-None-Match / If-Modified-Since
+    重新验证，304 时继续使用缓存。网络不可用时返回过期的缓存。
+    传入 validate 时，响应只有通过检查才写入缓存，不会覆盖之前可用的缓存。
+    线程安全，可在多个工作线程中同时使用。
+    """
+
+    def __init__(self, cache_dir=AD_CACHE_DIR, timeout=REQUEST_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+
+    def _key(self, method, url, body):
+        raw = json.dumps([method, url, body], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".body", base + ".json"
+
+    def _load(self, key):
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return f.read(), meta
+        except (OSError, ValueError):
+            return None, None
+
+    def _store(self, key, content, meta):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        body_path, meta_path = self._paths(key)
+        with self._lock:
+            for path, data, mode in ((body_path, content, "wb"),
+                                     (meta_path, json.dumps(meta).encode("utf-8"), "wb")):
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, mode) as f:
+                    f.write(data)
+                os.replace(tmp, path)
+
+    def cached(self, url, body=None, method="GET"):
+        """只读缓存，不访问网络；没有缓存时返回 None"""
+        content, _ = self._load(self._key(method, url, body))
+        return content
+
+    def fetch(self, url, body=None, method="GET", ttl=0, validate=None):
+        """返回 (内容, 是否来自缓存)；网络失败且无缓存时抛出 FetchError
+
+        validate(内容) 对无效的响应抛出 FetchError，这时返回过期的缓存，没有缓存时抛出该异常。
+        """
+        key = self._key(method, url, body)
+        content, meta = self._load(key)
+        if content is not None and time.time() - meta.get("fetched_at", 0) < ttl:
+            return content, True
+
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            response = self.session.request(method, url, json=body, headers=headers,
+                                            timeout=self.timeout)
+            if response.status_code == 304 and content is not None:
+                meta["fetched_at"] = time.time()
+                self._store(key, content, meta)
+                return content, True
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if content is not None:
+                return content, True
+            raise FetchError(f"网络请求失败: {str(e)}")
+
+        if validate is not None:
+            try:
+                validate(response.content)
+            except FetchError:
+                if content is not None:
+                    return content, True
+                raise
+        self._store(key, response.content, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        })
+        return response.content, False
+
+    def close(self):
+        self.session.close()
+
+
+class WorkerPool:
+    """固定数量的后台线程执行网络任务
+
+    使用守护线程，退出程序时不会等待还没返回的请求。
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        self._tasks = queue.Queue()
+        for i in range(size):
+            threading.Thread(target=self._worker, name=f"fetch-{i}", daemon=True).start()
+
+    def _worker(self):
+        while True:
+            fn, args = self._tasks.get()
+            try:
+                fn(*args)
+            except Exception:
+                pass  # 任务自己负责报告错误
+
+    def submit(self, fn, *args):
+        self._tasks.put((fn, args))
+
+
+def parse_ad_list(content):
+    """解析广告接口的响应，返回 dataList；接口报错时抛出 FetchError"""
+    try:
+        result = json.loads(content)
+    except ValueError as e:
+        raise FetchError(f"获取广告数据失败: {str(e)}")
+    if result.get("code") == 0 and "data" in result:
+        return result["data"].get("dataList", [])
+    raise FetchError(f"API返回错误: {result.get('msg', '未知错误')}")
+
+
+def cached_ad_list(fetcher):
+    """离线时立即可用的广告列表，没有缓存时返回 None"""
+    content = fetcher.cached(AD_API_URL, AD_REQUEST_BODY, "POST")
+    if content is None:
+        return None
+    try:
+        return parse_ad_list(content)
+    except FetchError:
+        return None
+
+
+def fetch_ad_list(fetcher):
+    content, _ = fetcher.fetch(AD_API_URL, AD_REQUEST_BODY, "POST", AD_LIST_TTL, parse_ad_list)
+    return parse_ad_list(content)
+
+
+def fetch_ad_image(fetcher, url):
+    content, _ = fetcher.fetch(url, ttl=AD_IMAGE_TTL)
+    return content
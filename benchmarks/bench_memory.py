@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""大图输入路径的峰值内存（RSS）测试
+
+生成一张大尺寸图片，用内置 Pillow 引擎（开启结果缓存，包含哈希和预检）
+按不同模式压缩，每次在单独的子进程中运行并报告峰值 RSS 和耗时。
+
+    python benchmarks/bench_memory.py                      # 默认 6000x4000 PNG 与 JPEG
+    python benchmarks/bench_memory.py --size 8000 6000 --json result.json
+
+需要 Pillow，不支持 Windows（依赖 resource 模块）。
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imgcomp import ResultCache, compress_file  # noqa: E402
+
+MODES = {
+    "quality": {"quality": 80},
+    "target_size": {"target_size": None},  # 运行时取原图的 1/4
+    "webp": {"quality": 80, "webp": True, "webp_quality": 80},
+}
+
+
+def generate_image(path, size, fmt):
+    from PIL import Image
+
+    red = Image.linear_gradient("L").resize(size)
+    green = Image.radial_gradient("L").resize(size)
+    blue = Image.effect_noise(size, 30)
+    image = Image.merge("RGB", (red, green, blue))
+    image.save(path, fmt, quality=95)
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_worker(input_file, mode):
+    params = dict(MODES[mode])
+    if "target_size" in params:
+        params["target_size"] = os.path.getsize(input_file) // 4 // 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, "out" + (".webp" if params.get("webp") else os.path.splitext(input_file)[1]))
+        start = time.perf_counter()
+        result = compress_file(input_file, output_file, cache=ResultCache(os.path.join(tmp, "cache")),
+                               backend="pillow", preflight=False, min_saving=None, **params)
+        elapsed = time.perf_counter() - start
+    if not result.success:
+        raise RuntimeError(result.message)
+    return {"file": os.path.basename(input_file), "mode": mode, "seconds": elapsed,
+            "attempts": result.attempts, "peak_rss_mb": peak_rss_mb()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="大图输入路径的峰值内存测试")
+    parser.add_argument("--size", type=int, nargs=2, default=(6000, 4000), metavar=("W", "H"))
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)  # 内部使用：文件 模式
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(*args.worker)))
+        return 0
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = []
+        for ext, fmt in (("png", "PNG"), ("jpg", "JPEG")):
+            path = os.path.join(tmp, f"scan.{ext}")
+            print(f"生成 {args.size[0]}x{args.size[1]} {fmt}...", file=sys.stderr)
+            generate_image(path, tuple(args.size), fmt)
+            inputs.append(path)
+
+        print(f"{'file':<10}{'mode':<13}{'size MB':>9}{'attempts':>10}{'seconds':>9}{'peak MB':>9}")
+        for path in inputs:
+            for mode in args.modes:
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", path, mode],
+                                      capture_output=True, text=True)
+                if proc.returncode != 0:
+                    print(f"{os.path.basename(path):<10}{mode:<13}失败: {proc.stderr.strip().splitlines()[-1:]}")
+                    continue
+                stats = json.loads(proc.stdout.strip().splitlines()[-1])
+                stats["input_mb"] = os.path.getsize(path) / (1024 * 1024)
+                results.append(stats)
+                print(f"{stats['file']:<10}{mode:<13}{stats['input_mb']:>9.1f}{stats['attempts']:>10}"
+                      f"{stats['seconds']:>9.2f}{stats['peak_rss_mb']:>9.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""压缩流水线基准测试
+
+生成一组合成图片（不同尺寸和格式），对每种压缩模式完整计时：
+命令构造、子进程启动、编码、预览加载。输出每秒图片数、p50/p95 延迟
+和峰值内存（RSS）。
+
+    python benchmarks/bench_pipeline.py --backend fake        # 使用替身脚本，CI 可用
+    python benchmarks/bench_pipeline.py --backend exe         # 真实 imagecomp.exe
+    python benchmarks/bench_pipeline.py --backend pillow --json result.json
+
+每种模式在单独的子进程中运行，峰值 RSS 互不影响。生成图片需要 Pillow。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imgcomp import (build_imagecomp_command, default_output_name, get_backend,  # noqa: E402
+                     list_image_files, run_imagecomp)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FAKE_IMAGECOMP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_imagecomp.py")
+CORPUS_SIZES = [(320, 240), (1280, 960), (4000, 3000)]
+CORPUS_FORMATS = [("jpg", "JPEG"), ("png", "PNG"), ("webp", "WEBP")]
+PREVIEW_SIZE = (200, 150)  # 与 GUI 预览标签的最小尺寸一致
+
+MODES = {
+    "quality": {"quality": 80},
+    "target_size": {"target_size": 100},
+    "size_range": {"size_range": (50, 200)},
+    "webp": {"quality": 80, "webp": True, "webp_quality": 80},
+}
+
+
+def generate_corpus(directory, count, seed=0):
+    """生成 count 张合成图片：渐变 + 噪声，尺寸与格式轮换"""
+    from PIL import Image
+
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        width, height = CORPUS_SIZES[i % len(CORPUS_SIZES)]
+        ext, fmt = CORPUS_FORMATS[(i // len(CORPUS_SIZES)) % len(CORPUS_FORMATS)]
+        path = os.path.join(directory, f"img_{i:04d}_{width}x{height}.{ext}")
+        if os.path.exists(path):
+            continue
+        size = (width, height)
+        red = Image.linear_gradient("L").rotate((seed + i) * 37 % 360).resize(size)
+        green = Image.radial_gradient("L").resize(size)
+        blue = Image.effect_noise(size, 40 + i % 5 * 10)
+        image = Image.merge("RGB", (red, green, blue))
+        image = Image.blend(image, Image.effect_noise(size, 60).convert("RGB"), 0.15)
+        image.save(path, fmt, quality=95)
+    return list_image_files(directory)
+
+
+def make_preview_loader():
+    """与 GUI 相同的缩放解码预览；没有 PySide6 时用 Pillow 的 draft 模式代替"""
+    try:
+        from PySide6.QtCore import QCoreApplication, QSize, Qt
+        from PySide6.QtGui import QImageReader
+    except ImportError:
+        from PIL import Image
+
+        def load(path):
+            with Image.open(path) as img:
+                img.draft("RGB", PREVIEW_SIZE)
+                img.thumbnail(PREVIEW_SIZE)
+                return img.size
+        return load
+
+    if QCoreApplication.instance() is None:
+        QCoreApplication([])  # 加载图片格式插件
+    target = QSize(*PREVIEW_SIZE)
+
+    def load(path):
+        reader = QImageReader(path)
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(size.scaled(target, Qt.KeepAspectRatio))
+        image = reader.read()
+        return image.width(), image.height()
+    return load
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def peak_rss_mb(who):
+    """峰值 RSS（MB），Linux 下 ru_maxrss 单位为 KB，macOS 为字节"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_mode(corpus, mode, backend, executable, workers, output_dir):
+    """在当前进程中跑一种模式，返回统计结果"""
+    params = MODES[mode]
+    use_subprocess = backend in ("fake", "exe")
+    engine = None if use_subprocess else get_backend(backend)
+    load_preview = make_preview_loader()
+
+    def job(input_file):
+        output_file = os.path.join(output_dir, default_output_name(input_file, params.get("webp", False)))
+        timing = {"command": 0.0, "spawn": 0.0}
+        start = time.perf_counter()
+        if use_subprocess:
+            cmd = build_imagecomp_command(
+                input_file, output_file, params.get("quality"), params.get("webp", False),
+                params.get("target_size"), params.get("size_range"),
+                params.get("webp_quality", 100), executable
+            )
+            timing["command"] = time.perf_counter() - start
+            result = run_imagecomp(cmd)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip())
+            timing["spawn"] = result.spawn_time
+        else:
+            engine.compress(input_file, output_file, **params)
+        encoded = time.perf_counter()
+        timing["encode"] = encoded - start - timing["command"] - timing["spawn"]
+        load_preview(output_file)
+        timing["preview"] = time.perf_counter() - encoded
+        timing["total"] = time.perf_counter() - start
+        return timing
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        timings = list(executor.map(job, corpus))
+    wall = time.perf_counter() - start
+
+    totals = [t["total"] for t in timings]
+    return {
+        "mode": mode,
+        "backend": backend,
+        "images": len(timings),
+        "workers": workers,
+        "images_per_sec": len(timings) / wall if wall else 0.0,
+        "p50_ms": percentile(totals, 50) * 1000,
+        "p95_ms": percentile(totals, 95) * 1000,
+        "phases_ms": {
+            phase: statistics.median(t[phase] for t in timings) * 1000
+            for phase in ("command", "spawn", "encode", "preview")
+        },
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "child_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+    }
+
+
+def format_row(stats):
+    phases = stats["phases_ms"]
+    rss = "n/a" if stats["peak_rss_mb"] is None else f"{stats['peak_rss_mb']:.0f}/{stats['child_peak_rss_mb']:.0f}"
+    return (f"{stats['mode']:<12}{stats['images_per_sec']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+            f"{phases['command']:>8.2f}{phases['spawn']:>8.2f}{phases['encode']:>9.1f}{phases['preview']:>9.1f}"
+            f"{rss:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="压缩流水线基准测试")
+    parser.add_argument("--backend", choices=["fake", "exe", "pillow"], default="fake",
+                        help="fake 使用替身脚本，exe 使用 imagecomp.exe，pillow 为内置编码器")
+    parser.add_argument("--executable", help="exe 模式下 imagecomp 的路径，默认同 GUI")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--count", type=int, default=18, help="合成图片数量")
+    parser.add_argument("--corpus", help="图片目录，默认在临时目录中生成")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--worker-mode", help=argparse.SUPPRESS)  # 内部使用：在子进程中跑单个模式
+    args = parser.parse_args(argv)
+
+    executable = args.executable
+    if args.backend == "fake":
+        executable = FAKE_IMAGECOMP
+
+    if args.worker_mode:
+        corpus = list_image_files(args.corpus)
+        with tempfile.TemporaryDirectory() as output_dir:
+            stats = run_mode(corpus, args.worker_mode, args.backend, executable, args.workers, output_dir)
+        print(json.dumps(stats))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus or os.path.join(tmp, "corpus")
+        if not args.corpus:
+            print(f"生成 {args.count} 张合成图片...", file=sys.stderr)
+            generate_corpus(corpus_dir, args.count)
+
+        print(f"backend={args.backend} workers={args.workers} images={len(list_image_files(corpus_dir))}")
+        print(f"{'mode':<12}{'img/s':>9}{'p50ms':>9}{'p95ms':>9}{'cmd':>8}{'spawn':>8}"
+              f"{'encode':>9}{'preview':>9}{'rssMB s/c':>12}")
+        results = []
+        for mode in args.modes:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker-mode", mode,
+                   "--backend", args.backend, "--corpus", corpus_dir, "-j", str(args.workers)]
+            if args.executable:
+                cmd.extend(["--executable", args.executable])
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{mode:<12}失败: {proc.stderr.strip().splitlines()[-1:]}")
+                continue
+            stats = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(stats)
+            print(format_row(stats))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
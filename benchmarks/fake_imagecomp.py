@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""imagecomp.exe 的替身，用于在没有真实可执行文件的环境（如 Linux CI）中跑基准
+
+接受与 imagecomp.exe 相同的参数，把输入原样复制到输出，
+可用 --delay 模拟编码耗时（也可通过环境变量 FAKE_IMAGECOMP_DELAY 设置）。
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="fake_imagecomp")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("-q", type=int)
+    parser.add_argument("--webp", action="store_true")
+    parser.add_argument("--webp-quality", type=int)
+    parser.add_argument("-t", type=int)
+    parser.add_argument("-s", type=int, nargs=2)
+    parser.add_argument("--delay", type=float,
+                        default=float(os.environ.get("FAKE_IMAGECOMP_DELAY", "0")))
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.output) and not args.force:
+        print(f"输出文件已存在: {args.output}", file=sys.stderr)
+        return 1
+    if args.delay:
+        time.sleep(args.delay)
+    shutil.copyfile(args.input, args.output)
+    print(f"{args.input} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""图片压缩核心库，可在没有 PySide6 的环境下使用
+
+    from imgcomp import compress_file
+    result = compress_file("a.jpg", "a_compressed.jpg", quality=80)
+"""
+from .core import (IMAGE_EXTENSIONS, MODE_QUALITY, MODE_TARGET_SIZE, MODE_SIZE_RANGE, MODE_VISUAL,
+                   CompressResult, OutputClaims, compress_file, compress_files, list_image_files,
+                   default_output_name, params_from_settings, load_settings)
+from .process import (JobCancelled, get_imagecomp_path, build_imagecomp_command, run_imagecomp,
+                      run_imagecomp_async)
+from .backends import (AUTO_BACKEND, BACKENDS, Backend, CompressionError, EncodeStats,
+                       ExecutableBackend, PillowBackend, get_backend)
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResultCache
+from .metrics import DEFAULT_METRICS_FILE, MetricsRecorder
+from .search import DEFAULT_MIN_SSIM
+from .header import ImageHeader, read_header, read_headers
+from .jobs import DEFAULT_JOURNAL_FILE, JOURNAL_FILE_NAME, Job, JobQueue, run_queue
+from .aiorunner import compress_file_async, compress_files_async, compress_files_ordered
+from .scan import ScanFeed, iter_images, parse_patterns
+from .shard import DEFAULT_LEASE_TTL, ShardWorker, submit as shard_submit, status as shard_status
+from .variants import (DEFAULT_FORMATS, DEFAULT_NAME_TEMPLATE, DEFAULT_WIDTHS, check_template,
+                       compress_variants, compress_variant_files, parse_formats, parse_widths)
+
+__all__ = [
+    "IMAGE_EXTENSIONS", "MODE_QUALITY", "MODE_TARGET_SIZE", "MODE_SIZE_RANGE", "MODE_VISUAL",
+    "CompressResult", "OutputClaims", "JobCancelled", "get_imagecomp_path",
+    "build_imagecomp_command", "run_imagecomp", "run_imagecomp_async", "compress_file",
+    "compress_files", "list_image_files",
+    "default_output_name", "params_from_settings", "load_settings",
+    "DEFAULT_CACHE_DIR", "DEFAULT_MAX_BYTES", "ResultCache",
+    "AUTO_BACKEND", "BACKENDS", "Backend", "CompressionError", "ExecutableBackend",
+    "PillowBackend", "get_backend", "EncodeStats",
+    "DEFAULT_METRICS_FILE", "MetricsRecorder",
+    "DEFAULT_MIN_SSIM", "ImageHeader", "read_header", "read_headers",
+    "DEFAULT_JOURNAL_FILE", "JOURNAL_FILE_NAME", "Job", "JobQueue", "run_queue",
+    "compress_file_async", "compress_files_async", "compress_files_ordered",
+    "ScanFeed", "iter_images", "parse_patterns",
+    "DEFAULT_LEASE_TTL", "ShardWorker", "shard_submit", "shard_status",
+    "DEFAULT_WIDTHS", "DEFAULT_FORMATS", "DEFAULT_NAME_TEMPLATE", "compress_variants",
+    "compress_variant_files", "parse_widths", "parse_formats", "check_template",
+]
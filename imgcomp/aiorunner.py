@@ -0,0 +1,202 @@
+"""asyncio 运行器：一个线程中的事件循环驱动大量并发的 imagecomp.exe 子进程
+
+子进程的输出管道和超时都由事件循环处理，不再为每个任务占用一个线程（Windows
+和 Python 3.12 起的 Linux 上连等待子进程退出也不需要线程）。同时运行的任务数由信号量限制，
+结果按输入顺序产出；调用方还没有取走的结果最多积压 window 个，之后不再启动
+新任务（背压）。Pillow 引擎在进程内编码，仍由线程池执行。
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .backends import get_backend
+from .core import (CompressResult, _batch_claims, _bind_output, _claimed_result,
+                   _effective_params, _error_result, _finish, _fix_extension, _prepare,
+                   _reuse_result, compress_file)
+from .dedup import group_duplicates
+from .mapped import MappedFile
+from .preflight import DEFAULT_MIN_SAVING
+from .process import POLL_INTERVAL
+
+WINDOW_FACTOR = 4  # window 默认为并发数的这么多倍
+
+
+def _prepare_file(input_file, *args):
+    with MappedFile(input_file) as source:
+        result, key = _prepare(source, input_file, *args)
+        return result, key, source.size
+
+
+async def compress_file_async(input_file, output_file, quality=None, webp=False,
+                              target_size=None, size_range=None, webp_quality=100, cache=None,
+                              on_output=None, timeout=None, cancel_event=None, backend=None,
+                              queued_at=None, preflight=True, min_saving=DEFAULT_MIN_SAVING,
+                              min_ssim=None, auto_format=False, executor=None, claims=None):
+    """compress_file 的 asyncio 版本，参数和返回值相同，不抛出异常（取消任务时抛出 CancelledError）
+
+    imagecomp.exe 子进程由事件循环直接管理；预检、哈希、缓存读写以及 Pillow 等
+    没有 compress_async 的引擎在 executor（默认为事件循环的默认线程池）中执行。
+    """
+    loop = asyncio.get_running_loop()
+    engine = get_backend(backend, visual=min_ssim is not None)
+    if not hasattr(engine, "compress_async"):
+        return await loop.run_in_executor(executor, partial(
+            compress_file, input_file, output_file, quality, webp, target_size, size_range,
+            webp_quality, cache, on_output, timeout, cancel_event, engine, queued_at, preflight,
+            min_saving, min_ssim, auto_format, claims))
+
+    start = time.perf_counter()
+    queue_wait = start - queued_at if queued_at is not None else 0.0
+    if cancel_event is not None and cancel_event.is_set():
+        return CompressResult(input_file, output_file, False, "已取消", queue_wait=queue_wait)
+    quality, webp, target_size, size_range = _effective_params(quality, webp, target_size,
+                                                               size_range, min_ssim, auto_format)
+    try:
+        result, key, original_size = await loop.run_in_executor(executor, partial(
+            _prepare_file, input_file, output_file, quality, webp, target_size, size_range,
+            webp_quality, cache, engine, preflight, min_saving, min_ssim, auto_format, start,
+            queue_wait))
+        if result is None:
+            encode_start = time.perf_counter()
+            stats = await engine.compress_async(input_file, output_file, quality, webp,
+                                                target_size, size_range, webp_quality, on_output,
+                                                timeout, min_ssim, auto_format)
+            result = await loop.run_in_executor(executor, partial(
+                _finish, stats, key, cache, input_file, output_file, original_size, webp,
+                min_saving, start, queue_wait, time.perf_counter() - encode_start))
+        if auto_format:
+            _fix_extension(result, claims)
+        return result
+    except Exception as e:
+        return _error_result(e, input_file, output_file, timeout, start, queue_wait)
+
+
+async def compress_files_async(jobs, quality=None, webp=False, target_size=None,
+                               size_range=None, webp_quality=100, workers=None, cache=None,
+                               on_output=None, timeout=None, cancel_event=None, backend=None,
+                               preflight=True, min_saving=DEFAULT_MIN_SAVING, min_ssim=None,
+                               dedup=True, auto_format=False, window=None):
+    """compress_files 的 asyncio 版本（异步生成器），按 jobs 的顺序产出 CompressResult
+
+    workers 为同时运行的任务数，默认为 CPU 核数；window 为已启动但还没有产出的
+    任务数上限，默认为 workers 的 WINDOW_FACTOR 倍。jobs 可以是边扫描边产生的迭代器，
+    在线程中读取，不阻塞事件循环（去重时会先全部读入，这时应传入 dedup=False）。cancel_event 被设置后，运行中的子进程被终止，
+    其余任务返回“已取消”。
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    window = max(workers, window or workers * WINDOW_FACTOR)
+    backend = get_backend(backend, visual=min_ssim is not None)
+    cancel_event = cancel_event or threading.Event()
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(workers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()  # (任务, asyncio.Task)，按输入顺序
+    slots = asyncio.Semaphore(window)
+    fed = asyncio.Event()  # pending 增加或 jobs 读完时设置
+    feeding = [True]
+
+    async def run(input_file, output_file):
+        queued_at = time.perf_counter()
+        try:
+            async with semaphore:
+                return await compress_file_async(
+                    input_file, output_file, quality, webp, target_size, size_range,
+                    webp_quality, cache, _bind_output(on_output, input_file), timeout,
+                    cancel_event, backend, queued_at, preflight, min_saving, min_ssim,
+                    auto_format, executor, claims)
+        except asyncio.CancelledError:
+            return CompressResult(input_file, output_file, False, "已取消",
+                                  queue_wait=time.perf_counter() - queued_at)
+
+    async def watch_cancel():
+        while not cancel_event.is_set():
+            await asyncio.sleep(POLL_INTERVAL)
+        for _, task in pending:
+            task.cancel()
+
+    async def feed(jobs, lazy):
+        # 惰性的 jobs（例如仍在扫描的目录）在线程中读取，等待下一个任务时不阻塞事件循环
+        try:
+            while True:
+                await slots.acquire()
+                if lazy:
+                    job = await loop.run_in_executor(None, next, jobs, None)
+                else:
+                    job = next(jobs, None)
+                if job is None:
+                    break
+                input_file, output_file = job
+                if claims is not None and lazy:
+                    output_file = claims.claim(output_file)
+                pending.append((job, loop.create_task(run(input_file, output_file))))
+                fed.set()
+        finally:
+            feeding[0] = False
+            fed.set()
+
+    watcher = loop.create_task(watch_cancel())
+    feeder = None
+    try:
+        duplicates = {}
+        if dedup:
+            jobs, duplicates = await loop.run_in_executor(executor, group_duplicates, jobs, workers)
+        lazy = not isinstance(jobs, (list, tuple))
+        claims, _ = _batch_claims(jobs, duplicates, auto_format)
+        feeder = loop.create_task(feed(iter(jobs), lazy))
+        while True:
+            while not pending and feeding[0]:
+                fed.clear()
+                await fed.wait()
+            if not pending:
+                break
+            job, task = pending[0]
+            result = _claimed_result(await task, job)
+            pending.popleft()
+            slots.release()
+            yield result
+            for input_file, output_file in duplicates.get(job, ()):
+                yield _reuse_result(result, input_file, output_file, claims)
+        await feeder
+    finally:
+        watcher.cancel()
+        tasks = [watcher] + [task for _, task in pending]
+        if feeder is not None:
+            tasks.append(feeder)
+        for task in tasks[1:]:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        executor.shutdown()
+
+
+async def _next(results):
+    return await results.__anext__()
+
+
+def compress_files_ordered(jobs, **kwargs):
+    """在当前线程新建事件循环运行 compress_files_async，作为普通生成器按输入顺序产出结果
+
+    参数与 compress_files_async 相同，可以代替 compress_files 使用（例如作为
+    run_queue 的 runner）。关闭生成器时终止所有运行中的子进程。
+    """
+    loop = asyncio.new_event_loop()
+    results = compress_files_async(jobs, **kwargs)
+    step = None
+    try:
+        while True:
+            step = loop.create_task(_next(results))
+            try:
+                result = loop.run_until_complete(step)
+            except StopAsyncIteration:
+                return
+            yield result
+    finally:
+        if step is not None and not step.done():
+            step.cancel()
+            loop.run_until_complete(asyncio.gather(step, return_exceptions=True))
+        loop.run_until_complete(results.aclose())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
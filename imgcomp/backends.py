@@ -0,0 +1,479 @@
+"""压缩引擎：外部 imagecomp.exe 或进程内的 Pillow 编码器"""
+import asyncio
+import io
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .process import (JobCancelled, build_imagecomp_command, get_imagecomp_path, run_imagecomp,
+                      run_imagecomp_async)
+from .search import MAX_QUALITY, QualitySearch, VisualSearch, trial_curve
+
+DEFAULT_QUALITY = 80  # 与 GUI 的默认压缩质量一致
+LOSSY_FORMATS = ("JPEG", "WEBP", "PNG")  # 有质量参数的格式
+ANIMATED_FORMATS = ("GIF", "WEBP", "PNG")  # 可以保存动图的格式
+HIGH_BIT_MODES = ("I", "I;16", "I;16B", "I;16L", "I;16N")  # 编码前需要缩放到 8 位的模式
+
+
+class CompressionError(Exception):
+    """压缩失败，异常信息直接显示给用户"""
+
+
+@dataclass
+class EncodeStats:
+    """一次压缩的资源消耗，拿不到的项为 None"""
+    attempts: int = 1
+    spawn_time: float = None  # 创建子进程耗时（秒），进程内编码为 None
+    cpu_time: float = None  # 编码占用的 CPU 时间（秒）
+    peak_rss: int = None  # 子进程峰值内存（字节）
+    quality: int = None  # 最终使用的质量，外部程序搜索时为 None
+    ssim: float = None  # 视觉质量模式下输出与原图的 SSIM
+    format: str = None  # 自动格式模式下选定的输出格式
+
+
+class Backend:
+    """压缩引擎接口
+
+    compress 成功时写出 output_file 并返回 EncodeStats，失败时抛出
+    CompressionError，取消时抛出 JobCancelled，超时抛出 subprocess.TimeoutExpired。
+    min_ssim 不为 None 时为视觉质量模式，只有进程内编码器支持（visual 为 True）。
+    auto_format 为真时尝试多种输出格式，把最小的结果写到 output_file（扩展名不变，
+    由 compress_file 按实际格式修正），忽略 webp。
+    """
+    name = ""
+    label = ""
+    visual = False
+
+    def is_available(self):
+        return True
+
+    def compress(self, input_file, output_file, quality=None, webp=False,
+                 target_size=None, size_range=None, webp_quality=100,
+                 on_output=None, timeout=None, cancel_event=None, source=None, min_ssim=None,
+                 auto_format=False):
+        """source 为输入文件的 MappedFile，进程内编码器可直接读取，不必再次打开文件"""
+        raise NotImplementedError
+
+
+class ExecutableBackend(Backend):
+    """调用 imagecomp.exe 子进程"""
+    name = "exe"
+    label = "imagecomp.exe"
+
+    def __init__(self, executable=None):
+        self.executable = executable
+
+    def is_available(self):
+        return os.path.exists(self.executable or get_imagecomp_path())
+
+    def compress(self, input_file, output_file, quality=None, webp=False,
+                 target_size=None, size_range=None, webp_quality=100,
+                 on_output=None, timeout=None, cancel_event=None, source=None, min_ssim=None,
+                 auto_format=False):
+        if min_ssim is not None:
+            raise CompressionError("视觉质量模式需要使用内置(Pillow)压缩引擎")
+        if auto_format:
+            return self._compress_auto(input_file, output_file, quality, target_size, size_range,
+                                       webp_quality, on_output, timeout, cancel_event)
+        result = self._run(input_file, output_file, quality, webp, target_size, size_range,
+                           webp_quality, on_output, timeout, cancel_event)
+        return EncodeStats(1, result.spawn_time, result.cpu_time, result.peak_rss)
+
+    def _run(self, input_file, output_file, quality, webp, target_size, size_range,
+             webp_quality, on_output, timeout, cancel_event):
+        cmd = build_imagecomp_command(input_file, output_file, quality, webp,
+                                      target_size, size_range, webp_quality, self.executable)
+        if on_output is not None:
+            on_output(f"执行命令: {' '.join(cmd)}")
+        result = run_imagecomp(cmd, on_output, timeout, cancel_event)
+        if result.returncode != 0:
+            raise CompressionError(f"压缩失败: {result.stderr.strip()}")
+        return result
+
+    def _compress_auto(self, input_file, output_file, quality, target_size, size_range,
+                       webp_quality, on_output, timeout, cancel_event):
+        """同时运行保持原格式和 --webp 两个子进程，保留较小的输出"""
+        candidates = _auto_candidate_files(output_file)
+        try:
+            with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+                futures = {
+                    webp: executor.submit(self._run, input_file, path, quality, webp, target_size,
+                                          size_range, webp_quality, on_output, timeout, cancel_event)
+                    for webp, path in candidates.items()
+                }
+                results = {}
+                errors = []
+                for webp, future in futures.items():
+                    try:
+                        results[webp] = future.result()
+                    except CompressionError as e:
+                        errors.append(str(e))
+            return _keep_smallest_candidate(candidates, results, errors, output_file, on_output)
+        finally:
+            _remove_candidate_files(candidates)
+
+    async def compress_async(self, input_file, output_file, quality=None, webp=False,
+                             target_size=None, size_range=None, webp_quality=100,
+                             on_output=None, timeout=None, min_ssim=None, auto_format=False):
+        """compress 的 asyncio 版本，子进程由 run_imagecomp_async 管理；取消时抛出 asyncio.CancelledError"""
+        if min_ssim is not None:
+            raise CompressionError("视觉质量模式需要使用内置(Pillow)压缩引擎")
+        if not auto_format:
+            result = await self._run_async(input_file, output_file, quality, webp, target_size,
+                                           size_range, webp_quality, on_output, timeout)
+            return EncodeStats(1, result.spawn_time)
+        candidates = _auto_candidate_files(output_file)
+        try:
+            outcomes = await asyncio.gather(*(
+                self._run_async(input_file, path, quality, webp, target_size, size_range,
+                                webp_quality, on_output, timeout)
+                for webp, path in candidates.items()), return_exceptions=True)
+            results = {}
+            errors = []
+            for webp, outcome in zip(candidates, outcomes):
+                if isinstance(outcome, CompressionError):
+                    errors.append(str(outcome))
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    results[webp] = outcome
+            return _keep_smallest_candidate(candidates, results, errors, output_file, on_output)
+        finally:
+            _remove_candidate_files(candidates)
+
+    async def _run_async(self, input_file, output_file, quality, webp, target_size, size_range,
+                         webp_quality, on_output, timeout):
+        cmd = build_imagecomp_command(input_file, output_file, quality, webp,
+                                      target_size, size_range, webp_quality, self.executable)
+        if on_output is not None:
+            on_output(f"执行命令: {' '.join(cmd)}")
+        result = await run_imagecomp_async(cmd, on_output, timeout)
+        if result.returncode != 0:
+            raise CompressionError(f"压缩失败: {result.stderr.strip()}")
+        return result
+
+
+def _auto_candidate_files(output_file):
+    """imagecomp.exe 自动格式模式的临时输出：{是否 --webp: 路径}"""
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(output_dir, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(output_file))
+    tag = f"{os.getpid()}.{threading.get_ident()}"
+    return {
+        False: os.path.join(output_dir, f".{stem}.{tag}.auto{ext}"),
+        True: os.path.join(output_dir, f".{stem}.{tag}.auto.webp"),
+    }
+
+
+def _keep_smallest_candidate(candidates, results, errors, output_file, on_output):
+    """把成功的候选输出中最小的一个移动到 output_file，返回 EncodeStats"""
+    if not results:
+        raise CompressionError(errors[0])
+    webp = min(results, key=lambda w: os.path.getsize(candidates[w]))
+    if on_output is not None:
+        on_output("自动格式: " + ", ".join(
+            f"{'WEBP' if w else '原格式'} {os.path.getsize(candidates[w]) / 1024:.1f} KB"
+            for w in results))
+    os.replace(candidates[webp], output_file)
+    runs = list(results.values())
+    cpu = [r.cpu_time for r in runs if r.cpu_time is not None]
+    rss = [r.peak_rss for r in runs if r.peak_rss is not None]
+    return EncodeStats(len(runs), sum(r.spawn_time for r in runs),
+                       sum(cpu) if cpu else None, max(rss) if rss else None,
+                       format="WEBP" if webp else None)
+
+
+def _remove_candidate_files(candidates):
+    for path in candidates.values():
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _import_pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise CompressionError("内置压缩引擎需要安装 Pillow: pip install Pillow")
+    return Image
+
+
+class PillowBackend(Backend):
+    """进程内的 Pillow 编码器，支持 JPEG、PNG、WebP、GIF、BMP
+
+    参数语义与 imagecomp.exe 一致：-q 为压缩质量，--webp 转为 WebP，
+    -t / -s 用 QualitySearch 搜索满足大小要求的质量。PNG 的质量对应
+    调色板颜色数，质量 100 时无损保存。min_ssim 时用 VisualSearch 查找
+    SSIM 不低于下限的最低质量，需要 NumPy。auto_format 时按 auto_candidates
+    并行编码多种格式，保留满足要求的最小结果。
+    """
+    name = "pillow"
+    label = "内置(Pillow)"
+    visual = True
+
+    def is_available(self):
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def compress(self, input_file, output_file, quality=None, webp=False,
+                 target_size=None, size_range=None, webp_quality=100,
+                 on_output=None, timeout=None, cancel_event=None, source=None, min_ssim=None,
+                 auto_format=False):
+        Image = _import_pillow()
+        deadline = time.monotonic() + timeout if timeout else None
+        cpu_start = time.thread_time()
+
+        def check():
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobCancelled()
+            if deadline is not None and time.monotonic() > deadline:
+                raise subprocess.TimeoutExpired(input_file, timeout)
+
+        with Image.open(source.stream() if source is not None else input_file) as img:
+            img.load()
+            if source is not None:
+                source.release_pages()  # 已解码，编码阶段不再需要原文件
+            fmt = img.format or "PNG"
+            if fmt == "MPO":
+                fmt = "JPEG"
+            candidates = auto_candidates(img, fmt) if auto_format else ("WEBP" if webp else fmt,)
+            reference = None  # 视觉质量模式下原图的 SSIMReference，各候选格式共用
+            if min_ssim is not None and any(c in LOSSY_FORMATS for c in candidates):
+                reference = _ssim_reference(img)
+
+            def solve(fmt, prefix=""):
+                """用 fmt 编码，返回 (质量, 数据, SSIM, 编码次数)"""
+                # 并行的候选格式各用一份副本：save 会把参数写到图像对象上（encoderinfo）
+                image = img.copy() if len(candidates) > 1 else img
+                encoder = _make_encoder(image, fmt)
+                lossy = fmt in LOSSY_FORMATS and not (fmt == "PNG" and is_animated(img))  # APNG 无损保存
+
+                def encode(q):
+                    check()
+                    data = encoder(q)
+                    if on_output is not None:
+                        on_output(f"{prefix}质量 {q}: {len(data) / 1024:.1f} KB")
+                    return data
+
+                if (target_size is not None or size_range is not None) and lossy:
+                    if target_size is not None:
+                        search = QualitySearch(encode, target_size * 1024)
+                    else:
+                        search = QualitySearch(encode, size_range[1] * 1024, size_range[0] * 1024)
+                    check()
+                    search.curve = trial_curve(image, _make_encoder, fmt)
+                    q, data = search.solve()
+                    if on_output is not None:
+                        on_output(f"{prefix}选定质量 {q}, 编码尝试 {search.attempts} 次")
+                    return q, data, None, search.attempts
+                if min_ssim is not None and lossy:
+                    search = VisualSearch(encode, reference.score, min_ssim)
+                    q, data, score = search.solve()
+                    if on_output is not None:
+                        on_output(f"{prefix}选定质量 {q}, SSIM {score:.4f}"
+                                  f"{'' if score >= min_ssim else f'（最高质量也低于 {min_ssim}）'}, "
+                                  f"编码尝试 {search.attempts} 次")
+                    return q, data, score, search.attempts
+                q = quality if quality is not None else DEFAULT_QUALITY
+                if fmt == "WEBP" and (webp or auto_format):
+                    q = min(q, webp_quality) if quality is not None else webp_quality
+                return q, encode(q), None, 1
+
+            pool_cpu = 0.0  # 线程池中编码的 CPU 时间
+            if len(candidates) == 1:
+                fmt = candidates[0]
+                q, data, score, attempts = solve(fmt)
+            else:
+                # 各候选格式共用同一份解码结果并行编码（Pillow 编码时释放 GIL）
+                def timed(fmt):
+                    thread_start = time.thread_time()
+                    return solve(fmt, f"[{fmt}] "), time.thread_time() - thread_start
+
+                with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+                    solved, cpu_times = zip(*executor.map(timed, candidates))
+                pool_cpu = sum(cpu_times)
+                attempts = sum(s[3] for s in solved)
+                best = min(range(len(candidates)),
+                           key=lambda i: _auto_rank(solved[i], target_size, size_range, min_ssim))
+                fmt = candidates[best]
+                q, data, score, _ = solved[best]
+                if on_output is not None:
+                    on_output("自动格式: " + ", ".join(
+                        f"{c} {len(s[1]) / 1024:.1f} KB" for c, s in zip(candidates, solved))
+                        + f"，选用 {fmt}")
+
+        check()
+        _write_atomic(output_file, data)
+        # 进程内编码无法单独统计峰值内存
+        return EncodeStats(attempts, cpu_time=time.thread_time() - cpu_start + pool_cpu,
+                           quality=q, ssim=score,
+                           format=fmt if auto_format else None)
+
+
+def has_transparency(img):
+    """图像是否真的有透明像素（带 alpha 通道但完全不透明时为 False）"""
+    if img.mode in ("RGBA", "LA", "PA"):
+        return img.getchannel("A").getextrema()[0] < 255
+    return "transparency" in img.info
+
+
+def auto_candidates(img, fmt):
+    """自动格式模式的候选格式
+
+    动图保持原格式；有透明像素时不使用 JPEG；原图为 JPEG 时不考虑 PNG
+    （照片转为调色板 PNG 不会更小）。
+    """
+    if getattr(img, "n_frames", 1) > 1:
+        return (fmt,)
+    candidates = [] if has_transparency(img) else ["JPEG"]
+    candidates.append("WEBP")
+    if fmt != "JPEG":
+        candidates.append("PNG")
+    return tuple(candidates)
+
+
+def _auto_rank(solved, target_size, size_range, min_ssim):
+    """候选结果的排序键：先满足大小或 SSIM 要求，再比较大小"""
+    _, data, score, _ = solved
+    size = len(data)
+    if target_size is not None:
+        return size > target_size * 1024, size
+    if size_range is not None:
+        return size > size_range[1] * 1024, size < size_range[0] * 1024, size
+    if min_ssim is not None and score is not None:
+        return score < min_ssim, size
+    return False, size
+
+
+def _ssim_reference(img):
+    try:
+        from .ssim import SSIMReference
+    except ImportError:
+        raise CompressionError("视觉质量模式需要安装 NumPy: pip install numpy")
+    return SSIMReference(img)
+
+
+def is_animated(img):
+    """多帧的 GIF、APNG 或 WebP 动图；MPO 的附加帧不是动画"""
+    return getattr(img, "n_frames", 1) > 1 and img.format != "MPO"
+
+
+def to_8bit(img):
+    """16 位灰度（I;16、I）按 1/256 缩放为 L；直接 convert 会把超过 255 的值截成白色"""
+    if img.mode in HIGH_BIT_MODES:
+        return img.convert("I").point(lambda v: v / 256).convert("L")
+    return img
+
+
+def _make_encoder(img, fmt):
+    """返回 encode(quality) -> memoryview，源图像只解码一次
+
+    直接返回 BytesIO 的缓冲区，不再复制一份 bytes。
+    """
+    save_kwargs = {}
+    if img.info.get("icc_profile"):
+        save_kwargs["icc_profile"] = img.info["icc_profile"]
+    if img.info.get("exif") and fmt in ("JPEG", "WEBP"):
+        save_kwargs["exif"] = img.info["exif"]
+    if is_animated(img):
+        return _make_animated_encoder(img, fmt, save_kwargs)
+    img = to_8bit(img)
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+
+    if fmt == "JPEG":
+        source = img.convert("RGB") if img.mode not in ("RGB", "L", "CMYK") else img
+
+        def encoder(q):
+            buf = io.BytesIO()
+            source.save(buf, "JPEG", quality=q, optimize=True, progressive=True, **save_kwargs)
+            return buf.getbuffer()
+    elif fmt == "WEBP":
+        source = img.convert("RGBA" if has_alpha else "RGB") if img.mode not in ("RGB", "RGBA") else img
+
+        def encoder(q):
+            buf = io.BytesIO()
+            source.save(buf, "WEBP", quality=q, method=4, **save_kwargs)
+            return buf.getbuffer()
+    elif fmt == "PNG":
+        source = img.convert("RGBA" if has_alpha else "RGB") if img.mode not in ("RGB", "RGBA", "L", "P") else img
+
+        def encoder(q):
+            buf = io.BytesIO()
+            if q >= MAX_QUALITY or source.mode == "P":
+                source.save(buf, "PNG", optimize=True, **save_kwargs)
+            else:
+                colors = max(2, round(256 * q / MAX_QUALITY))
+                source.quantize(colors, method=_quantize_method(source)).save(buf, "PNG", optimize=True, **save_kwargs)
+            return buf.getbuffer()
+    else:
+        # GIF/BMP 等没有质量参数的格式只做无损重新保存
+        def encoder(q):
+            buf = io.BytesIO()
+            if fmt == "GIF":
+                img.save(buf, fmt, optimize=True)
+            else:
+                img.save(buf, fmt)
+            return buf.getbuffer()
+    return encoder
+
+
+def _make_animated_encoder(img, fmt, save_kwargs):
+    """动图逐帧保存（save_all）；不支持动画的格式报错，而不是只保留第一帧"""
+    if fmt not in ANIMATED_FORMATS:
+        raise CompressionError(f"动图不能保存为 {fmt}（只会保留第一帧）")
+
+    def encoder(q):
+        buf = io.BytesIO()
+        if fmt == "WEBP":
+            img.save(buf, "WEBP", save_all=True, quality=q, method=4, **save_kwargs)
+        elif fmt == "PNG":
+            img.save(buf, "PNG", save_all=True, optimize=True, **save_kwargs)
+        else:
+            img.save(buf, "GIF", save_all=True, optimize=True)
+        return buf.getbuffer()
+    return encoder
+
+
+def _quantize_method(img):
+    """RGBA 图像只能使用 FASTOCTREE 量化"""
+    from PIL import Image
+    return Image.Quantize.FASTOCTREE if img.mode == "RGBA" else Image.Quantize.MEDIANCUT
+
+
+def _write_atomic(output_file, data):
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(output_dir, exist_ok=True)
+    tmp = os.path.join(output_dir, f".{os.path.basename(output_file)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, output_file)
+
+
+BACKENDS = {
+    ExecutableBackend.name: ExecutableBackend,
+    PillowBackend.name: PillowBackend,
+}
+AUTO_BACKEND = "auto"
+
+
+def get_backend(backend=None, visual=False):
+    """按名称获取压缩引擎；None 或 "auto" 时优先使用 imagecomp.exe，不存在则用 Pillow
+
+    visual 为真（视觉质量模式）时 auto 直接选择 Pillow。
+    """
+    if isinstance(backend, Backend):
+        return backend
+    if backend in (None, AUTO_BACKEND):
+        if visual:
+            return PillowBackend()
+        exe = ExecutableBackend()
+        return exe if exe.is_available() else PillowBackend()
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"未知的压缩引擎: {backend}")
@@ -0,0 +1,143 @@
+"""按输入内容哈希与压缩参数缓存压缩结果"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".imgcomp_cache")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """计算文件内容的 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalize_params(quality, webp, target_size, size_range, webp_quality, backend=None,
+                     min_ssim=None, auto_format=False):
+    """把压缩参数规范化为与输出结果一一对应的元组"""
+    params = (
+        backend,
+        quality,
+        bool(webp),
+        webp_quality if webp else None,
+        target_size,
+        tuple(size_range) if size_range is not None else None,
+    )
+    if min_ssim is not None:  # 只在视觉质量模式下追加，已有的缓存键保持不变
+        params += (min_ssim,)
+    if auto_format:  # 同上，只在自动格式模式下追加
+        params += ("auto", webp_quality)
+    return params
+
+
+class ResultCache:
+    """磁盘上的压缩结果缓存，超过容量时按最近使用时间淘汰
+
+    条目以键名保存为 <目录>/<前两位>/<键>，文件的 mtime 记录最近使用时间。
+    命中时优先硬链接到输出路径，不支持时复制。
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # 键 -> (大小, 最近使用时间)
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        # 只统计 <目录>/<键的前两位>/<键> 布局中的文件，目录里的其他文件不属于缓存
+        for root, _, files in os.walk(self.directory):
+            shard = os.path.relpath(root, self.directory)
+            for name in files:
+                if name.endswith(".tmp") or name[:2] != shard:
+                    continue
+                st = os.stat(os.path.join(root, name))
+                self._entries[name] = (st.st_size, st.st_mtime)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    @property
+    def total_bytes(self):
+        return sum(size for size, _ in self._entries.values())
+
+    def make_key(self, input_file, quality=None, webp=False, target_size=None,
+                 size_range=None, webp_quality=100, backend=None, digest=None, min_ssim=None,
+                 auto_format=False):
+        """digest 为已算好的输入内容 SHA-256，省略时读取 input_file 计算"""
+        params = normalize_params(quality, webp, target_size, size_range, webp_quality, backend,
+                                  min_ssim, auto_format)
+        raw = json.dumps([digest or file_digest(input_file), params])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def fetch(self, key, output_file):
+        """命中时把缓存的结果放到 output_file 并返回 True"""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries or not os.path.exists(path):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return False
+            self.hits += 1
+            os.utime(path)
+            self._entries[key] = (self._entries[key][0], os.path.getmtime(path))
+        
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(output_dir, exist_ok=True)
+        tmp = os.path.join(output_dir, f".{os.path.basename(output_file)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, output_file)
+        return True
+
+    def store(self, key, output_file):
+        """把新生成的输出文件加入缓存，并按需淘汰旧条目"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        os.close(fd)
+        shutil.copyfile(output_file, tmp)
+        shutil.copymode(output_file, tmp)  # mkstemp 创建的文件权限为 0600
+        os.replace(tmp, path)
+        with self._lock:
+            self._entries[key] = (os.path.getsize(path), os.path.getmtime(path))
+            self._evict()
+
+    def _evict(self):
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            del self._entries[key]
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats_text(self):
+        return f"缓存命中 {self.hits} 次, 未命中 {self.misses} 次"
+
+
+def detach_output(output_file):
+    """输出文件与缓存条目或其他输出（去重）硬链接时先断开，避免覆盖写入时改坏它们"""
+    try:
+        if os.stat(output_file).st_nlink > 1:
+            os.remove(output_file)
+    except FileNotFoundError:
+        pass
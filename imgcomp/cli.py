@@ -0,0 +1,455 @@
+"""命令行入口：python -m imgcomp"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict
+
+from .backends import AUTO_BACKEND, BACKENDS
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResultCache
+from .core import (compress_files, default_output_name, list_image_files,
+                   load_settings, params_from_settings)
+from .header import read_headers
+from .aiorunner import compress_files_ordered
+from .jobs import DEFAULT_RETRIES, JobQueue, run_queue
+from .metrics import MetricsRecorder
+from .scan import iter_images
+from .preflight import DEFAULT_MIN_SAVING
+from .search import DEFAULT_MIN_SSIM
+from .shard import DEFAULT_LEASE_TTL, ShardWorker, status as shard_status, submit as shard_submit
+from .variants import (DEFAULT_NAME_TEMPLATE, check_template, compress_variant_files,
+                       parse_formats, parse_widths)
+from .watch import DEFAULT_INTERVAL, STATE_FILE_NAME, FolderWatcher
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="imgcomp",
+        description="图片压缩工具（无界面模式）"
+    )
+    parser.add_argument("inputs", nargs="*", help="图片文件或文件夹")
+    parser.add_argument("-o", "--output", help="输出文件（仅单个输入文件时可用）")
+    parser.add_argument("-d", "--output-dir", help="输出目录，默认为原文件所在目录")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="递归扫描文件夹（跳过隐藏的文件和目录），-d 下保持子目录结构；"
+                             "不使用 --journal 时边扫描边压缩，不做去重")
+    parser.add_argument("--include", action="append", metavar="PATTERN",
+                        help="-r 时只压缩匹配的文件，如 *.jpg 或 photos/*.png（含 / 时匹配相对路径），可重复")
+    parser.add_argument("--exclude", action="append", metavar="PATTERN",
+                        help="-r 时跳过匹配的文件和目录，可重复")
+    parser.add_argument("--min-file-kb", type=float, metavar="KB", help="-r 时跳过小于 KB 的文件")
+    parser.add_argument("--max-file-kb", type=float, metavar="KB", help="-r 时跳过大于 KB 的文件")
+    parser.add_argument("--settings", help="使用 GUI 保存的 settings.json 预设")
+    parser.add_argument("-q", "--quality", type=int, help="压缩质量 1-100")
+    parser.add_argument("--webp", action="store_true", help="转换为WebP格式")
+    parser.add_argument("--webp-quality", type=int, default=None, help="WebP质量 1-100")
+    parser.add_argument("--auto-format", action="store_true",
+                        help="同时编码为多种格式（JPEG、WebP，非 JPEG 原图另加 PNG），保留最小的结果，"
+                             "扩展名随实际格式修正；透明图片不使用 JPEG")
+    parser.add_argument("-t", "--target-size", type=int, help="目标大小(KB)")
+    parser.add_argument("-s", "--size-range", type=int, nargs=2, metavar=("MIN", "MAX"),
+                        help="大小范围(KB)")
+    parser.add_argument("--ssim", type=float, metavar="MIN",
+                        help="视觉质量模式：每张图片使用 SSIM 不低于 MIN 的最低质量"
+                             f"（推荐 {DEFAULT_MIN_SSIM}，需要 Pillow 引擎和 NumPy）")
+    parser.add_argument("--backend", choices=[AUTO_BACKEND, *BACKENDS], default=None,
+                        help="压缩引擎：exe 调用 imagecomp.exe，pillow 为内置编码器，"
+                             "auto（默认）在找不到 imagecomp.exe 时使用 pillow")
+    parser.add_argument("--no-preflight", action="store_true",
+                        help="不做预检：默认已小于目标大小、或 JPEG 质量不高于 -q 的图片直接复制原图")
+    parser.add_argument("--min-saving", type=float, default=None, metavar="PCT",
+                        help=f"输出至少比原图小 PCT%% 才采用，否则保留原图（默认 {DEFAULT_MIN_SAVING:g}，"
+                             "负数表示总是采用压缩结果）")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="不去重：默认内容相同的输入只压缩一次，其余输出硬链接或复制它的结果")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="并行任务数，默认为CPU核数")
+    parser.add_argument("--timeout", type=float, default=None, help="单个任务超时时间(秒)")
+    parser.add_argument("--async", dest="async_runner", action="store_true",
+                        help="用一个 asyncio 事件循环驱动全部 imagecomp 子进程（-j 为同时运行的子进程数），"
+                             "结果按输入顺序输出")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="实时输出 imagecomp 的日志到标准错误")
+    parser.add_argument("--json", action="store_true", help="每个文件输出一行 JSON 结果")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="把每个任务的耗时与资源统计追加到 JSON-lines 文件")
+    parser.add_argument("--info", action="store_true",
+                        help="只读取文件头，列出格式、尺寸、颜色类型和 EXIF 方向，不压缩")
+    parser.add_argument("--watch", action="store_true",
+                        help="监控输入文件夹，持续压缩新增或修改的图片到 -d 指定的目录")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="监控模式的扫描间隔(秒)")
+    parser.add_argument("--state-file", help=f"监控模式的状态文件，默认为输出目录下的 {STATE_FILE_NAME}")
+    parser.add_argument("--journal", metavar="FILE",
+                        help="把任务状态记录到 JSON-lines 日志；中断后用同样的命令重新运行即可继续，"
+                             "已完成的文件不会重复压缩")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="使用 --journal 时失败任务的重试次数（指数退避）")
+    parser.add_argument("--shard-submit", metavar="WORKDIR",
+                        help="不在本机压缩，把任务写入共享目录，由 --shard-worker 领取")
+    parser.add_argument("--shard-worker", metavar="WORKDIR",
+                        help="从共享目录领取任务并压缩，可在多台机器上同时运行")
+    parser.add_argument("--lease-ttl", type=float, default=DEFAULT_LEASE_TTL,
+                        help="分片模式的租约有效期(秒)，worker 停止续约超过这个时间后任务被回收")
+    parser.add_argument("--variants", action="store_true",
+                        help="生成多尺寸版本：源图只解码一次，缩放到 --widths 的各个宽度，"
+                             "以 --formats 的各种格式输出（需要 Pillow，只支持 -q）")
+    parser.add_argument("--widths", nargs="+", default=["320", "640", "1280", "full"],
+                        help="多尺寸版本的宽度，full 为原图宽度，超过原图的宽度跳过")
+    parser.add_argument("--formats", nargs="+", default=["jpeg", "webp"],
+                        help="多尺寸版本的格式：jpeg、webp、png")
+    parser.add_argument("--name-template", default=DEFAULT_NAME_TEMPLATE,
+                        help="多尺寸版本的文件名模板，字段 {stem} {label} {width} {ext} {format}，"
+                             f"默认 {DEFAULT_NAME_TEMPLATE.replace('%', '%%')}")
+    parser.add_argument("--cache", action="store_true", help="启用结果缓存")
+    parser.add_argument("--cache-dir", default=None,
+                        help=f"缓存目录（隐含 --cache），默认 {DEFAULT_CACHE_DIR}")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="缓存容量上限(MB)")
+    return parser
+
+
+def collect_params(args):
+    """合并预设与命令行参数，命令行优先"""
+    params = params_from_settings(load_settings(args.settings)) if args.settings else {
+        "quality": None, "webp": False, "target_size": None,
+        "size_range": None, "webp_quality": 100, "backend": AUTO_BACKEND,
+        "preflight": True, "min_saving": DEFAULT_MIN_SAVING, "min_ssim": None,
+        "auto_format": False,
+    }
+    if (args.quality is not None or args.target_size is not None or args.size_range is not None
+            or args.ssim is not None):
+        params["quality"] = args.quality
+        params["target_size"] = args.target_size
+        params["size_range"] = tuple(args.size_range) if args.size_range else None
+        params["min_ssim"] = args.ssim
+    if params["min_ssim"] is not None and not 0 < params["min_ssim"] < 1:
+        raise ValueError("--ssim 的取值范围为 0-1，例如 0.95")
+    if args.webp:
+        params["webp"] = True
+    if args.webp_quality is not None:
+        params["webp_quality"] = args.webp_quality
+    if args.auto_format:
+        params["auto_format"] = True
+    if args.backend is not None:
+        params["backend"] = args.backend
+    if args.no_preflight:
+        params["preflight"] = False
+    if args.min_saving is not None:
+        params["min_saving"] = None if args.min_saving < 0 else args.min_saving
+    return params
+
+
+def collect_jobs(args, webp):
+    if args.recursive:
+        if args.output:
+            raise ValueError("-o 不能与 -r 一起使用，请使用 -d")
+        jobs = scan_jobs(args, webp)
+        return list(jobs) if args.journal or args.shard_submit else jobs
+    if args.include or args.exclude or args.min_file_kb is not None or args.max_file_kb is not None:
+        raise ValueError("--include/--exclude/--min-file-kb/--max-file-kb 需要与 -r 一起使用")
+    input_files = []
+    for path in args.inputs:
+        if os.path.isdir(path):
+            input_files.extend(list_image_files(path))
+        else:
+            input_files.append(path)
+    
+    if args.output:
+        if len(input_files) != 1:
+            raise ValueError("-o 只能用于单个输入文件，多个文件请使用 -d")
+        return [(input_files[0], args.output)]
+    
+    jobs = []
+    for input_file in input_files:
+        output_dir = args.output_dir or os.path.dirname(os.path.abspath(input_file))
+        jobs.append((input_file, os.path.join(output_dir, default_output_name(input_file, webp))))
+    return jobs
+
+
+def scan_jobs(args, webp):
+    """-r：边扫描边产出 (input_file, output_file)"""
+    def kb(value):
+        return None if value is None else int(value * 1024)
+
+    def on_error(path, error):
+        print(f"无法读取 {path}: {error}", file=sys.stderr, flush=True)
+
+    for root in args.inputs:
+        for input_file, _, _ in iter_images([root], args.include, args.exclude,
+                                            kb(args.min_file_kb), kb(args.max_file_kb),
+                                            on_error=on_error):
+            name = default_output_name(input_file, webp)
+            if not args.output_dir:
+                yield input_file, os.path.join(os.path.dirname(os.path.abspath(input_file)), name)
+                continue
+            output_dir = args.output_dir
+            if os.path.isdir(root):
+                output_dir = os.path.normpath(os.path.join(
+                    output_dir, os.path.relpath(os.path.dirname(input_file), root)))
+                os.makedirs(output_dir, exist_ok=True)
+            yield input_file, os.path.join(output_dir, name)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.shard_worker:
+        return shard_worker(args)
+    if not args.inputs:
+        parser.error("需要指定图片文件或文件夹")
+    if args.watch:
+        return watch(parser, args)
+    if args.info:
+        return show_info(args)
+    if args.variants:
+        return variants(parser, args)
+    try:
+        params = collect_params(args)
+        jobs = collect_jobs(args, params["webp"])
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    
+    if args.shard_submit:
+        count = shard_submit(args.shard_submit, jobs, params)
+        print(f"已提交 {count} 个任务到 {args.shard_submit}", file=sys.stderr)
+        return 0
+    
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    
+    cache = make_cache(args)
+    
+    start = time.perf_counter()
+    streaming = not isinstance(jobs, list)
+    total = None if streaming else len(jobs)
+    failed = 0
+    cancel_event = threading.Event()
+    on_output = None
+    if args.verbose:
+        on_output = lambda input_file, line: print(f"{os.path.basename(input_file)}: {line}",
+                                                   file=sys.stderr, flush=True)
+    metrics = MetricsRecorder(args.metrics, params)
+    runner = compress_files_ordered if args.async_runner else compress_files
+    queue = None
+    if args.journal:
+        queue = JobQueue(args.journal, args.retries)
+        skipped = queue.add(jobs, params)
+        total -= skipped
+        if skipped:
+            print(f"跳过已完成的任务 {skipped} 个", file=sys.stderr)
+        results = run_queue(queue, workers=args.workers, cache=cache, on_output=on_output,
+                            timeout=args.timeout, cancel_event=cancel_event, runner=runner,
+                            dedup=not args.no_dedup, **params)
+    else:
+        results = _untracked(runner(jobs, workers=args.workers, cache=cache,
+                                    on_output=on_output, timeout=args.timeout,
+                                    cancel_event=cancel_event,
+                                    dedup=not args.no_dedup and not streaming, **params))
+    done = 0
+    try:
+        for job, result in results:
+            metrics.add(result)
+            retrying = job is not None and job.will_retry and not cancel_event.is_set()
+            if not retrying:
+                done += 1
+                if not result.success:
+                    failed += 1
+            if args.json:
+                data = result.to_dict()
+                if retrying:
+                    data["retrying"] = True
+                print(json.dumps(data, ensure_ascii=False), flush=True)
+            else:
+                status = "成功" if result.success else ("失败，稍后重试" if retrying else "失败")
+                print(f"[{done}/{total or '?'}] {result.input_file} {status}: {result.summary()} "
+                      f"({result.elapsed:.2f}s)", flush=True)
+                if args.verbose and result.success:
+                    print(f"    {result.metrics_text()}", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        results.close()  # 等待运行中的子进程被终止
+        print("已取消", file=sys.stderr)
+        if queue is not None:
+            queue.close()
+            print(f"任务状态已保存到 {args.journal}，重新运行同样的命令即可继续", file=sys.stderr)
+        return 130
+    if queue is not None:
+        queue.close()
+    if streaming:
+        total = done
+    
+    if not args.json:
+        print(f"完成: 成功 {total - failed} 个, 失败 {failed} 个, 用时 {time.perf_counter() - start:.2f}s",
+              file=sys.stderr)
+        if cache is not None:
+            print(cache.stats_text(), file=sys.stderr)
+        for line in metrics.summary_lines():
+            print(line, file=sys.stderr)
+    return 1 if failed else 0
+
+
+def show_info(args):
+    """--info：并发读取文件头，扩展名与实际格式不符的文件会标出"""
+    start = time.perf_counter()
+    paths = []
+    for path in args.inputs:
+        paths.extend(list_image_files(path) if os.path.isdir(path) else [path])
+    unknown = 0
+    for path, header in read_headers(paths, args.workers or 16):
+        if header is None:
+            unknown += 1
+            if args.json:
+                print(json.dumps({"file": path, "format": None}, ensure_ascii=False))
+            else:
+                print(f"{path}: 无法识别")
+            continue
+        misnamed = not header.extension_matches(path)
+        if args.json:
+            data = asdict(header)
+            data["file"] = path
+            data["misnamed"] = misnamed
+            print(json.dumps(data, ensure_ascii=False))
+        else:
+            width, height = header.display_size
+            text = f"{path}: {header.format} {width}x{height} {header.describe_color()}"
+            if header.orientation != 1:
+                text += f", EXIF 方向 {header.orientation}"
+            if header.jpeg_quality is not None:
+                text += f", 质量约 {header.jpeg_quality}"
+            if misnamed:
+                text += "（扩展名与实际格式不符）"
+            print(text)
+    print(f"共 {len(paths)} 个文件, 无法识别 {unknown} 个, 用时 {time.perf_counter() - start:.2f}s",
+          file=sys.stderr)
+    return 0
+
+
+def variants(parser, args):
+    """--variants：每张图片生成多个宽度和格式的版本"""
+    try:
+        widths = parse_widths(args.widths)
+        formats = parse_formats(args.formats)
+        params = collect_params(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    error = check_template(args.name_template)
+    if error:
+        parser.error(error)
+    if params["target_size"] is not None or params["size_range"] is not None or params["min_ssim"] is not None:
+        parser.error("多尺寸版本只支持 -q 指定质量")
+    input_files = []
+    for path in args.inputs:
+        input_files.extend(list_image_files(path) if os.path.isdir(path) else [path])
+    jobs = [(input_file, args.output_dir or os.path.dirname(os.path.abspath(input_file)))
+            for input_file in input_files]
+    
+    start = time.perf_counter()
+    cancel_event = threading.Event()
+    on_output = None
+    if args.verbose:
+        on_output = lambda input_file, line: print(f"{os.path.basename(input_file)}: {line}",
+                                                   file=sys.stderr, flush=True)
+    results = compress_variant_files(jobs, widths, formats, params["quality"], args.webp_quality,
+                                     args.name_template, args.workers, on_output, cancel_event)
+    outputs = failed = 0
+    try:
+        for done, (input_file, file_results) in enumerate(results, 1):
+            for result in file_results:
+                if result.success:
+                    outputs += 1
+                else:
+                    failed += 1
+                if args.json:
+                    print(json.dumps(result.to_dict(), ensure_ascii=False), flush=True)
+            if not args.json:
+                text = ", ".join(f"{os.path.basename(r.output_file)} {r.compressed_size / 1024:.1f} KB"
+                                 if r.success else r.message for r in file_results)
+                print(f"[{done}/{len(jobs)}] {input_file}: {text}", flush=True)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        results.close()
+        print("已取消", file=sys.stderr)
+        return 130
+    print(f"完成: {len(jobs)} 张图片, 输出 {outputs} 个文件, 失败 {failed} 个, "
+          f"用时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def make_cache(args):
+    if args.cache or args.cache_dir:
+        return ResultCache(args.cache_dir or DEFAULT_CACHE_DIR, args.cache_size * 1024 * 1024)
+    return None
+
+
+def _untracked(results):
+    """不使用任务日志时，与 run_queue 的 (Job, CompressResult) 产出格式保持一致"""
+    try:
+        for result in results:
+            yield None, result
+    finally:
+        results.close()
+
+
+def print_result(result, as_json):
+    if as_json:
+        print(json.dumps(result.to_dict(), ensure_ascii=False), flush=True)
+    else:
+        status = "成功" if result.success else "失败"
+        print(f"{result.input_file} {status}: {result.summary()} ({result.elapsed:.2f}s)", flush=True)
+
+
+def watch(parser, args):
+    """监控模式：未指定 --settings 时使用当前目录的 settings.json"""
+    if not args.output_dir:
+        parser.error("监控模式需要用 -d 指定输出目录")
+    for root in args.inputs:
+        if not os.path.isdir(root):
+            parser.error(f"监控模式的输入必须是文件夹: {root}")
+    if args.settings is None and os.path.exists("settings.json"):
+        args.settings = "settings.json"
+    try:
+        params = collect_params(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    
+    cache = make_cache(args)
+    watcher = FolderWatcher(args.inputs, args.output_dir, params, args.state_file,
+                            args.interval, workers=args.workers, cache=cache,
+                            timeout=args.timeout,
+                            on_result=lambda result: print_result(result, args.json))
+    print(f"正在监控: {', '.join(watcher.roots)} -> {watcher.output_dir}（Ctrl+C 退出）",
+          file=sys.stderr)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+
+def shard_worker(args):
+    """分片模式的 worker：领取共享目录中的任务直到全部完成"""
+    worker = ShardWorker(args.shard_worker, args.workers, args.lease_ttl, make_cache(args),
+                         args.timeout)
+    print(f"worker {worker.worker_id} 开始领取任务: {args.shard_worker}", file=sys.stderr)
+    start = time.perf_counter()
+    cancel_event = threading.Event()
+    processed = failed = 0
+    results = worker.run(cancel_event)
+    try:
+        for result in results:
+            processed += 1
+            if not result.success:
+                failed += 1
+            print_result(result, args.json)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        results.close()
+        print("已取消，未完成的任务会被其他 worker 领取", file=sys.stderr)
+        return 130
+    counts = shard_status(args.shard_worker)
+    print(f"本 worker 处理 {processed} 个（失败 {failed} 个），用时 {time.perf_counter() - start:.2f}s；"
+          f"全部: 完成 {counts['done']}/{counts['total']}, 失败 {counts['failed']}", file=sys.stderr)
+    return 1 if failed else 0
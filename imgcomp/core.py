@@ -0,0 +1,479 @@
+"""压缩任务的调度与结果（不依赖 Qt）"""
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from .backends import AUTO_BACKEND, CompressionError, get_backend
+from .cache import detach_output
+from .dedup import group_duplicates, link_or_copy
+from .header import FORMAT_EXTENSIONS, read_header
+from .mapped import MappedFile
+from .preflight import (DEFAULT_MIN_SAVING, SKIP_NOT_SMALLER, SKIP_PREFLIGHT, copy_original,
+                        not_smaller, preflight_reason)
+from .process import POLL_INTERVAL, JobCancelled
+from .search import DEFAULT_MIN_SSIM
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+PREFETCH_FACTOR = 4  # 惰性 jobs 最多提前提交 workers 的这么多倍个任务
+
+# settings.json 中的压缩模式
+MODE_QUALITY = "质量优先"
+MODE_TARGET_SIZE = "目标大小"
+MODE_SIZE_RANGE = "大小范围"
+MODE_VISUAL = "视觉质量"
+
+
+
+@dataclass
+class CompressResult:
+    """单个文件的压缩结果，大小单位为字节"""
+    input_file: str
+    output_file: str
+    success: bool
+    message: str = ""
+    original_size: int = 0
+    compressed_size: int = 0
+    elapsed: float = 0.0
+    cached: bool = False
+    attempts: int = 0  # 编码次数，缓存命中时为 0
+    queue_wait: float = 0.0  # 提交到开始执行的等待时间（秒）
+    encode_time: float = 0.0  # 压缩引擎的墙钟时间（秒）
+    spawn_time: float = None  # 创建子进程耗时（秒）
+    cpu_time: float = None  # 编码 CPU 时间（秒）
+    peak_rss: int = None  # 子进程峰值内存（字节）
+    skipped: str = ""  # SKIP_PREFLIGHT 或 SKIP_NOT_SMALLER 时输出为原图的副本
+    quality: int = None  # 最终使用的质量（已知时）
+    ssim: float = None  # 视觉质量模式下输出与原图的 SSIM
+    duplicate_of: str = ""  # 与这个输入内容相同，输出直接复用了它的结果
+    output_format: str = ""  # 自动格式模式下输出的实际格式
+    requested_output: str = ""  # 自动格式修正了扩展名时为原来请求的输出路径
+    collision: str = ""  # 改名的目标已被同一批的其他输出占用时为该路径，输出改用了编号的文件名
+    resumed: bool = False  # 任务日志中上次已完成，这次没有重新压缩
+
+    @property
+    def ratio(self):
+        """压缩率（百分比），输出比原图大时为负数"""
+        if not self.original_size:
+            return 0.0
+        return (1 - self.compressed_size / self.original_size) * 100
+
+    def summary(self):
+        """与 GUI 日志一致的单行描述"""
+        if not self.success:
+            return self.message
+        if self.skipped:
+            return f"{self.message}，输出为原图 {self.original_size / 1024:.1f} KB"
+        text = (f"{self.original_size / 1024:.1f} KB -> {self.compressed_size / 1024:.1f} KB, "
+                f"压缩率: {self.ratio:.1f}%")
+        if self.ssim is not None:
+            text += f", 质量 {self.quality}, SSIM {self.ssim:.4f}"
+        if self.output_format:
+            text += f", 格式 {self.output_format}"
+            if self.requested_output:
+                text += f"（输出为 {os.path.basename(self.output_file)}）"
+            if self.collision:
+                text += f"，{os.path.basename(self.collision)} 已被其他输出占用"
+        if self.attempts > 1:
+            text += f", 编码尝试 {self.attempts} 次"
+        if self.cached:
+            text += " (缓存)"
+        if self.resumed:
+            text += " (上次已完成)"
+        if self.duplicate_of:
+            text += f" (与 {os.path.basename(self.duplicate_of)} 内容相同，复用结果)"
+        return text
+
+    def metrics_text(self):
+        """单行的耗时与资源统计"""
+        parts = [f"排队 {self.queue_wait:.2f}s"]
+        if self.spawn_time is not None:
+            parts.append(f"启动 {self.spawn_time * 1000:.1f}ms")
+        parts.append(f"编码 {self.encode_time:.2f}s")
+        if self.cpu_time is not None:
+            parts.append(f"CPU {self.cpu_time:.2f}s")
+        if self.peak_rss is not None:
+            parts.append(f"峰值内存 {self.peak_rss / (1024 * 1024):.1f} MB")
+        parts.append(f"尝试 {self.attempts} 次")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        data = asdict(self)
+        data["ratio"] = round(self.ratio, 2)
+        return data
+
+
+def compress_file(input_file, output_file, quality=None, webp=False,
+                  target_size=None, size_range=None, webp_quality=100, cache=None,
+                  on_output=None, timeout=None, cancel_event=None, backend=None,
+                  queued_at=None, preflight=True, min_saving=DEFAULT_MIN_SAVING, min_ssim=None,
+                  auto_format=False, claims=None):
+    """压缩单个文件，返回 CompressResult，不抛出异常
+
+    传入 cache（ResultCache）时，相同内容与参数的输入直接复用缓存结果。
+    on_output、timeout、cancel_event 的含义见 run_imagecomp。
+    backend 为引擎名称或 Backend 实例，默认自动选择（见 get_backend）。
+    queued_at 为任务提交时的 time.perf_counter()，用于统计排队时间。
+    preflight 为真时先检查文件头，已经足够小的图片不编码，直接以原图作为输出。
+    输出没有比原图小 min_saving% 时同样保留原图（None 表示不检查）。
+    两种检查都只在输出格式不变（未转换为 WebP）时生效。
+    min_ssim 不为 None 时为视觉质量模式：查找 SSIM 不低于该值的最低质量，
+    忽略 quality、target_size 和 size_range，自动选择引擎时使用 Pillow。
+    auto_format 为真时尝试多种输出格式并保留最小的结果（忽略 webp），输出扩展名
+    与实际格式不符时改为正确的扩展名，output_file 为改名后的路径；传入 claims
+    （OutputClaims）时改名不会覆盖同一批中其他任务的输出。
+    """
+    start = time.perf_counter()
+    queue_wait = start - queued_at if queued_at is not None else 0.0
+    if cancel_event is not None and cancel_event.is_set():
+        return CompressResult(input_file, output_file, False, "已取消", queue_wait=queue_wait)
+    try:
+        # 预检、哈希和进程内编码共用同一份只读映射
+        with MappedFile(input_file) as source:
+            result = _compress_mapped(source, input_file, output_file, quality, webp, target_size,
+                                      size_range, webp_quality, cache, on_output, timeout,
+                                      cancel_event, backend, preflight, min_saving, min_ssim,
+                                      auto_format, start, queue_wait)
+        if auto_format:
+            _fix_extension(result, claims)
+        return result
+    except Exception as e:
+        return _error_result(e, input_file, output_file, timeout, start, queue_wait)
+
+
+def _error_result(e, input_file, output_file, timeout, start, queue_wait):
+    """把压缩过程中的异常转换为失败的 CompressResult"""
+    if isinstance(e, CompressionError):
+        message = str(e)
+    elif isinstance(e, JobCancelled):
+        message = "已取消"
+    elif isinstance(e, subprocess.TimeoutExpired):
+        message = f"压缩超时（超过 {timeout} 秒）"
+    else:
+        message = f"执行错误: {str(e)}"
+    return CompressResult(input_file, output_file, False, message,
+                          elapsed=time.perf_counter() - start, queue_wait=queue_wait)
+
+
+def _effective_params(quality, webp, target_size, size_range, min_ssim, auto_format):
+    """视觉质量模式忽略质量和大小参数，自动格式模式忽略 webp"""
+    if min_ssim is not None:
+        quality, target_size, size_range = None, None, None
+    if auto_format:
+        webp = False
+    return quality, webp, target_size, size_range
+
+
+def _compress_mapped(source, input_file, output_file, quality, webp, target_size, size_range,
+                     webp_quality, cache, on_output, timeout, cancel_event, backend, preflight,
+                     min_saving, min_ssim, auto_format, start, queue_wait):
+    quality, webp, target_size, size_range = _effective_params(quality, webp, target_size,
+                                                               size_range, min_ssim, auto_format)
+    engine = get_backend(backend, visual=min_ssim is not None)
+    result, key = _prepare(source, input_file, output_file, quality, webp, target_size, size_range,
+                           webp_quality, cache, engine, preflight, min_saving, min_ssim,
+                           auto_format, start, queue_wait)
+    if result is not None:
+        return result
+    
+    encode_start = time.perf_counter()
+    stats = engine.compress(input_file, output_file, quality, webp, target_size,
+                            size_range, webp_quality, on_output, timeout, cancel_event, source,
+                            min_ssim, auto_format)
+    return _finish(stats, key, cache, input_file, output_file, source.size, webp, min_saving,
+                   start, queue_wait, time.perf_counter() - encode_start)
+
+
+def _prepare(source, input_file, output_file, quality, webp, target_size, size_range,
+             webp_quality, cache, engine, preflight, min_saving, min_ssim, auto_format, start,
+             queue_wait):
+    """编码前的预检和缓存查找，返回 (结果, 缓存键)；结果不为 None 时不需要编码"""
+    if preflight:
+        reason = preflight_reason(input_file, quality, webp, target_size, size_range, source)
+        if reason is not None:
+            copy_original(input_file, output_file)
+            return CompressResult(input_file, output_file, True, f"跳过: {reason}", source.size,
+                                  source.size, time.perf_counter() - start,
+                                  queue_wait=queue_wait, skipped=SKIP_PREFLIGHT), None
+    
+    key = None
+    if cache is not None:
+        key = cache.make_key(input_file, quality, webp, target_size, size_range,
+                             webp_quality, engine.name, source.digest(), min_ssim, auto_format)
+        source.release_pages()
+        if cache.fetch(key, output_file):
+            result = CompressResult(input_file, output_file, True, "缓存命中",
+                                    source.size, os.path.getsize(output_file),
+                                    time.perf_counter() - start, cached=True,
+                                    queue_wait=queue_wait)
+            return _keep_smaller(result, webp, min_saving), key
+    # 输出可能与缓存条目或去重时的其他输出硬链接，引擎原地覆盖写入前先断开
+    detach_output(output_file)
+    return None, key
+
+
+def _finish(stats, key, cache, input_file, output_file, original_size, webp, min_saving, start,
+            queue_wait, encode_time):
+    """编码完成后写入缓存并生成结果"""
+    if key is not None:
+        cache.store(key, output_file)
+    result = CompressResult(input_file, output_file, True, "压缩完成",
+                            original_size, os.path.getsize(output_file),
+                            time.perf_counter() - start, attempts=stats.attempts,
+                            queue_wait=queue_wait, encode_time=encode_time,
+                            spawn_time=stats.spawn_time, cpu_time=stats.cpu_time,
+                            peak_rss=stats.peak_rss, quality=stats.quality, ssim=stats.ssim)
+    return _keep_smaller(result, webp, min_saving)
+
+
+def _keep_smaller(result, webp, min_saving):
+    """输出没有达到 min_saving 的要求时用原图替换输出"""
+    if webp or min_saving is None or not not_smaller(result.original_size, result.compressed_size,
+                                                     min_saving):
+        return result
+    copy_original(result.input_file, result.output_file)
+    result.message = f"保留原图: 压缩后 {result.compressed_size / 1024:.1f} KB，" + (
+        f"没有比原图小 {min_saving:g}%" if min_saving else "比原图大")
+    result.compressed_size = result.original_size
+    result.skipped = SKIP_NOT_SMALLER
+    return result
+
+
+def _auto_output_name(output_file, fmt):
+    """扩展名与格式 fmt 不符时返回改用该格式扩展名的路径，否则原样返回"""
+    extensions = FORMAT_EXTENSIONS.get(fmt)
+    stem, ext = os.path.splitext(output_file)
+    if not extensions or ext.lower().lstrip(".") in extensions:
+        return output_file
+    return f"{stem}.{extensions[0]}"
+
+
+class OutputClaims:
+    """一批任务占用的输出路径，自动格式改名时避开，不会覆盖其他任务的输出"""
+
+    def __init__(self, paths=()):
+        self.lock = threading.Lock()
+        self.paths = {self._key(path) for path in paths}
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def claim(self, path):
+        """占用 path 并返回它；已被占用时改用 名称_1、名称_2…… 中第一个空闲的路径"""
+        stem, ext = os.path.splitext(path)
+        candidate = path
+        number = 0
+        with self.lock:
+            while self._key(candidate) in self.paths:
+                number += 1
+                candidate = f"{stem}_{number}{ext}"
+            self.paths.add(self._key(candidate))
+        return candidate
+
+
+def _claim_output(result, path, claims):
+    """把 result 的输出改为 path（已被占用时改用 claims 分配的编号路径），返回实际路径"""
+    claimed = claims.claim(path) if claims is not None else path
+    if claimed != path:
+        result.collision = path
+    result.requested_output = result.requested_output or result.output_file
+    result.output_file = claimed
+    return claimed
+
+
+def _fix_extension(result, claims=None):
+    """自动格式模式：按输出文件头识别实际格式，扩展名不符时改名"""
+    if not result.success:
+        return
+    header = read_header(result.output_file)
+    if header is None:
+        return
+    result.output_format = header.format
+    fixed = _auto_output_name(result.output_file, header.format)
+    if fixed != result.output_file:
+        source = result.output_file
+        os.replace(source, _claim_output(result, fixed, claims))
+
+
+def compress_files(jobs, quality=None, webp=False, target_size=None,
+                   size_range=None, webp_quality=100, workers=None, cache=None,
+                   on_output=None, timeout=None, cancel_event=None, backend=None,
+                   preflight=True, min_saving=DEFAULT_MIN_SAVING, min_ssim=None, dedup=True,
+                   auto_format=False):
+    """并发压缩多个文件，按完成顺序逐个产出 CompressResult
+
+    jobs 为 [(input_file, output_file), ...]，workers 默认为 CPU 核数。
+    on_output 的回调参数为 (input_file, line)。cancel_event 被设置后，
+    运行中的任务被终止，排队中的任务直接返回“已取消”。
+    dedup 为真时内容相同的输入只压缩一次，其余的输出硬链接或复制它的结果，
+    紧跟在它之后产出，duplicate_of 为被复用的输入。
+    jobs 也可以是边扫描边产生的迭代器：由单独的线程读取，最多提前提交
+    workers 的 PREFETCH_FACTOR 倍个任务，第一个任务不必等迭代结束就开始；
+    去重需要先读入全部 jobs，这时应传入 dedup=False。
+    自动格式模式下改名的输出不会覆盖其他任务的输出（见 _batch_claims）。
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    backend = get_backend(backend, visual=min_ssim is not None)
+    duplicates = {}
+    if dedup:
+        jobs, duplicates = group_duplicates(jobs, workers)
+    claims, lazy = _batch_claims(jobs, duplicates, auto_format)
+    finished = queue.Queue()
+    slots = threading.Semaphore(workers * PREFETCH_FACTOR)
+    stop = threading.Event()
+    fed = []  # [提交的任务数, 读取 jobs 时的异常]
+
+    def feed(executor):
+        count = 0
+        error = None
+        try:
+            for input_file, output_file in jobs:
+                while not slots.acquire(timeout=POLL_INTERVAL):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                job = (input_file, output_file)
+                if lazy:
+                    output_file = claims.claim(output_file)
+                future = executor.submit(compress_file, input_file, output_file, quality, webp,
+                                         target_size, size_range, webp_quality, cache,
+                                         _bind_output(on_output, input_file), timeout,
+                                         cancel_event, backend, time.perf_counter(), preflight,
+                                         min_saving, min_ssim, auto_format, claims)
+                future.add_done_callback(lambda f, job=job: finished.put((job, f)))
+                count += 1
+        except Exception as e:
+            error = e
+        finally:
+            fed.extend((count, error))
+            finished.put((None, None))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        feeder = threading.Thread(target=feed, args=(executor,), daemon=True)
+        feeder.start()
+        received = 0
+        try:
+            while not fed or received < fed[0]:
+                job, future = finished.get()
+                if job is None:
+                    continue
+                received += 1
+                slots.release()
+                result = _claimed_result(future.result(), job)
+                yield result
+                for input_file, output_file in duplicates.get(job, ()):
+                    yield _reuse_result(result, input_file, output_file, claims)
+        finally:
+            stop.set()  # 不等待 feeder：它可能正阻塞在还在扫描的 jobs 上
+    if fed[1] is not None:
+        raise fed[1]
+
+
+def _batch_claims(jobs, duplicates, auto_format):
+    """返回 (OutputClaims, lazy)；不是自动格式模式时为 (None, False)
+
+    jobs 为列表时预先占用全部请求的输出路径；惰性的 jobs 在提交时由调用方逐个
+    claim，请求的路径已被之前的改名占用时改用编号的路径（见 _claimed_result）。
+    """
+    if not auto_format:
+        return None, False
+    if not isinstance(jobs, (list, tuple)):
+        return OutputClaims(), True
+    paths = [output_file for _, output_file in jobs]
+    paths += [output_file for group in duplicates.values() for _, output_file in group]
+    return OutputClaims(paths), False
+
+
+def _claimed_result(result, job):
+    """提交时输出路径被改为编号路径的，在结果中记下原来请求的路径"""
+    requested = job[1]
+    if (result.requested_output or result.output_file) != requested:
+        result.collision = result.collision or requested
+        result.requested_output = requested
+    return result
+
+
+def _reuse_result(result, input_file, output_file, claims=None):
+    """内容相同的输入直接使用 result 的输出"""
+    start = time.perf_counter()
+    reused = CompressResult(input_file, output_file, result.success, result.message,
+                            result.original_size, result.compressed_size,
+                            skipped=result.skipped, quality=result.quality, ssim=result.ssim,
+                            duplicate_of=result.input_file, output_format=result.output_format)
+    fixed = _auto_output_name(output_file, result.output_format)
+    if fixed != output_file:
+        output_file = _claim_output(reused, fixed, claims)
+    if result.success:
+        try:
+            link_or_copy(result.output_file, output_file)
+        except OSError as e:
+            reused.success = False
+            reused.message = f"复用 {os.path.basename(result.input_file)} 的结果失败: {str(e)}"
+    reused.elapsed = time.perf_counter() - start
+    return reused
+
+
+def _bind_output(on_output, input_file):
+    if on_output is None:
+        return None
+    return lambda line: on_output(input_file, line)
+
+
+def list_image_files(folder):
+    """列出目录下的图片文件（不递归）"""
+    return sorted(
+        str(p) for p in Path(folder).iterdir()
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def default_output_name(input_file, webp=False):
+    """生成默认输出文件名：原文件名_compressed + 扩展名"""
+    input_path = Path(input_file)
+    default_name = input_path.stem + "_compressed"
+    if webp:
+        default_name += ".webp"
+    else:
+        default_name += input_path.suffix
+    return default_name
+
+
+def params_from_settings(settings):
+    """把 GUI 保存的 settings.json 转换为 compress_file 的关键字参数"""
+    mode = settings.get("compression_mode", MODE_QUALITY)
+    params = {
+        "quality": None,
+        "webp": settings.get("webp", False),
+        "target_size": None,
+        "size_range": None,
+        "webp_quality": settings.get("webp_quality", 100),
+        "backend": settings.get("backend", AUTO_BACKEND),
+        "preflight": settings.get("preflight", True),
+        "min_saving": settings.get("min_saving", DEFAULT_MIN_SAVING),
+        "min_ssim": None,
+        "auto_format": settings.get("auto_format", False),
+    }
+    if mode == MODE_TARGET_SIZE:
+        params["target_size"] = settings.get("target_size", 100)
+    elif mode == MODE_SIZE_RANGE:
+        params["size_range"] = (settings.get("min_size", 50), settings.get("max_size", 200))
+    elif mode == MODE_VISUAL:
+        params["min_ssim"] = settings.get("min_ssim", DEFAULT_MIN_SSIM)
+    else:
+        params["quality"] = settings.get("quality", 80)
+    return params
+
+
+def load_settings(path="settings.json"):
+    """读取 settings.json，文件不存在时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,80 @@
+"""批量任务内的去重：内容相同的输入只压缩一次，其余输出链接或复制这一次的结果
+
+先按文件大小分组，只有大小相同的文件才需要读取内容计算哈希。
+"""
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_CHUNK = 1024 * 1024
+
+
+def fast_digest(path):
+    """文件内容的 BLAKE2b 摘要（128 位），比 SHA-256 快，只用于批量内比较"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def group_duplicates(jobs, workers=None):
+    """把 [(input_file, output_file), ...] 分为代表任务和重复任务
+
+    返回 (代表任务列表, {代表任务: [重复任务, ...]})，代表任务保持原来的顺序。
+    读取不到大小或内容的文件总是作为代表任务，由压缩时报告错误。
+    """
+    jobs = list(jobs)
+    by_size = {}
+    sizes = {}
+    for job in jobs:
+        try:
+            size = os.path.getsize(job[0])
+        except OSError:
+            size = None
+        sizes[job] = size
+        by_size.setdefault(size, []).append(job)
+    candidates = [job for size, group in by_size.items() if size is not None and len(group) > 1
+                  for job in group]
+    if not candidates:
+        return list(jobs), {}
+
+    def digest(job):
+        try:
+            return fast_digest(job[0])
+        except OSError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers or os.cpu_count() or 1)) as executor:
+        digests = dict(zip(candidates, executor.map(digest, candidates)))
+    representatives = []
+    duplicates = {}
+    first = {}  # (大小, 摘要) -> 代表任务
+    for job in jobs:
+        key = digests.get(job)
+        if key is None:
+            representatives.append(job)
+            continue
+        key = (sizes[job], key)
+        if key in first:
+            duplicates.setdefault(first[key], []).append(job)
+        else:
+            first[key] = job
+            representatives.append(job)
+    return representatives, duplicates
+
+
+def link_or_copy(source, output_file):
+    """把 source 放到 output_file：优先硬链接，不支持时复制；两者是同一文件时不做任何事"""
+    if os.path.abspath(source) == os.path.abspath(output_file):
+        return
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(output_dir, exist_ok=True)
+    tmp = os.path.join(output_dir, f".{os.path.basename(output_file)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, output_file)
@@ -0,0 +1,273 @@
+"""只读取文件开头的字节来识别图片格式、尺寸、位深、颜色类型和 EXIF 方向，不解码像素"""
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+HEADER_BYTES = 64 * 1024  # JPEG 的量化表和 SOF 通常都在前几 KB
+SMALL_HEADER_BYTES = 16 * 1024  # 批量列出文件时先读这么多
+MAX_HEADER_BYTES = 256 * 1024  # EXIF 缩略图、ICC 配置文件很大时最多再读到这里
+
+# IJG 标准亮度量化表（质量 50），按行排列
+_STD_LUMINANCE = (
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+)
+
+
+def _zigzag_order():
+    order = sorted(((r, c) for r in range(8) for c in range(8)),
+                   key=lambda p: (p[0] + p[1], p[0] if (p[0] + p[1]) % 2 else p[1]))
+    return [r * 8 + c for r, c in order]
+
+
+# DQT 段中的量化表按 zigzag 顺序存储
+_STD_LUMINANCE_ZIGZAG = [_STD_LUMINANCE[i] for i in _zigzag_order()]
+
+
+# PNG IHDR 中的颜色类型，名称与 Pillow 的 mode 一致
+_PNG_COLOR_TYPES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+_JPEG_COMPONENTS = {1: "L", 3: "RGB", 4: "CMYK"}
+_ORIENTATION_NAMES = {
+    1: "正常", 2: "水平翻转", 3: "旋转 180°", 4: "垂直翻转",
+    5: "转置", 6: "顺时针旋转 90°", 7: "反转置", 8: "逆时针旋转 90°",
+}
+FORMAT_EXTENSIONS = {
+    "JPEG": ("jpg", "jpeg", "jpe", "jfif"),
+    "PNG": ("png",),
+    "GIF": ("gif",),
+    "BMP": ("bmp", "dib"),
+    "WEBP": ("webp",),
+}
+
+
+@dataclass
+class ImageHeader:
+    """文件头中的图片信息；format 为 JPEG、PNG、GIF、BMP 或 WEBP
+
+    color_type 使用 Pillow 的 mode 名称（L、LA、P、RGB、RGBA、CMYK），
+    bit_depth 为每个通道的位数（调色板图片为索引位数）。
+    """
+    format: str
+    width: int = 0
+    height: int = 0
+    jpeg_quality: int = None  # 由亮度量化表估算的 JPEG 质量（1-100）
+    bit_depth: int = 0
+    color_type: str = ""
+    has_alpha: bool = False  # 带透明通道或透明色（包括 PNG 的 tRNS；GIF 的透明色不检测）
+    orientation: int = 1  # EXIF 方向，1 为正常，5-8 时显示尺寸需要交换宽高
+
+    @property
+    def display_size(self):
+        """按 EXIF 方向旋转后的 (宽, 高)"""
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+    def describe_color(self):
+        """用于界面显示，例如 "RGB 8 位" """
+        if not self.color_type:
+            return "未知"
+        return f"{self.color_type} {self.bit_depth} 位" if self.bit_depth else self.color_type
+
+    def describe_orientation(self):
+        return _ORIENTATION_NAMES.get(self.orientation, "正常")
+
+    def extension_matches(self, path):
+        """文件扩展名是否与实际格式一致"""
+        ext = os.path.splitext(path)[1].lower().lstrip(".")
+        return ext in FORMAT_EXTENSIONS.get(self.format, ())
+
+
+def exif_orientation(tiff):
+    """从 EXIF 的 TIFF 数据（以 II 或 MM 开头）的 IFD0 中读取方向，没有时返回 1"""
+    order = {b"II": "<", b"MM": ">"}.get(bytes(tiff[:2]))
+    if order is None:
+        return 1
+    try:
+        offset = struct.unpack(order + "I", tiff[4:8])[0]
+        count = struct.unpack(order + "H", tiff[offset:offset + 2])[0]
+        for n in range(count):
+            entry = tiff[offset + 2 + 12 * n:offset + 14 + 12 * n]
+            tag = struct.unpack(order + "H", entry[:2])[0]
+            if tag == 0x0112:
+                value = struct.unpack(order + "H", entry[8:10])[0]
+                return value if 1 <= value <= 8 else 1
+    except struct.error:
+        pass
+    return 1
+
+
+def estimate_jpeg_quality(table):
+    """按 IJG 的质量缩放公式反推质量，table 为 zigzag 顺序的 64 个亮度量化值"""
+    scale = sum(q * 100 / s for q, s in zip(table, _STD_LUMINANCE_ZIGZAG)) / 64
+    if scale <= 0:
+        return 100
+    quality = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+    return max(1, min(100, round(quality)))
+
+
+def _parse_jpeg(data):
+    header = ImageHeader("JPEG")
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):  # 图像数据开始
+            break
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        segment = data[i + 4:i + 2 + length]
+        if marker == 0xE1 and segment[:6] == b"Exif\0\0":
+            header.orientation = exif_orientation(segment[6:])
+        elif marker == 0xDB:
+            pos = 0
+            while pos < len(segment):
+                precision, table_id = segment[pos] >> 4, segment[pos] & 0x0F
+                size = 64 * (precision + 1)
+                values = segment[pos + 1:pos + 1 + size]
+                if len(values) < size:
+                    break
+                if precision:
+                    values = struct.unpack(">64H", values)
+                if table_id == 0:
+                    header.jpeg_quality = estimate_jpeg_quality(values)
+                pos += 1 + size
+        elif 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC) and len(segment) >= 5:
+            header.bit_depth = segment[0]
+            header.height, header.width = struct.unpack(">HH", segment[1:5])
+            if len(segment) >= 6:
+                header.color_type = _JPEG_COMPONENTS.get(segment[5], "")
+            break  # 量化表总在 SOF 之前
+        i += 2 + length
+    return header
+
+
+def _parse_png(data):
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", data[16:26])
+    header = ImageHeader("PNG", width, height, bit_depth=bit_depth,
+                         color_type=_PNG_COLOR_TYPES.get(color_type, ""))
+    header.has_alpha = color_type in (4, 6)
+    # tRNS 和 eXIf 都在 IDAT 之前
+    pos = 8
+    while pos + 8 <= len(data):
+        length, chunk = struct.unpack(">I4s", data[pos:pos + 8])
+        if chunk == b"IDAT" or chunk == b"IEND":
+            break
+        if chunk == b"tRNS":
+            header.has_alpha = True
+        elif chunk == b"eXIf":
+            header.orientation = exif_orientation(data[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    return header
+
+
+def _parse_webp(data):
+    header = ImageHeader("WEBP", bit_depth=8, color_type="RGB")
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        header.width, header.height = width & 0x3FFF, height & 0x3FFF
+    elif chunk == b"VP8L" and len(data) >= 25:
+        bits = struct.unpack("<I", data[21:25])[0]
+        header.width, header.height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        header.has_alpha = bool(bits >> 28 & 1)
+    elif chunk == b"VP8X" and len(data) >= 30:
+        flags = data[20]
+        header.width = int.from_bytes(data[24:27], "little") + 1
+        header.height = int.from_bytes(data[27:30], "little") + 1
+        header.has_alpha = bool(flags & 0x10)
+        if flags & 0x08:  # 带 EXIF 块；它通常在图像数据之后，超出读取范围时方向按 1 处理
+            pos = 30
+            while pos + 8 <= len(data):
+                name, length = struct.unpack("<4sI", data[pos:pos + 8])
+                if name == b"EXIF":
+                    tiff = data[pos + 8:pos + 8 + length]
+                    if tiff[:6] == b"Exif\0\0":
+                        tiff = tiff[6:]
+                    header.orientation = exif_orientation(tiff)
+                    break
+                pos += 8 + length + (length & 1)
+    if header.has_alpha:
+        header.color_type = "RGBA"
+    return header
+
+
+def _parse_bmp(data):
+    size = struct.unpack("<I", data[14:18])[0]
+    compression = 0
+    if size == 12:
+        width, height, _, bits = struct.unpack("<HHHH", data[18:26])
+    else:
+        width, height, _, bits = struct.unpack("<iiHH", data[18:30])
+        if len(data) >= 34:
+            compression = struct.unpack("<I", data[30:34])[0]
+    header = ImageHeader("BMP", width, abs(height))
+    if bits <= 8:
+        header.bit_depth, header.color_type = bits, "P"
+    else:
+        header.bit_depth, header.color_type = 8, "RGB"
+        # 32 位 BI_RGB 的第 4 个字节未使用；位域（BI_BITFIELDS）只有 V3 及以上的信息头
+        # 或 BI_ALPHABITFIELDS 才带 alpha 掩码，紧跟在 R、G、B 掩码之后
+        if (bits == 32 and len(data) >= 70
+                and (compression == 6 or compression == 3 and size >= 56)
+                and struct.unpack("<I", data[66:70])[0]):
+            header.color_type, header.has_alpha = "RGBA", True
+    return header
+
+
+def parse_header(data):
+    """解析文件开头的字节，无法识别时返回 None"""
+    if data[:3] == b"\xff\xd8\xff":
+        return _parse_jpeg(data)
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 26:
+        return _parse_png(data)
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 11:
+        width, height, packed = struct.unpack("<HHB", data[6:11])
+        # 没有全局颜色表时低 3 位没有意义，各帧的局部颜色表不在这里解析
+        bit_depth = (packed & 7) + 1 if packed & 0x80 else 0
+        return ImageHeader("GIF", width, height, bit_depth=bit_depth, color_type="P")
+    if data[:2] == b"BM" and len(data) >= 30:
+        return _parse_bmp(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _parse_webp(data)
+    return None
+
+
+def read_header(path, limit=HEADER_BYTES):
+    """读取文件开头 limit 字节并解析；读取失败或无法识别时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(limit)
+            header = parse_header(data)
+            if header is not None and not header.width and len(data) == limit < MAX_HEADER_BYTES:
+                # 尺寸所在的段不在已读取的部分
+                data += f.read(MAX_HEADER_BYTES - limit)
+                header = parse_header(data)
+    except OSError:
+        return None
+    except struct.error:  # 文件被截断
+        return None
+    return header
+
+
+def read_headers(paths, workers=8):
+    """并发读取多个文件头，按输入顺序产出 (路径, ImageHeader 或 None)
+
+    只读取每个文件开头的几 KB，网络盘上主要耗时在打开文件，所以用线程并发。
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from zip(paths, executor.map(lambda path: read_header(path, SMALL_HEADER_BYTES), paths))
@@ -0,0 +1,221 @@
+"""可恢复的任务队列：每个任务的状态变化追加写入 JSON-lines 日志"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+
+from .core import CompressResult, compress_files
+
+DEFAULT_JOURNAL_FILE = "jobs.jsonl"
+JOURNAL_FILE_NAME = ".imgcomp_jobs.jsonl"  # GUI 在输出目录中使用的任务日志文件名
+DEFAULT_RETRIES = 3  # 失败后最多重试次数
+DEFAULT_BACKOFF = 2.0  # 第一次重试前等待的秒数，之后每次翻倍
+MAX_BACKOFF = 300.0
+COMPACT_SLACK = 1000  # 日志行数超过任务数 2 倍加上这个值时重写日志
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """队列中的一个任务，signature 为 [输入大小, 修改时间ns, 参数]"""
+    input_file: str
+    output_file: str
+    signature: list = None
+    state: str = PENDING
+    attempts: int = 0  # 已失败的次数
+    next_attempt: float = 0.0  # 最早可以重试的时间（time.time()）
+    message: str = ""
+    written_file: str = ""  # 自动格式修正了扩展名时实际写出的输出路径
+
+    @property
+    def key(self):
+        return self.input_file, self.output_file
+
+    @property
+    def will_retry(self):
+        """刚失败但还会重试"""
+        return self.state == PENDING
+
+    def result(self):
+        """已完成任务的 CompressResult（不重新压缩），大小取自现有的输入和输出文件"""
+        output_file = self.written_file or self.output_file
+        try:
+            original_size = os.path.getsize(self.input_file)
+            compressed_size = os.path.getsize(output_file)
+        except OSError:
+            original_size = compressed_size = 0
+        return CompressResult(self.input_file, output_file, True, self.message, original_size,
+                              compressed_size, resumed=True,
+                              requested_output=self.output_file if self.written_file else "")
+
+
+def job_signature(input_file, params):
+    """输入文件或压缩参数变化后签名随之变化，已完成的任务需要重做"""
+    try:
+        st = os.stat(input_file)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, json.dumps(params, sort_keys=True)]
+
+
+class JobQueue:
+    """带磁盘日志的任务队列，进程崩溃或重启后从中断处继续
+
+    日志每行是某个任务的最新状态，读取时以最后一行为准。启动时把上次
+    运行中（running）的任务放回等待队列；完成（done）的任务只要输入、
+    参数都没变且输出文件仍然存在，就不会再次压缩。失败的任务按指数
+    退避重试，超过 retries 次后标记为 failed，下次 add 时重新开始计数。
+    只执行本次 add 过的任务：同一个日志中以前其他批次留下的未完成任务保持原样。
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_FILE, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.path = path
+        self.retries = retries
+        self.backoff = backoff
+        self.jobs = {}
+        self.active = {}  # 本次运行 add 过的任务键（按加入顺序），日志中的其他任务不执行
+        self._lock = threading.Lock()
+        lines = self.load()
+        for job in self.jobs.values():
+            if job.state == RUNNING:
+                job.state = PENDING
+        if lines > 2 * len(self.jobs) + COMPACT_SLACK:
+            self.compact()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def load(self):
+        """读取日志，返回行数；最后一行可能因崩溃只写了一半，直接忽略"""
+        lines = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        job = Job(**json.loads(line))
+                    except (TypeError, ValueError):
+                        continue
+                    self.jobs[job.key] = job
+        except OSError:
+            pass
+        return lines
+
+    def compact(self):
+        """把日志重写为每个任务一行"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for job in self.jobs.values():
+                f.write(json.dumps(asdict(job), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _write(self, job, sync=False):
+        line = json.dumps(asdict(job), ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def add(self, jobs, params):
+        """加入 [(input_file, output_file), ...]，返回其中已完成、无需重做的数量"""
+        skipped = 0
+        for input_file, output_file in jobs:
+            self.active[(input_file, output_file)] = None
+            signature = job_signature(input_file, params)
+            job = self.jobs.get((input_file, output_file))
+            if job is not None and job.signature == signature:
+                if job.state == DONE and os.path.exists(job.written_file or output_file):
+                    skipped += 1
+                    continue
+                if job.state == PENDING:
+                    continue  # 保留上次的重试计划
+            job = Job(input_file, output_file, signature)
+            self.jobs[job.key] = job
+            self._write(job)
+        return skipped
+
+    def completed(self, keys):
+        """keys 中已完成的任务；add 之后就是这次跳过的任务"""
+        return [self.jobs[key] for key in keys if key in self.jobs and self.jobs[key].state == DONE]
+
+    def ready(self, now=None):
+        """已到重试时间、可以执行的任务"""
+        now = time.time() if now is None else now
+        return [self.jobs[key] for key in self.active
+                if self.jobs[key].state == PENDING and self.jobs[key].next_attempt <= now]
+
+    def next_wakeup(self):
+        """最近一个等待重试的时间，没有未完成的任务时返回 None"""
+        times = [self.jobs[key].next_attempt for key in self.active
+                 if self.jobs[key].state == PENDING]
+        return min(times) if times else None
+
+    def start(self, jobs):
+        for job in jobs:
+            job.state = RUNNING
+            self._write(job)
+
+    def finish(self, result, cancelled=False):
+        """根据 CompressResult 更新任务状态并立即落盘，返回对应的 Job"""
+        job = self.jobs[(result.input_file, result.requested_output or result.output_file)]
+        job.message = result.message
+        if result.success:
+            job.state = DONE
+            job.written_file = result.output_file if result.requested_output else ""
+        elif cancelled:
+            job.state = PENDING  # 取消不算失败
+        else:
+            job.attempts += 1
+            if job.attempts > self.retries:
+                job.state = FAILED
+            else:
+                job.state = PENDING
+                job.next_attempt = time.time() + min(MAX_BACKOFF, self.backoff * 2 ** (job.attempts - 1))
+        self._write(job, sync=True)
+        return job
+
+    def counts(self):
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self.jobs.values():
+            counts[job.state] += 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def run_queue(queue, workers=None, cache=None, on_output=None, timeout=None,
+              cancel_event=None, runner=compress_files, **params):
+    """执行队列中的任务，按完成顺序产出 (Job, CompressResult)
+
+    runner 为执行一轮任务的函数，默认为 compress_files，也可以是
+    aiorunner.compress_files_ordered（按任务顺序产出）。产出时 job.will_retry 为真表示这次失败后还会重试。失败的任务在本轮
+    结束后按退避时间重新执行，直到全部完成或超过重试次数。cancel_event
+    被设置后停止，未完成的任务保留在日志中，下次运行继续。
+    """
+    cancel_event = cancel_event or threading.Event()
+    while not cancel_event.is_set():
+        jobs = queue.ready()
+        if not jobs:
+            wakeup = queue.next_wakeup()
+            if wakeup is None:
+                return
+            cancel_event.wait(max(0.0, wakeup - time.time()))
+            continue
+        queue.start(jobs)
+        results = runner([job.key for job in jobs], workers=workers, cache=cache,
+                         on_output=on_output, timeout=timeout, cancel_event=cancel_event, **params)
+        try:
+            for result in results:
+                yield queue.finish(result, cancelled=cancel_event.is_set()), result
+        finally:
+            results.close()
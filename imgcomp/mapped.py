@@ -0,0 +1,83 @@
+"""只读内存映射的输入文件：哈希、文件头解析和进程内编码共用同一份映射
+
+文件内容由操作系统按需分页读入，不会在 Python 中复制整份数据；
+多个任务读取同一文件时共享页缓存。
+"""
+import hashlib
+import mmap
+import os
+import struct
+
+from .header import HEADER_BYTES, parse_header
+
+
+class MappedFile:
+    """以只读方式映射整个文件，view 为指向映射的 memoryview
+
+    用法：
+
+        with MappedFile(path) as source:
+            digest = source.digest()
+            header = source.header()
+            img = Image.open(source.stream())
+
+    stream() 返回的文件对象与映射共享读写位置，同一时间只能有一个读者。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._map = None
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self._map)
+        else:
+            self.view = memoryview(b"")  # 空文件无法映射
+        self._header = None
+        self._digest = None
+
+    def digest(self):
+        """文件内容的 SHA-256（与 cache.file_digest 相同），只计算一次"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.view).hexdigest()
+        return self._digest
+
+    def header(self):
+        """解析映射开头的文件头，无法识别时返回 None"""
+        if self._header is None:
+            try:
+                self._header = parse_header(self.view[:HEADER_BYTES])
+            except struct.error:  # 文件被截断
+                self._header = None
+        return self._header
+
+    def release_pages(self):
+        """告诉内核已读过的页暂时不再需要
+
+        映射中被读过的页会计入进程 RSS。只读映射的页与页缓存共享，
+        MADV_DONTNEED 只把它们移出本进程，再次读取时从页缓存取回，
+        因此哈希完成、解码完成后调用可以降低编码阶段的峰值 RSS。
+        """
+        if self._map is not None and hasattr(self._map, "madvise"):
+            self._map.madvise(mmap.MADV_DONTNEED)
+
+    def stream(self):
+        """可供 Image.open 读取的文件对象，读取位置回到开头"""
+        if self._map is None:
+            self._file.seek(0)
+            return self._file
+        self._map.seek(0)
+        return self._map
+
+    def close(self):
+        self.view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,78 @@
+"""压缩任务的耗时与资源统计，可写入 JSON-lines 文件"""
+import json
+import threading
+import time
+
+from .preflight import SKIP_PREFLIGHT
+
+DEFAULT_METRICS_FILE = "metrics.jsonl"
+TOP_N = 3  # 汇总中列出的最耗时任务数
+
+
+class MetricsRecorder:
+    """汇总一批 CompressResult；指定 path 时每条结果追加一行 JSON
+
+    每行包含 CompressResult.to_dict() 的所有字段，以及时间戳和压缩参数，
+    方便按图片或参数分析开销。
+    """
+
+    def __init__(self, path=None, params=None):
+        self.path = path
+        self.params = dict(params or {})
+        self.results = []
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        with self._lock:
+            self.results.append(result)
+            if self.path:
+                record = result.to_dict()
+                record["timestamp"] = time.time()
+                record["params"] = self.params
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def summary_lines(self):
+        """用于执行日志的多行汇总"""
+        skipped = [r for r in self.results if r.skipped]
+        preflight = sum(1 for r in skipped if r.skipped == SKIP_PREFLIGHT)
+        skip_lines = []
+        if skipped:
+            skip_lines.append(f"跳过: 预检无需压缩 {preflight} 个, "
+                              f"压缩后未变小而保留原图 {len(skipped) - preflight} 个")
+        duplicates = sum(1 for r in self.results if r.success and r.duplicate_of)
+        if duplicates:
+            skip_lines.append(f"去重: {duplicates} 个文件与批量中的其他文件内容相同，少编码 {duplicates} 次")
+        done = [r for r in self.results if r.success and not r.cached and not r.duplicate_of
+                and r.skipped != SKIP_PREFLIGHT]
+        if not done:
+            return skip_lines
+        bytes_in = sum(r.original_size for r in done)
+        bytes_out = sum(r.compressed_size for r in done)
+        cpu = [r.cpu_time for r in done if r.cpu_time is not None]
+        rss = [r.peak_rss for r in done if r.peak_rss is not None]
+        lines = [
+            f"统计: 编码 {len(done)} 个, 编码耗时合计 {sum(r.encode_time for r in done):.2f}s, "
+            f"排队合计 {sum(r.queue_wait for r in done):.2f}s, "
+            f"编码尝试 {sum(r.attempts for r in done)} 次",
+            f"数据量: {bytes_in / 1024:.1f} KB -> {bytes_out / 1024:.1f} KB",
+        ]
+        if cpu:
+            lines.append(f"CPU 合计 {sum(cpu):.2f}s" +
+                         (f", 子进程峰值内存最高 {max(rss) / (1024 * 1024):.1f} MB" if rss else ""))
+        visual = [r for r in done if r.ssim is not None]
+        if visual:
+            lines.append(f"视觉质量: 平均选定质量 {sum(r.quality for r in visual) / len(visual):.0f} "
+                         f"（{min(r.quality for r in visual)}-{max(r.quality for r in visual)}）, "
+                         f"SSIM 最低 {min(r.ssim for r in visual):.4f}")
+        formats = {}
+        for r in done:
+            if r.output_format:
+                formats[r.output_format] = formats.get(r.output_format, 0) + 1
+        if formats:
+            lines.append("自动格式: " + ", ".join(
+                f"{fmt} {count} 个" for fmt, count in sorted(formats.items(), key=lambda i: -i[1])))
+        slowest = sorted(done, key=lambda r: r.encode_time, reverse=True)[:TOP_N]
+        lines.append("最耗时: " + "; ".join(
+            f"{r.input_file} {r.encode_time:.2f}s" for r in slowest))
+        return lines + skip_lines
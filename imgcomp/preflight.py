@@ -0,0 +1,53 @@
+"""编码前后的检查：跳过不需要压缩的图片，输出没有变小时保留原图"""
+import os
+import shutil
+import tempfile
+
+from .header import read_header
+
+SKIP_PREFLIGHT = "preflight"  # 预检判断不需要压缩
+SKIP_NOT_SMALLER = "not_smaller"  # 压缩后没有变小，保留原图
+DEFAULT_MIN_SAVING = 0.0  # 输出至少要比原图小多少（百分比）才采用
+
+
+def preflight_reason(input_file, quality=None, webp=False, target_size=None, size_range=None,
+                     source=None):
+    """只看文件大小和文件头判断是否可以跳过编码，返回跳过原因，需要压缩时返回 None
+
+    转换为 WebP 时格式会变化，总是需要编码。source 为已映射的 MappedFile 时直接使用。
+    """
+    if webp:
+        return None
+    size = source.size if source is not None else os.path.getsize(input_file)
+    if target_size is not None and size <= target_size * 1024:
+        return f"原图 {size / 1024:.1f} KB 已不超过目标大小 {target_size} KB"
+    if size_range is not None and size <= size_range[1] * 1024:
+        return f"原图 {size / 1024:.1f} KB 已不超过大小上限 {size_range[1]} KB"
+    if quality is not None:
+        header = source.header() if source is not None else read_header(input_file)
+        if header is not None and header.jpeg_quality is not None and header.jpeg_quality <= quality:
+            return f"原图 JPEG 质量约为 {header.jpeg_quality}，不高于设定的 {quality}"
+    return None
+
+
+def not_smaller(original_size, compressed_size, min_saving=DEFAULT_MIN_SAVING):
+    """压缩后的大小是否没有达到至少节省 min_saving% 的要求"""
+    return compressed_size > original_size * (1 - min_saving / 100)
+
+
+def copy_original(input_file, output_file):
+    """用原图作为输出；先写唯一的临时文件再替换，不影响与缓存硬链接的旧输出，并发写同一输出也不冲突"""
+    if os.path.exists(output_file) and os.path.samefile(input_file, output_file):
+        return
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(output_file)))
+    os.close(fd)
+    try:
+        shutil.copyfile(input_file, tmp)
+        shutil.copymode(input_file, tmp)
+        os.replace(tmp, output_file)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
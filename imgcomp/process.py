@@ -0,0 +1,228 @@
+"""imagecomp.exe 命令构造与子进程执行"""
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+POLL_INTERVAL = 0.1  # 等待子进程时检查取消/超时的间隔（秒）
+TERMINATE_GRACE = 2  # terminate 后等待多久再 kill（秒）
+
+
+def get_imagecomp_path():
+    """imagecomp.exe 路径，可用环境变量 IMAGECOMP_PATH 覆盖"""
+    if os.environ.get("IMAGECOMP_PATH"):
+        return os.environ["IMAGECOMP_PATH"]
+    if getattr(sys, 'frozen', False):
+        # PyInstaller打包后
+        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
+    else:
+        # 源码运行，imagecomp.exe 位于包目录的上一级
+        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, "imagecomp.exe")
+
+
+def build_imagecomp_command(input_file, output_file, quality, webp=False,
+                            target_size=None, size_range=None, webp_quality=100,
+                            executable=None):
+    """构造 imagecomp.exe 命令行，executable 为 .py 脚本时用当前解释器运行"""
+    executable = executable or get_imagecomp_path()
+    cmd = [sys.executable, executable] if executable.endswith(".py") else [executable]
+    cmd.extend([input_file, "-o", output_file])
+    cmd.append("--force")
+    if quality is not None:
+        cmd.extend(["-q", str(quality)])
+    
+    if webp:
+        cmd.append("--webp")
+        if webp_quality != 100:
+            cmd.extend(["--webp-quality", str(webp_quality)])
+    
+    if target_size is not None:
+        cmd.extend(["-t", str(target_size)])
+    
+    if size_range is not None:
+        cmd.extend(["-s", str(size_range[0]), str(size_range[1])])
+    return cmd
+
+
+class JobCancelled(Exception):
+    """任务被用户取消"""
+
+
+def _pump(stream, lines, on_output):
+    for line in stream:
+        lines.append(line)
+        if on_output is not None:
+            on_output(line.rstrip("\r\n"))
+    stream.close()
+
+
+def _terminate(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=TERMINATE_GRACE)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _wait(proc, timeout):
+    """等待子进程最多 timeout 秒，超时抛出 subprocess.TimeoutExpired
+
+    支持 os.wait4 的平台上由这里回收子进程，并返回它的 rusage；否则返回 None。
+    """
+    if not hasattr(os, "wait4"):
+        proc.wait(timeout=timeout)
+        return None
+    end = time.monotonic() + timeout
+    delay = 0.0005
+    while True:
+        try:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        except ChildProcessError:
+            proc.wait()
+            return None
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.05)
+
+
+def rusage_peak_rss(usage):
+    """ru_maxrss 转换为字节：Linux 下单位为 KB，macOS 为字节"""
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def run_imagecomp(cmd, on_output=None, timeout=None, cancel_event=None):
+    """执行 imagecomp.exe 并等待结束
+
+    stdout/stderr 每输出一行就回调 on_output。超过 timeout 秒抛出
+    subprocess.TimeoutExpired，cancel_event 被设置时抛出 JobCancelled，
+    两种情况都会先结束子进程。
+
+    返回的 CompletedProcess 额外带有 spawn_time（创建子进程耗时，秒），
+    以及 cpu_time（秒）和 peak_rss（字节）；后两者仅在支持 os.wait4 的
+    平台上有值，否则为 None。
+    """
+    creationflags = 0
+    if sys.platform == "win32":
+        creationflags = subprocess.CREATE_NO_WINDOW
+    
+    spawn_start = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        creationflags=creationflags
+    )
+    spawn_time = time.perf_counter() - spawn_start
+    stdout_lines = []
+    stderr_lines = []
+    pumps = [
+        threading.Thread(target=_pump, args=(proc.stdout, stdout_lines, on_output), daemon=True),
+        threading.Thread(target=_pump, args=(proc.stderr, stderr_lines, on_output), daemon=True),
+    ]
+    for pump in pumps:
+        pump.start()
+    
+    deadline = time.monotonic() + timeout if timeout else None
+    usage = None
+    try:
+        while True:
+            try:
+                usage = _wait(proc, POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if cancel_event is not None and cancel_event.is_set():
+                _terminate(proc)
+                raise JobCancelled()
+            if deadline is not None and time.monotonic() > deadline:
+                _terminate(proc)
+                raise subprocess.TimeoutExpired(cmd, timeout)
+    except BaseException:
+        if proc.poll() is None:
+            _terminate(proc)
+        raise
+    finally:
+        for pump in pumps:
+            pump.join()
+    
+    completed = subprocess.CompletedProcess(cmd, proc.returncode,
+                                            "".join(stdout_lines), "".join(stderr_lines))
+    completed.spawn_time = spawn_time
+    completed.cpu_time = usage.ru_utime + usage.ru_stime if usage is not None else None
+    completed.peak_rss = rusage_peak_rss(usage) if usage is not None else None
+    return completed
+
+
+async def _pump_async(stream, lines, on_output):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        line = line.decode("utf-8", errors="replace")
+        lines.append(line)
+        if on_output is not None:
+            on_output(line.rstrip("\r\n"))
+
+
+async def _terminate_async(proc):
+    if proc.returncode is not None:
+        return
+    try:
+        proc.terminate()
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(proc.wait(), TERMINATE_GRACE)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+
+
+async def run_imagecomp_async(cmd, on_output=None, timeout=None):
+    """run_imagecomp 的 asyncio 版本，子进程和输出管道都由事件循环管理，不占用线程
+
+    超过 timeout 秒抛出 subprocess.TimeoutExpired；所在任务被取消时
+    （asyncio.CancelledError）同样先结束子进程。子进程由事件循环回收，
+    拿不到 rusage，返回值的 cpu_time 和 peak_rss 总是 None。
+    """
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    
+    spawn_start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.PIPE, **kwargs)
+    spawn_time = time.perf_counter() - spawn_start
+    stdout_lines = []
+    stderr_lines = []
+    pumps = asyncio.gather(_pump_async(proc.stdout, stdout_lines, on_output),
+                           _pump_async(proc.stderr, stderr_lines, on_output))
+    try:
+        try:
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        await pumps
+    except BaseException:
+        await _terminate_async(proc)
+        await asyncio.gather(pumps, return_exceptions=True)
+        raise
+    
+    completed = subprocess.CompletedProcess(cmd, proc.returncode,
+                                            "".join(stdout_lines), "".join(stderr_lines))
+    completed.spawn_time = spawn_time
+    completed.cpu_time = None
+    completed.peak_rss = None
+    return completed
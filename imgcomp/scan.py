@@ -0,0 +1,195 @@
+"""递归扫描图片文件，边扫描边产出，不需要先列出整棵目录树
+
+目录由线程池并行列出（网络共享上每次列目录都要等一次往返），每列出 CHUNK 个图片
+就交给调用方，一个目录里有上百万个文件时也不必等它列完。已列出但还没有取走的
+结果最多积压 workers 的 PREFETCH_FACTOR 倍批，调用方处理得慢时扫描也随之暂停。
+符号链接的目录按 (设备号, inode) 只进入一次，不会陷入循环。
+"""
+import fnmatch
+import os
+import queue
+import stat
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import IMAGE_EXTENSIONS
+from .process import POLL_INTERVAL
+
+DEFAULT_SCAN_WORKERS = 8
+PREFETCH_FACTOR = 4
+CHUNK = 256
+
+
+def parse_patterns(text):
+    """把 "*.jpg; raw/*" 或 "*.jpg,raw/*" 转换为 ["*.jpg", "raw/*"]"""
+    if not text:
+        return []
+    text = text.replace("；", ";").replace("，", ",").replace(";", ",")
+    return [p.strip() for p in text.split(",") if p.strip()]
+
+
+def _matches(patterns, name, rel):
+    """不含 / 的模式匹配文件名，含 / 的模式匹配相对于扫描根目录的路径（都已转为小写）"""
+    return any(fnmatch.fnmatchcase(rel if "/" in pattern else name, pattern) for pattern in patterns)
+
+
+def _is_hidden(entry):
+    if entry.name.startswith("."):
+        return True
+    if os.name != "nt":
+        return False
+    # Windows 上 scandir 已经带回了属性，不需要额外的系统调用
+    return bool(entry.stat(follow_symlinks=False).st_file_attributes & stat.FILE_ATTRIBUTE_HIDDEN)
+
+
+def _dir_key(path):
+    st = os.stat(path)
+    if st.st_ino:
+        return st.st_dev, st.st_ino
+    return os.path.normcase(os.path.realpath(path))
+
+
+def iter_images(roots, include=None, exclude=None, min_size=None, max_size=None,
+                recursive=True, hidden=False, follow_symlinks=True, exclude_dirs=(), workers=DEFAULT_SCAN_WORKERS,
+                cancel_event=None, on_error=None):
+    """递归扫描 roots（目录或文件），逐个产出图片的 (路径, 大小, 修改时间ns)
+
+    include/exclude 为通配符列表（见 _matches，不区分大小写），exclude 同样用于跳过目录；
+    min_size/max_size 为字节数，recursive 为假时只扫描 roots 本身。隐藏的文件和目录（以 . 开头，Windows 上还包括带隐藏
+    属性的）默认跳过，exclude_dirs 中的目录也跳过。产出顺序为列出的顺序，不排序。
+    直接指定的文件只检查扩展名。列不出的目录传给 on_error(路径, 异常) 后跳过。
+    关闭生成器或设置 cancel_event 即停止扫描。
+    """
+    include = [p.lower() for p in include or ()]
+    exclude = [p.lower() for p in exclude or ()]
+    exclude_dirs = {os.path.normcase(os.path.abspath(d)) for d in exclude_dirs}
+    stop = threading.Event()
+    workers = max(1, workers)
+    results = queue.Queue(maxsize=workers * PREFETCH_FACTOR)
+
+    def stopped():
+        return stop.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+    def send(item):
+        while not stopped():
+            try:
+                results.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def list_dir(path, rel):
+        files = []
+        dirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if stopped():
+                        break
+                    try:
+                        if not hidden and _is_hidden(entry):
+                            continue
+                        name = entry.name.lower()
+                        entry_rel = f"{rel}/{name}" if rel else name
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if (recursive and not _matches(exclude, name, entry_rel)
+                                    and os.path.normcase(os.path.abspath(entry.path)) not in exclude_dirs):
+                                dirs.append((entry.path, entry_rel, _dir_key(entry.path)))
+                        elif (entry.is_file() and os.path.splitext(name)[1] in IMAGE_EXTENSIONS
+                              and (not include or _matches(include, name, entry_rel))
+                              and not _matches(exclude, name, entry_rel)):
+                            st = entry.stat()
+                            if ((min_size is None or st.st_size >= min_size)
+                                    and (max_size is None or st.st_size <= max_size)):
+                                files.append((entry.path, st.st_size, st.st_mtime_ns))
+                    except OSError:
+                        continue
+                    if len(files) >= CHUNK:
+                        send((None, files, None))
+                        files = []
+        except Exception as e:
+            send((path, files, e))
+            return
+        send((path, files, dirs))
+
+    visited = set()
+    todo = deque()
+    for root in [roots] if isinstance(roots, (str, os.PathLike)) else roots:
+        root = os.fspath(root)
+        try:
+            if os.path.isdir(root):
+                key = _dir_key(root)
+                if key not in visited:
+                    visited.add(key)
+                    todo.append((root, ""))
+            elif os.path.splitext(root)[1].lower() in IMAGE_EXTENSIONS:
+                st = os.stat(root)
+                yield root, st.st_size, st.st_mtime_ns
+        except OSError as e:
+            if on_error is not None:
+                on_error(root, e)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    running = 0
+    try:
+        while (todo or running) and not stopped():
+            while todo and running < workers:
+                executor.submit(list_dir, *todo.popleft())
+                running += 1
+            try:
+                path, files, dirs = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            yield from files
+            if path is None:
+                continue
+            running -= 1
+            if isinstance(dirs, Exception):
+                if on_error is not None:
+                    on_error(path, dirs)
+                continue
+            for dir_path, dir_rel, key in dirs:
+                if key not in visited:
+                    visited.add(key)
+                    todo.append((dir_path, dir_rel))
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ScanFeed:
+    """扫描结果的线程安全缓冲：扫描线程 put，任意个读取方各自从头 follow
+
+    follow 是一个生成器，已有的结果立即产出，之后等待新结果，直到 close 为止，
+    可以把一次仍在进行的扫描同时交给队列面板和压缩线程。
+    """
+
+    def __init__(self):
+        self.items = []
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, items):
+        with self.condition:
+            self.items.extend(items)
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def follow(self, start=0, cancel_event=None):
+        index = start
+        while True:
+            with self.condition:
+                while index >= len(self.items) and not self.closed:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    self.condition.wait(POLL_INTERVAL)
+                batch = self.items[index:]
+                if not batch and self.closed:
+                    return
+            index += len(batch)
+            yield from batch
@@ -0,0 +1,175 @@
+"""目标大小 / 大小范围 / 视觉质量模式的质量搜索"""
+import bisect
+import math
+
+MIN_QUALITY = 1
+MAX_QUALITY = 100
+TRIAL_QUALITIES = (10, 30, 50, 70, 85, 95)  # 缩略图试编码使用的质量
+TRIAL_PIXELS = 256 * 256  # 缩略图大约的像素数
+TRIAL_MIN_PIXELS = 1024 * 1024  # 原图小于该像素数时不做试编码
+TARGET_TOLERANCE = 0.05  # 目标大小模式下，结果在目标的 95%-100% 内即可停止
+DEFAULT_MIN_SSIM = 0.97  # 视觉质量模式的默认 SSIM 下限（在缩小后的图上计算，比全尺寸宽松）
+
+
+class SizeCurve:
+    """质量 -> 预测大小的分段线性曲线，由缩略图试编码得到
+
+    scale 为放大到原图的系数，每次真实编码后用 calibrate 修正。
+    """
+
+    def __init__(self, points, scale):
+        self.points = sorted(points)
+        self.scale = scale
+
+    def size_at(self, quality):
+        qs = [q for q, _ in self.points]
+        i = bisect.bisect_left(qs, quality)
+        if i == 0:
+            return self.points[0][1] * self.scale
+        if i == len(qs):
+            return self.points[-1][1] * self.scale
+        (q0, s0), (q1, s1) = self.points[i - 1], self.points[i]
+        return (s0 + (s1 - s0) * (quality - q0) / (q1 - q0)) * self.scale
+
+    def quality_for(self, size):
+        """预测大小不超过 size 的最高质量"""
+        best = MIN_QUALITY
+        for q in range(MIN_QUALITY, MAX_QUALITY + 1):
+            if self.size_at(q) <= size:
+                best = q
+        return best
+
+    def calibrate(self, quality, actual_size):
+        predicted = self.size_at(quality)
+        if predicted > 0:
+            self.scale *= actual_size / predicted
+
+
+def trial_curve(img, make_encoder, fmt):
+    """对缩小后的图像做几次试编码，预测原图的大小-质量曲线
+
+    原图较小时返回 None，直接二分反而更快。
+    """
+    pixels = img.width * img.height
+    if pixels < TRIAL_MIN_PIXELS:
+        return None
+    factor = (pixels / TRIAL_PIXELS) ** 0.5
+    small = img.resize((max(1, round(img.width / factor)), max(1, round(img.height / factor))))
+    encode = make_encoder(small, fmt)
+    points = [(q, len(encode(q))) for q in TRIAL_QUALITIES]
+    return SizeCurve(points, pixels / (small.width * small.height))
+
+
+class QualitySearch:
+    """查找输出不超过 max_bytes 的最高质量
+
+    每个质量最多编码一次，但只保留满足上限的最高质量那一份编码结果，
+    其余结果只记录大小，大图多次尝试时内存占用不随次数增长。给出 min_bytes（大小范围模式）
+    时，落入 [min_bytes, max_bytes] 即停止；否则结果达到 max_bytes 的
+    (1 - tolerance) 即停止。下一个质量优先在已编码的上下界之间按
+    log(大小) 插值，没有上下界时用预测曲线；插值没能让区间减半时退化为二分。
+    """
+
+    def __init__(self, encode, max_bytes, min_bytes=None, curve=None,
+                 tolerance=TARGET_TOLERANCE):
+        self._encode = encode
+        self.max_bytes = max_bytes
+        self.min_bytes = min_bytes if min_bytes is not None else max_bytes * (1 - tolerance)
+        self.aim = (self.min_bytes + self.max_bytes) / 2
+        self.curve = curve
+        self.sizes = {}  # 质量 -> 输出大小
+        self.best = None  # (质量, 编码结果)，目前不超过上限的最高质量
+        self._lowest = None  # 最低质量超过上限时它的编码结果，作为没有满足上限时的返回值
+
+    @property
+    def attempts(self):
+        return len(self.sizes)
+
+    def encode(self, quality):
+        """返回该质量的输出大小"""
+        if quality not in self.sizes:
+            data = self._encode(quality)
+            self.sizes[quality] = len(data)
+            if len(data) <= self.max_bytes and (self.best is None or quality > self.best[0]):
+                self.best = (quality, data)
+            elif quality == MIN_QUALITY:
+                self._lowest = (quality, data)
+        return self.sizes[quality]
+
+    def _interpolate(self, lo, hi):
+        below, above = self.sizes.get(lo - 1), self.sizes.get(hi + 1)
+        if below is not None and above is not None:
+            s0, s1 = math.log(max(below, 1)), math.log(max(above, 1))
+            if s1 > s0:
+                t = (math.log(self.aim) - s0) / (s1 - s0)
+                return round(lo - 1 + t * (hi - lo + 2))
+        if self.curve is not None:
+            return self.curve.quality_for(self.aim)
+        return None
+
+    def solve(self):
+        """返回 (质量, 编码结果)；最低质量也超过上限时返回最低质量的结果"""
+        lo, hi = MIN_QUALITY, MAX_QUALITY
+        bisect_next = False
+        while lo <= hi:
+            width = hi - lo
+            q = None if bisect_next else self._interpolate(lo, hi)
+            q = (lo + hi) // 2 if q is None else min(max(q, lo), hi)
+            size = self.encode(q)
+            if self.curve is not None:
+                self.curve.calibrate(q, size)
+            if size <= self.max_bytes:
+                if size >= self.min_bytes:
+                    break
+                lo = q + 1
+            else:
+                hi = q - 1
+            bisect_next = not bisect_next and (hi - lo) > width // 2
+        if self.best is None:
+            self.encode(MIN_QUALITY)  # 循环结束时最低质量一定已编码过，不会再次编码
+            return self._lowest
+        return self.best
+
+
+class VisualSearch:
+    """查找输出与原图的 SSIM 不低于 min_score 的最低质量
+
+    假设 SSIM 随质量单调上升，在 [MIN_QUALITY, MAX_QUALITY] 上二分，约 7 次编码。
+    与 QualitySearch 一样只保留目前满足下限的最低质量那一份编码结果。
+    """
+
+    def __init__(self, encode, score, min_score=DEFAULT_MIN_SSIM):
+        self._encode = encode
+        self._score = score
+        self.min_score = min_score
+        self.scores = {}  # 质量 -> SSIM
+        self.best = None  # (质量, 编码结果, SSIM)，目前满足下限的最低质量
+        self._highest = None  # 最高质量仍不满足下限时使用
+
+    @property
+    def attempts(self):
+        return len(self.scores)
+
+    def passes(self, quality):
+        if quality not in self.scores:
+            data = self._encode(quality)
+            score = self._score(data)
+            self.scores[quality] = score
+            if score >= self.min_score and (self.best is None or quality < self.best[0]):
+                self.best = (quality, data, score)
+            elif quality == MAX_QUALITY:
+                self._highest = (quality, data, score)
+        return self.scores[quality] >= self.min_score
+
+    def solve(self):
+        """返回 (质量, 编码结果, SSIM)；最高质量也达不到下限时返回最高质量的结果"""
+        lo, hi = MIN_QUALITY, MAX_QUALITY
+        while lo < hi:
+            q = (lo + hi) // 2
+            if self.passes(q):
+                hi = q
+            else:
+                lo = q + 1
+        if not self.passes(lo) and self.best is None:
+            return self._highest
+        return self.best
@@ -0,0 +1,247 @@
+"""多进程 / 多机分片：多个 worker 通过共享目录中的租约文件领取任务
+
+共享目录结构：
+
+    queue.jsonl     任务清单，每行 {"id", "input_file", "output_file"}
+    params.json     压缩参数
+    leases/<id>     租约，持有者定期更新修改时间（心跳）
+    done/<id>.json  已完成任务的 CompressResult
+    failed/<id>.json
+
+用 O_CREAT | O_EXCL 创建租约文件来领取任务，同一时刻只有一个 worker 成功。
+持有者退出或宕机后心跳停止，超过 lease_ttl 的租约会被其他 worker 回收。
+所有机器上的输入、输出路径必须指向同一位置（例如都挂载在相同路径的共享存储）。
+"""
+import hashlib
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import compress_file
+
+QUEUE_FILE = "queue.jsonl"
+PARAMS_FILE = "params.json"
+LEASE_DIR = "leases"
+DONE_DIR = "done"
+FAILED_DIR = "failed"
+DEFAULT_LEASE_TTL = 60.0  # 秒；各机器的时钟误差需要远小于这个值
+
+
+def job_id(input_file, output_file):
+    return hashlib.sha1(f"{input_file}\0{output_file}".encode("utf-8")).hexdigest()
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def submit(workdir, jobs, params):
+    """把 [(input_file, output_file), ...] 写入共享目录，返回任务数
+
+    重复提交会替换任务清单，已完成的标记保留，相同的任务不会重做。
+    """
+    for name in (LEASE_DIR, DONE_DIR, FAILED_DIR):
+        os.makedirs(os.path.join(workdir, name), exist_ok=True)
+    _write_json(os.path.join(workdir, PARAMS_FILE), params)
+    lines = []
+    for input_file, output_file in jobs:
+        input_file, output_file = os.path.abspath(input_file), os.path.abspath(output_file)
+        lines.append(json.dumps({"id": job_id(input_file, output_file),
+                                 "input_file": input_file, "output_file": output_file},
+                                ensure_ascii=False))
+    path = os.path.join(workdir, QUEUE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+    return len(lines)
+
+
+def load_queue(workdir):
+    with open(os.path.join(workdir, QUEUE_FILE), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def status(workdir):
+    """返回 {"total", "done", "failed", "leased"}"""
+    ids = {job["id"] for job in load_queue(workdir)}
+
+    def count(name, suffix=""):
+        try:
+            names = os.listdir(os.path.join(workdir, name))
+        except OSError:
+            return 0
+        return sum(1 for n in names if n.endswith(suffix) and n[:len(n) - len(suffix)] in ids)
+    return {"total": len(ids), "done": count(DONE_DIR, ".json"),
+            "failed": count(FAILED_DIR, ".json"), "leased": count(LEASE_DIR)}
+
+
+class ShardWorker:
+    """从共享目录领取并执行任务，一个进程内用 workers 个线程并发
+
+    每台机器（或每个进程）运行一个 ShardWorker 即可，吞吐量随 worker 数量
+    近似线性增长，瓶颈在共享存储。
+    """
+
+    def __init__(self, workdir, workers=None, lease_ttl=DEFAULT_LEASE_TTL, cache=None,
+                 timeout=None, on_output=None, worker_id=None):
+        self.workdir = workdir
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.lease_ttl = lease_ttl
+        self.cache = cache
+        self.timeout = timeout
+        self.on_output = on_output
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        with open(os.path.join(workdir, PARAMS_FILE), "r", encoding="utf-8") as f:
+            self.params = json.load(f)
+        if self.params.get("size_range"):
+            self.params["size_range"] = tuple(self.params["size_range"])
+        self.held = set()  # 当前持有的租约路径
+        self._lock = threading.Lock()
+
+    def _path(self, directory, jid, suffix=""):
+        return os.path.join(self.workdir, directory, jid + suffix)
+
+    def finished(self, jid):
+        return (os.path.exists(self._path(DONE_DIR, jid, ".json"))
+                or os.path.exists(self._path(FAILED_DIR, jid, ".json")))
+
+    def claim(self, jid):
+        """尝试领取任务，成功返回 True"""
+        path = self._path(LEASE_DIR, jid)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._reclaim(path):
+                    return False
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.worker_id)
+            with self._lock:
+                self.held.add(path)
+            return True
+        return False
+
+    def _reclaim(self, path):
+        """租约过期时把它移走；多个 worker 同时回收时 rename 只有一个成功"""
+        stale = f"{path}.{self.worker_id}.{threading.get_ident()}.stale"
+        try:
+            if time.time() - os.stat(path).st_mtime < self.lease_ttl:
+                return False
+            os.rename(path, stale)
+        except OSError:
+            return False
+        try:
+            if time.time() - os.stat(stale).st_mtime < self.lease_ttl:
+                # 移走的是别人刚刚重新创建的租约，放回原处
+                try:
+                    os.link(stale, path)
+                except OSError:
+                    pass
+                return False
+            return True
+        finally:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def release(self, jid):
+        path = self._path(LEASE_DIR, jid)
+        with self._lock:
+            self.held.discard(path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _heartbeat(self, stop_event):
+        while not stop_event.wait(self.lease_ttl / 3):
+            with self._lock:
+                paths = list(self.held)
+            for path in paths:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+
+    def _process(self, job, cancel_event):
+        jid = job["id"]
+        if not self.claim(jid):
+            return None
+        try:
+            if self.finished(jid):  # 另一个 worker 刚刚完成
+                return None
+            os.makedirs(os.path.dirname(job["output_file"]), exist_ok=True)
+            on_output = None
+            if self.on_output is not None:
+                on_output = lambda line: self.on_output(job["input_file"], line)
+            result = compress_file(job["input_file"], job["output_file"], cache=self.cache,
+                                   on_output=on_output, timeout=self.timeout,
+                                   cancel_event=cancel_event, **self.params)
+            if result.success:
+                _write_json(self._path(DONE_DIR, jid, ".json"), result.to_dict())
+            elif not cancel_event.is_set():
+                data = result.to_dict()
+                data["worker"] = self.worker_id
+                _write_json(self._path(FAILED_DIR, jid, ".json"), data)
+            return result
+        finally:
+            self.release(jid)
+
+    def run(self, cancel_event=None):
+        """领取任务直到全部完成，按完成顺序产出本 worker 处理的 CompressResult
+
+        其他 worker 持有的任务会等到完成或租约过期后回收。与 compress_files 相同，
+        提前结束时先设置 cancel_event 再关闭生成器，运行中的任务会被终止。
+        """
+        cancel_event = cancel_event or threading.Event()
+        jobs = load_queue(self.workdir)
+        # 各 worker 从清单的不同位置开始领取，减少争抢
+        if jobs:
+            start = int(hashlib.sha1(self.worker_id.encode("utf-8")).hexdigest(), 16) % len(jobs)
+            jobs = jobs[start:] + jobs[:start]
+        stop_heartbeat = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(stop_heartbeat,), daemon=True).start()
+        results = queue.Queue()
+        try:
+            while not cancel_event.is_set():
+                jobs = [job for job in jobs if not self.finished(job["id"])]
+                if not jobs:
+                    return
+                pending = iter(jobs)
+                pending_lock = threading.Lock()
+
+                def drain():
+                    while not cancel_event.is_set():
+                        with pending_lock:
+                            job = next(pending, None)
+                        if job is None:
+                            break
+                        result = self._process(job, cancel_event)
+                        if result is not None:
+                            results.put(result)
+                    results.put(None)
+
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    for _ in range(self.workers):
+                        executor.submit(drain)
+                    running = self.workers
+                    while running:
+                        result = results.get()
+                        if result is None:
+                            running -= 1
+                        else:
+                            yield result
+                # 剩下的任务由其他 worker 持有，等待它们完成或租约过期
+                cancel_event.wait(min(1.0, self.lease_ttl / 4))
+        finally:
+            stop_heartbeat.set()
@@ -0,0 +1,59 @@
+"""视觉质量模式的 SSIM 计算，需要 NumPy
+
+SSIM 在缩小后的亮度通道上计算：长边缩小到不超过 SSIM_MAX_SIDE（整数倍盒式缩小），
+窗口为 SSIM_WINDOW x SSIM_WINDOW 的均值窗口，所有窗口的均值和方差由积分图一次算出。
+"""
+import io
+
+import numpy as np
+
+from .backends import to_8bit
+
+SSIM_MAX_SIDE = 1024
+SSIM_WINDOW = 7
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def _luma(img, factor):
+    """转为亮度并按 factor 整数倍缩小，返回 float64 数组；16 位灰度先缩放到 8 位"""
+    gray = to_8bit(img).convert("L")
+    if factor > 1:
+        gray = gray.reduce(factor)
+    return np.asarray(gray, dtype=np.float64)
+
+
+def _window_means(a):
+    """a 中每个 SSIM_WINDOW x SSIM_WINDOW 窗口的均值（valid 区域）"""
+    w = SSIM_WINDOW
+    c = np.zeros((a.shape[0] + 1, a.shape[1] + 1))
+    np.cumsum(np.cumsum(a, axis=0), axis=1, out=c[1:, 1:])
+    return (c[w:, w:] - c[:-w, w:] - c[w:, :-w] + c[:-w, :-w]) / (w * w)
+
+
+class SSIMReference:
+    """原图的亮度与窗口统计，score 对每个编码结果只需再解码和计算一次"""
+
+    def __init__(self, img, max_side=SSIM_MAX_SIDE):
+        self.size = img.size
+        self.factor = max(1, -(-max(img.size) // max_side))
+        self.x = _luma(img, self.factor)
+        self.mu_x = _window_means(self.x)
+        self.var_x = _window_means(self.x * self.x) - self.mu_x * self.mu_x
+
+    def score(self, data):
+        """编码结果 data（bytes 或 memoryview）与原图的平均 SSIM，1 为完全相同"""
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as decoded:
+            if decoded.size != self.size:
+                raise ValueError(f"编码结果尺寸 {decoded.size} 与原图 {self.size} 不一致")
+            y = _luma(decoded, self.factor)
+        if min(y.shape) < SSIM_WINDOW:
+            return 1.0 if np.array_equal(self.x, y) else float(1 - np.abs(self.x - y).mean() / 255)
+        mu_y = _window_means(y)
+        var_y = _window_means(y * y) - mu_y * mu_y
+        cov = _window_means(self.x * y) - self.mu_x * mu_y
+        ssim_map = ((2 * self.mu_x * mu_y + _C1) * (2 * cov + _C2)) / (
+            (self.mu_x * self.mu_x + mu_y * mu_y + _C1) * (self.var_x + var_y + _C2))
+        return float(ssim_map.mean())
@@ -0,0 +1,237 @@
+"""多尺寸版本（响应式图片）：源图只解码一次，缩放到多个宽度并以多种格式并行编码
+
+需要 Pillow，与所选压缩引擎无关。
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .backends import (DEFAULT_QUALITY, _import_pillow, _make_encoder, _write_atomic,
+                       is_animated)
+from .core import CompressResult
+from .mapped import MappedFile
+from .process import JobCancelled
+
+DEFAULT_WIDTHS = (320, 640, 1280, None)  # None 为原始宽度
+DEFAULT_FORMATS = ("JPEG", "WEBP")
+DEFAULT_NAME_TEMPLATE = "{stem}_{label}.{ext}"
+FULL_LABEL = "full"
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png"}
+_FORMAT_ALIASES = {"JPG": "JPEG", "JPEG": "JPEG", "WEBP": "WEBP", "PNG": "PNG"}
+REDUCING_GAP = 3.0  # 先按整数倍快速缩小再用 LANCZOS，画质与直接 LANCZOS 几乎相同
+
+
+def parse_widths(values):
+    """把 ["320", "640", "full"] 或 "320,640,full" 转换为 (320, 640, None)"""
+    if isinstance(values, str):
+        values = values.replace("，", ",").replace(",", " ").split()
+    widths = []
+    for value in values:
+        value = str(value).strip().lower()
+        if value in (FULL_LABEL, "原图", "0"):
+            widths.append(None)
+            continue
+        try:
+            width = int(value)
+        except ValueError:
+            raise ValueError(f"无效的宽度: {value}")
+        if width <= 0:
+            raise ValueError(f"无效的宽度: {value}")
+        widths.append(width)
+    if not widths:
+        raise ValueError("至少需要一个宽度")
+    return tuple(widths)
+
+
+def parse_formats(values):
+    """把 ["jpg", "webp"] 或 "jpg,webp" 转换为 ("JPEG", "WEBP")"""
+    if isinstance(values, str):
+        values = values.replace("，", ",").replace(",", " ").split()
+    formats = []
+    for value in values:
+        fmt = _FORMAT_ALIASES.get(str(value).strip().upper())
+        if fmt is None:
+            raise ValueError(f"不支持的格式: {value}（可选 jpeg、webp、png）")
+        if fmt not in formats:
+            formats.append(fmt)
+    if not formats:
+        raise ValueError("至少需要一种格式")
+    return tuple(formats)
+
+
+def variant_name(input_file, label, width, fmt, template=DEFAULT_NAME_TEMPLATE):
+    """按模板生成文件名
+
+    可用字段：{stem} 原文件名（不含扩展名）、{label} 宽度标签（如 640w 或 full）、
+    {width} 实际像素宽度、{ext} 扩展名、{format} 格式名（小写）。
+    """
+    try:
+        name = template.format(stem=Path(input_file).stem, label=label, width=width,
+                               ext=FORMAT_EXTENSIONS[fmt], format=fmt.lower())
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f"无效的命名模板 {template!r}: {e}")
+    if not name or os.path.basename(name) != name:
+        raise ValueError(f"命名模板生成的文件名无效: {name!r}")
+    return name
+
+
+def check_template(template):
+    """命名模板可用时返回 None，否则返回错误信息"""
+    try:
+        names = {variant_name("a.jpg", label, width, fmt, template)
+                 for label, width in (("640w", 640), (FULL_LABEL, 1000)) for fmt in FORMAT_EXTENSIONS}
+    except ValueError as e:
+        return str(e)
+    if len(names) < 2 * len(FORMAT_EXTENSIONS):
+        return "命名模板需要包含 {label} 或 {width}，以及 {ext} 或 {format}，否则输出会互相覆盖"
+    return None
+
+
+def plan_variants(widths, source_width):
+    """返回 [(label, width), ...]，按宽度从小到大；不放大，超过原图宽度的尺寸跳过"""
+    plan = {}
+    for width in widths:
+        if width is None:
+            plan[source_width] = FULL_LABEL
+        elif width < source_width:
+            plan.setdefault(width, f"{width}w")
+    return [(label, width) for width, label in sorted(plan.items())]
+
+
+def compress_variants(input_file, output_dir=None, widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS,
+                      quality=None, webp_quality=None, template=DEFAULT_NAME_TEMPLATE,
+                      workers=None, on_output=None, cancel_event=None, executor=None):
+    """生成一张图片的全部版本，按 (宽度, 格式) 的顺序返回 CompressResult 列表
+
+    源图解码一次并按 EXIF 方向旋转，各宽度的缩放和编码在线程池中并行执行
+    （Pillow 在缩放和编码时释放 GIL）。output_dir 默认为原文件所在目录。
+    quality 默认为 80，webp_quality 默认与 quality 相同。
+    传入 executor 时使用它而不是新建线程池，见 compress_variant_files。
+    """
+    start = time.perf_counter()
+    output_dir = output_dir or os.path.dirname(os.path.abspath(input_file))
+    quality = quality if quality is not None else DEFAULT_QUALITY
+    qualities = {"JPEG": quality, "PNG": quality, "WEBP": webp_quality or quality}
+    if cancel_event is None:
+        cancel_event = threading.Event()
+
+    def failed(message, output_file=""):
+        return CompressResult(input_file, output_file, False, message,
+                              elapsed=time.perf_counter() - start)
+
+    try:
+        Image = _import_pillow()
+        with MappedFile(input_file) as source:
+            with Image.open(source.stream()) as img:
+                img.load()
+                if is_animated(img):
+                    return [failed("动图不支持生成多尺寸版本（缩放只会保留第一帧）")]
+                source.release_pages()
+                original_size = source.size
+                header = source.header()
+                if header is not None and header.orientation != 1:
+                    from PIL import ImageOps
+                    img = ImageOps.exif_transpose(img)
+                plan = plan_variants(widths, img.width)
+                if on_output is not None:
+                    on_output(f"已解码 {img.width}x{img.height}，生成 "
+                              f"{', '.join(label for label, _ in plan)} × "
+                              f"{', '.join(fmt.lower() for fmt in formats)}")
+                return _run_variants(img, plan, formats, qualities, input_file, output_dir,
+                                     template, original_size, workers, on_output, cancel_event,
+                                     executor, start)
+    except JobCancelled:
+        return [failed("已取消")]
+    except Exception as e:
+        return [failed(f"执行错误: {str(e)}")]
+
+
+def _run_variants(img, plan, formats, qualities, input_file, output_dir, template,
+                  original_size, workers, on_output, cancel_event, executor, start):
+    from PIL import Image
+
+    def check():
+        if cancel_event.is_set():
+            raise JobCancelled()
+
+    def resize(width):
+        check()
+        if width == img.width:
+            return img
+        height = max(1, round(img.height * width / img.width))
+        return img.resize((width, height), Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+    def encode(resized, label, fmt):
+        output_file = os.path.join(output_dir, variant_name(input_file, label, resized.width,
+                                                            fmt, template))
+        encode_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            check()
+            data = _make_encoder(resized, fmt)(qualities[fmt])
+            check()
+            _write_atomic(output_file, data)
+        except JobCancelled:
+            return CompressResult(input_file, output_file, False, "已取消",
+                                  elapsed=time.perf_counter() - start)
+        except Exception as e:
+            return CompressResult(input_file, output_file, False, f"{label} {fmt} 编码失败: {str(e)}",
+                                  elapsed=time.perf_counter() - start)
+        result = CompressResult(input_file, output_file, True,
+                                f"{resized.width}x{resized.height} {fmt}", original_size, len(data),
+                                time.perf_counter() - start, attempts=1,
+                                encode_time=time.perf_counter() - encode_start,
+                                cpu_time=time.thread_time() - cpu_start)
+        if on_output is not None:
+            on_output(f"{os.path.basename(output_file)}: {result.message}, {len(data) / 1024:.1f} KB")
+        return result
+
+    def encode_when_resized(resized_future, label, fmt):
+        try:
+            resized = resized_future.result()
+        except JobCancelled:
+            return CompressResult(input_file, "", False, "已取消", elapsed=time.perf_counter() - start)
+        except Exception as e:
+            return CompressResult(input_file, "", False, f"{label} 缩放失败: {str(e)}",
+                                  elapsed=time.perf_counter() - start)
+        return encode(resized, label, fmt)
+
+    os.makedirs(output_dir, exist_ok=True)
+    own_executor = executor is None
+    if own_executor:
+        workers = max(1, workers or os.cpu_count() or 1)
+        executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        # 先提交全部缩放任务，编码任务排在它们之后，等待缩放结果时不会占满线程池
+        resized = [(label, executor.submit(resize, width)) for label, width in plan]
+        futures = [executor.submit(encode_when_resized, future, label, fmt)
+                   for label, future in resized for fmt in formats]
+        return [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def compress_variant_files(jobs, widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS, quality=None,
+                           webp_quality=None, template=DEFAULT_NAME_TEMPLATE, workers=None,
+                           on_output=None, cancel_event=None, parallel_files=2):
+    """为多张图片生成版本，按完成顺序产出 (input_file, [CompressResult, ...])
+
+    jobs 为 [(input_file, output_dir), ...]。同一时间最多解码 parallel_files 张源图，
+    它们的缩放和编码共用一个 workers 大小的线程池。on_output 的回调参数为 (input_file, line)。
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    cancel_event = cancel_event or threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            ThreadPoolExecutor(max_workers=max(1, parallel_files)) as decoders:
+        futures = {
+            decoders.submit(compress_variants, input_file, output_dir, widths, formats, quality,
+                            webp_quality, template, workers,
+                            None if on_output is None else (lambda line, f=input_file: on_output(f, line)),
+                            cancel_event, executor): input_file
+            for input_file, output_dir in jobs
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
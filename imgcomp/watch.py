@@ -0,0 +1,139 @@
+"""监控文件夹，增量压缩新增或修改的图片"""
+import json
+import os
+import threading
+import time
+
+from .core import compress_files, default_output_name
+from .scan import iter_images
+
+STATE_FILE_NAME = ".imgcomp_watch.json"
+DEFAULT_INTERVAL = 2.0  # 扫描间隔（秒）
+DEFAULT_SETTLE = 2.0  # 大小和修改时间保持不变多久才认为文件已写完（秒）
+
+
+def scan_images(root, exclude=None):
+    """递归列出 root 下的图片，返回 {路径: (大小, 修改时间ns)}，不进入符号链接的目录"""
+    return {path: (size, mtime) for path, size, mtime in
+            iter_images([root], follow_symlinks=False, exclude_dirs=[exclude] if exclude else ())}
+
+
+class FolderWatcher:
+    """轮询监控一个或多个输入目录，把新图片压缩到输出目录的对应位置
+
+    每个输入目录的文件输出到 <output_dir>/<输入目录名>/<相对路径>。
+    已处理文件的大小、修改时间和压缩参数记录在状态文件中，重启后只处理变化的部分，
+    参数改变后全部重新压缩；从输入目录中消失的文件同时从状态中删除。
+    文件在 settle 秒内大小和修改时间都没变化才会被压缩，避免处理写了一半的文件。
+    """
+
+    def __init__(self, roots, output_dir, params, state_file=None, interval=DEFAULT_INTERVAL,
+                 settle=DEFAULT_SETTLE, workers=None, cache=None, timeout=None, on_result=None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.output_dir = os.path.abspath(output_dir)
+        self.params = params
+        self.params_key = json.dumps(params, sort_keys=True)  # 与 jobs.job_signature 相同
+        self.state_file = state_file or os.path.join(self.output_dir, STATE_FILE_NAME)
+        self.interval = interval
+        self.settle = settle
+        self.workers = workers
+        self.cache = cache
+        self.timeout = timeout
+        self.on_result = on_result
+        self.stop_event = threading.Event()
+        self.pending = {}  # 路径 -> (签名, 首次看到该签名的时间)
+        self.failed = {}  # 路径 -> 压缩失败时的签名，文件变化前不再重试
+        self.state = self.load_state()  # 路径 -> (大小, 修改时间ns, 参数)
+        self.dirty = False  # state 有还没保存的变化
+
+    def load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return {path: tuple(sig) for path, sig in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_file)
+        self.dirty = False
+
+    def output_for(self, root, input_file):
+        rel = os.path.relpath(os.path.dirname(input_file), root)
+        name = default_output_name(input_file, self.params.get("webp", False))
+        return os.path.normpath(os.path.join(self.output_dir, os.path.basename(root), rel, name))
+
+    def ready_jobs(self, now=None):
+        """扫描一次，返回已稳定且需要压缩的 [(输入, 输出, 签名), ...]"""
+        now = time.monotonic() if now is None else now
+        jobs = []
+        seen = set()
+        scanned = []
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue  # 暂时不可用（例如网络共享断开）时保留它的状态
+            scanned.append(root)
+            for path, (size, mtime) in scan_images(root, exclude=self.output_dir).items():
+                sig = (size, mtime, self.params_key)
+                seen.add(path)
+                if self.state.get(path) == sig or self.failed.get(path) == sig:
+                    self.pending.pop(path, None)
+                    continue
+                previous = self.pending.get(path)
+                if previous is None or previous[0] != sig:
+                    self.pending[path] = (sig, now)
+                elif now - previous[1] >= self.settle:
+                    jobs.append((path, self.output_for(root, path), sig))
+        for path in list(self.pending):
+            if path not in seen:
+                del self.pending[path]
+        self.prune(seen, scanned)
+        return jobs
+
+    def prune(self, seen, roots):
+        """删除 roots 下已经不存在的文件的记录，清空后又写满的目录不会让状态无限增长"""
+        prefixes = tuple(os.path.join(root, "") for root in roots)
+        for records in (self.state, self.failed):
+            for path in [p for p in records if p not in seen and p.startswith(prefixes)]:
+                del records[path]
+                self.dirty = self.dirty or records is self.state
+
+    def poll_once(self):
+        """处理一轮已就绪的文件，返回 CompressResult 列表"""
+        jobs = self.ready_jobs()
+        if not jobs:
+            if self.dirty:
+                self.save_state()
+            return []
+        signatures = {input_file: sig for input_file, _, sig in jobs}
+        for _, output_file, _ in jobs:
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+        results = []
+        for result in compress_files([(i, o) for i, o, _ in jobs], workers=self.workers,
+                                     cache=self.cache, timeout=self.timeout,
+                                     cancel_event=self.stop_event, **self.params):
+            if result.success:
+                self.state[result.input_file] = signatures[result.input_file]
+                self.dirty = True
+            elif not self.stop_event.is_set():
+                self.failed[result.input_file] = signatures[result.input_file]
+            self.pending.pop(result.input_file, None)
+            if self.on_result is not None:
+                self.on_result(result)
+            results.append(result)
+        if self.dirty:
+            self.save_state()
+        return results
+
+    def run(self):
+        """持续监控，直到调用 stop()"""
+        while not self.stop_event.is_set():
+            self.poll_once()
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
@@ -1,59 +1,229 @@
 import sys
+import time
+
+# 启动耗时统计（--profile-startup），需在其他导入之前记录起点
+STARTUP_TIME = time.perf_counter()
+startup_phases = []  # [(阶段名, 结束时刻), ...]
+
+def mark_startup(phase):
+    startup_phases.append((phase, time.perf_counter()))
+
 import os
 import subprocess
-import requests
-import webbrowser
 from pathlib import Path
+mark_startup("导入标准库")
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                QHBoxLayout, QLabel, QPushButton, QFileDialog, 
-                               QSlider, QSpinBox, QCheckBox, QTextEdit, 
+                               QSlider, QSpinBox, QDoubleSpinBox, QCheckBox, QTextEdit, 
                                QProgressBar, QGroupBox, QGridLayout, QMessageBox,
                                QLineEdit, QComboBox, QSplitter, QDialog, QFrame)
-from PySide6.QtCore import Qt, QThread, Signal, QSize, QTimer, QPropertyAnimation, QEasingCurve, QEvent
-from PySide6.QtGui import QPixmap, QFont, QIcon, QPalette, QColor, QCursor
+from PySide6.QtCore import (Qt, QObject, QThread, Signal, QSize, QTimer, QPropertyAnimation,
+                            QEasingCurve, QEvent, QElapsedTimer)
+from PySide6.QtGui import (QPixmap, QFont, QIcon, QPalette, QColor, QCursor, QImageReader,
+                           QPainter, QFontMetrics)
+mark_startup("导入 PySide6")
 import json
+import threading
+from imgcomp import (compress_file, compress_files, default_output_name,
+                     ResultCache, DEFAULT_CACHE_DIR, AUTO_BACKEND, BACKENDS,
+                     MetricsRecorder, DEFAULT_METRICS_FILE, JOURNAL_FILE_NAME, JobQueue,
+                     run_queue, read_header, read_headers, compress_variant_files,
+                     DEFAULT_NAME_TEMPLATE, parse_widths, parse_formats, check_template,
+                     DEFAULT_MIN_SSIM, compress_files_ordered, ScanFeed, iter_images,
+                     parse_patterns)
+from queue_panel import QueuePanel, STATUS_DONE, STATUS_FAILED, expand_paths
+mark_startup("导入 imgcomp")
 
-class AdDataThread(QThread):
-    """广告数据获取线程"""
-    data_loaded = Signal(list)
-    error_occurred = Signal(str)
+SCAN_BATCH = 2000  # 扫描文件夹时每批加入队列的文件数
+SCAN_EMIT_INTERVAL = 0.2  # 扫描结果最多积压这么多秒才加入队列
+
+class AdFetcher(QObject):
+    """广告数据与图片的异步加载：先立即给出缓存，再在后台线程中重新验证"""
+    ads_loaded = Signal(list)
+    ads_failed = Signal(str)
+    image_loaded = Signal(str, object)  # 图片地址, 图片数据
+    image_failed = Signal(str, str)  # 图片地址, 错误信息
     
-    def run(self):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # requests 导入较慢，只在广告模块启动时才加载
+        from adfetch import CachedFetcher, WorkerPool
+        self.fetcher = CachedFetcher()
+        self.pool = WorkerPool()
+    
+    def load_ads(self):
+        from adfetch import cached_ad_list
+        cached = cached_ad_list(self.fetcher)
+        if cached:
+            self.ads_loaded.emit(cached)
+        self.pool.submit(self._load_ads, cached)
+    
+    def _load_ads(self, cached):
+        from adfetch import fetch_ad_list
         try:
-            url = "http://www.firemail.wang:8880/api/admin/api/record/fetch"
-            headers = {"Content-Type": "application/json"}
-            data = {
-                "classId": 1274,
-                "syncTime": 1519297787000
-            }
-            
-            response = requests.post(url, headers=headers, json=data, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            if result.get("code") == 0 and "data" in result:
-                data_list = result["data"].get("dataList", [])
-                self.data_loaded.emit(data_list)
-            else:
-                self.error_occurred.emit(f"API返回错误: {result.get('msg', '未知错误')}")
-                
-        except requests.exceptions.RequestException as e:
-            self.error_occurred.emit(f"网络请求失败: {str(e)}")
+            data_list = fetch_ad_list(self.fetcher)
+        except Exception as e:
+            if cached is None:
+                self.ads_failed.emit(str(e))
+            return
+        if data_list != cached:
+            self.ads_loaded.emit(data_list)
+    
+    def load_image(self, url):
+        cached = self.fetcher.cached(url)
+        if cached is not None:
+            self.image_loaded.emit(url, cached)
+        self.pool.submit(self._load_image, url, cached)
+    
+    def _load_image(self, url, cached):
+        from adfetch import fetch_ad_image
+        try:
+            content = fetch_ad_image(self.fetcher, url)
         except Exception as e:
-            self.error_occurred.emit(f"获取广告数据失败: {str(e)}")
+            if cached is None:
+                self.image_failed.emit(url, str(e))
+            return
+        if content != cached:
+            self.image_loaded.emit(url, content)
+
+class MarqueeLabel(QWidget):
+    """绘制式走马灯：文字只渲染一次到缓存图，滚动时按像素偏移重绘
+
+    文字放得下时不滚动；控件隐藏、暂停（窗口最小化）或鼠标悬停时停止计时器。
+    """
+    clicked = Signal()
+    
+    SCROLL_SPEED = 90  # 像素/秒
+    FRAME_INTERVAL = 16  # 毫秒
+    GAP = 60  # 首尾之间的空白（像素）
+    TEXT_COLOR = QColor("#F00")
+    BACKGROUND_COLOR = QColor("yellow")
+    PADDING = 12
+    
+    def __init__(self, text="", parent=None):
+        super().__init__(parent)
+        font = QFont(self.font())
+        font.setPixelSize(18)
+        font.setBold(True)
+        self.setFont(font)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.text_pixmap = QPixmap()
+        self.offset = 0.0
+        self.paused = False
+        self.hovered = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.FRAME_INTERVAL)
+        self.timer.timeout.connect(self.advance)
+        self.clock = QElapsedTimer()
+        self.setText(text)
+    
+    def text(self):
+        return self._text
+    
+    def setText(self, text):
+        self._text = text
+        self.offset = 0.0
+        self.render_text()
+        self.update_timer()
+        self.update()
+    
+    def render_text(self):
+        """把文字渲染到缓存图（按屏幕缩放比例）"""
+        metrics = QFontMetrics(self.font())
+        ratio = self.devicePixelRatioF()
+        width = max(1, metrics.horizontalAdvance(self._text))
+        height = max(1, metrics.height())
+        pixmap = QPixmap(int(width * ratio), int(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setFont(self.font())
+        painter.setPen(self.TEXT_COLOR)
+        painter.drawText(0, metrics.ascent(), self._text)
+        painter.end()
+        self.text_pixmap = pixmap
+    
+    def text_width(self):
+        return self.text_pixmap.width() / self.text_pixmap.devicePixelRatio()
+    
+    def needs_scroll(self):
+        return self.text_width() > self.width() - 2 * self.PADDING
+    
+    def update_timer(self):
+        running = (self.isVisible() and not self.paused and not self.hovered
+                   and self.needs_scroll())
+        if running and not self.timer.isActive():
+            self.clock.start()
+            self.timer.start()
+        elif not running and self.timer.isActive():
+            self.timer.stop()
+    
+    def set_paused(self, paused):
+        self.paused = paused
+        self.update_timer()
+    
+    def advance(self):
+        elapsed = self.clock.restart()
+        self.offset = (self.offset + self.SCROLL_SPEED * elapsed / 1000) % (self.text_width() + self.GAP)
+        self.update()
+    
+    def paintEvent(self, event):
+        if self.text_pixmap.devicePixelRatio() != self.devicePixelRatioF():
+            self.render_text()  # 移到了缩放比例不同的屏幕
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.BACKGROUND_COLOR)
+        if self.text_pixmap.isNull():
+            return
+        y = (self.height() - self.text_pixmap.height() / self.text_pixmap.devicePixelRatio()) / 2
+        painter.setClipRect(self.rect().adjusted(self.PADDING, 0, -self.PADDING, 0))
+        x = self.PADDING - int(self.offset)
+        painter.drawPixmap(int(x), int(y), self.text_pixmap)
+        if self.needs_scroll():
+            painter.drawPixmap(int(x + self.text_width() + self.GAP), int(y), self.text_pixmap)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_timer()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_timer()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_timer()
+    
+    def enterEvent(self, event):
+        self.hovered = True  # 鼠标悬停暂停
+        self.update_timer()
+    
+    def leaveEvent(self, event):
+        self.hovered = False
+        self.update_timer()
+    
+    def mousePressEvent(self, event):
+        self.clicked.emit()
+    
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.render_text()
+            self.update()
 
 class ImageViewerDialog(QDialog):
     """图片查看器对话框"""
-    def __init__(self, image_url, parent=None):
+    def __init__(self, image_url, fetcher, parent=None):
         super().__init__(parent)
         self.setWindowTitle("图片查看")
         self.setModal(True)
         self.resize(600, 400)
+        self.image_url = image_url
+        self.fetcher = fetcher
         
         layout = QVBoxLayout(self)
         
         # 图片显示标签
-        self.image_label = QLabel()
+        self.image_label = QLabel("加载中...")
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setStyleSheet("border: 1px solid #ccc; background: white;")
         layout.addWidget(self.image_label)
@@ -63,39 +233,168 @@ class ImageViewerDialog(QDialog):
         close_btn.clicked.connect(self.close)
         layout.addWidget(close_btn)
         
-        # 加载图片
-        self.load_image(image_url)
+        # 加载图片（不阻塞界面）
+        self.fetcher.image_loaded.connect(self.on_image_loaded)
+        self.fetcher.image_failed.connect(self.on_image_failed)
+        self.fetcher.load_image(image_url)
+    
+    def on_image_loaded(self, url, content):
+        """图片数据就绪"""
+        if url != self.image_url:
+            return
+        pixmap = QPixmap()
+        pixmap.loadFromData(content)
+        
+        if not pixmap.isNull():
+            # 缩放图片以适应窗口
+            scaled_pixmap = pixmap.scaled(
+                self.size(), 
+                Qt.KeepAspectRatio, 
+                Qt.SmoothTransformation
+            )
+            self.image_label.setPixmap(scaled_pixmap)
+        else:
+            self.image_label.setText("无法加载图片")
+    
+    def on_image_failed(self, url, error):
+        if url == self.image_url:
+            self.image_label.setText(f"加载图片失败: {error}")
+    
+    def done(self, result):
+        self.fetcher.image_loaded.disconnect(self.on_image_loaded)
+        self.fetcher.image_failed.disconnect(self.on_image_failed)
+        super().done(result)
+
+class HeaderScanThread(QThread):
+    """批量读取文件头，汇总格式、像素数和扩展名不符的文件，不解码图片"""
+    summary = Signal(str)
+    
+    def __init__(self, file_paths):
+        super().__init__()
+        self.file_paths = list(file_paths)
+    
+    def run(self):
+        formats = {}
+        misnamed = []
+        unknown = 0
+        pixels = 0
+        for path, header in read_headers(self.file_paths):
+            if self.isInterruptionRequested():
+                return
+            if header is None:
+                unknown += 1
+                continue
+            formats[header.format] = formats.get(header.format, 0) + 1
+            pixels += header.width * header.height
+            if not header.extension_matches(path):
+                misnamed.append(os.path.basename(path))
+        parts = ", ".join(f"{fmt} {count} 个" for fmt, count in sorted(formats.items()))
+        text = f"文件夹概况: {parts or '无'}, 共 {pixels / 1e6:.1f} 百万像素"
+        if unknown:
+            text += f", 无法识别 {unknown} 个"
+        if misnamed:
+            text += f", 扩展名与实际格式不符 {len(misnamed)} 个: {', '.join(misnamed[:5])}"
+            if len(misnamed) > 5:
+                text += " 等"
+        self.summary.emit(text)
+
+class FolderScanThread(QThread):
+    """在后台扫描文件夹，找到的图片分批发送给队列，同时写入 feed 供压缩线程边扫描边读取"""
+    found = Signal(object, object)  # 路径列表, 大小列表
+    done = Signal(bool, str)  # 是否扫描完整个文件夹, 消息
+    
+    def __init__(self, folder, include=None, exclude=None, min_size=None, max_size=None,
+                 recursive=True):
+        super().__init__()
+        self.folder = folder
+        self.include = include
+        self.exclude = exclude
+        self.min_size = min_size
+        self.max_size = max_size
+        self.recursive = recursive
+        self.feed = ScanFeed()  # [(路径, 大小), ...]
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        self.cancel_event.set()
     
-    def load_image(self, image_url):
-        """加载图片"""
+    def run(self):
+        batch = []
+        count = 0
+        errors = 0
+        last_emit = time.perf_counter()
+        
+        def on_error(path, error):
+            nonlocal errors
+            errors += 1
+        
         try:
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-            
-            pixmap = QPixmap()
-            pixmap.loadFromData(response.content)
-            
-            if not pixmap.isNull():
-                # 缩放图片以适应窗口
-                scaled_pixmap = pixmap.scaled(
-                    self.size(), 
-                    Qt.KeepAspectRatio, 
-                    Qt.SmoothTransformation
-                )
-                self.image_label.setPixmap(scaled_pixmap)
-            else:
-                self.image_label.setText("无法加载图片")
-                
-        except Exception as e:
-            self.image_label.setText(f"加载图片失败: {str(e)}")
+            for path, size, _ in iter_images([self.folder], self.include, self.exclude,
+                                             self.min_size, self.max_size, self.recursive,
+                                             cancel_event=self.cancel_event, on_error=on_error):
+                self.feed.put([(path, size)])
+                batch.append((path, size))
+                now = time.perf_counter()
+                # 第一个文件立即发送，之后按时间合并，避免每个文件都刷新一次队列
+                if not count or len(batch) >= SCAN_BATCH or now - last_emit >= SCAN_EMIT_INTERVAL:
+                    count += len(batch)
+                    self.found.emit([path for path, _ in batch], [size for _, size in batch])
+                    batch = []
+                    last_emit = now
+            if batch:
+                count += len(batch)
+                self.found.emit([path for path, _ in batch], [size for _, size in batch])
+        finally:
+            self.feed.close()
+        if self.cancel_event.is_set():
+            self.done.emit(False, f"已停止扫描: 找到 {count} 个图片")
+            return
+        message = f"扫描完成: 找到 {count} 个图片"
+        if errors:
+            message += f", 无法读取的文件夹 {errors} 个"
+        self.done.emit(True, message)
+
+class PreviewLoaderThread(QThread):
+    """预览图加载线程，解码时直接缩小到预览尺寸，避免在内存中保留原图"""
+    loaded = Signal(int, object, object)  # 请求编号, QImage, 原始尺寸 QSize
+    failed = Signal(int, str)
+    
+    def __init__(self, request_id, file_path, target_size):
+        super().__init__()
+        self.request_id = request_id
+        self.file_path = file_path
+        self.target_size = target_size
+    
+    def run(self):
+        reader = QImageReader(self.file_path)
+        reader.setAutoTransform(True)
+        original_size = reader.size()  # 只读取文件头
+        if original_size.isValid():
+            scaled_size = original_size.scaled(self.target_size, Qt.KeepAspectRatio)
+            if scaled_size.width() < original_size.width():
+                reader.setScaledSize(scaled_size)
+        
+        if self.isInterruptionRequested():
+            return
+        image = reader.read()
+        if self.isInterruptionRequested():
+            return
+        
+        if image.isNull():
+            self.failed.emit(self.request_id, reader.errorString())
+        else:
+            self.loaded.emit(self.request_id, image, original_size)
 
 class ImageCompressorThread(QThread):
     """图片压缩线程"""
     progress = Signal(str)
+    result_ready = Signal(object)  # CompressResult
     finished = Signal(bool, str)
     
     def __init__(self, input_file, output_file, quality, webp=False, 
-                 target_size=None, size_range=None, webp_quality=100):
+                 target_size=None, size_range=None, webp_quality=100, cache=None,
+                 timeout=None, backend=None, metrics=None, preflight=True, min_saving=0,
+                 min_ssim=None, auto_format=False):
         super().__init__()
         self.input_file = input_file
         self.output_file = output_file
@@ -104,68 +403,271 @@ class ImageCompressorThread(QThread):
         self.target_size = target_size
         self.size_range = size_range
         self.webp_quality = webp_quality
+        self.cache = cache
+        self.timeout = timeout
+        self.backend = backend
+        self.metrics = metrics
+        self.preflight = preflight
+        self.min_saving = min_saving
+        self.min_ssim = min_ssim
+        self.auto_format = auto_format
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        """终止正在运行的压缩任务"""
+        self.cancel_event.set()
     
     def run(self):
-        try:
-            cmd = [get_imagecomp_path(), self.input_file, "-o", self.output_file]
-            cmd.append("--force")
-            if self.quality is not None:
-                cmd.extend(["-q", str(self.quality)])
-            
-            if self.webp:
-                cmd.append("--webp")
-                if self.webp_quality != 100:
-                    cmd.extend(["--webp-quality", str(self.webp_quality)])
-            
-            if self.target_size is not None:
-                cmd.extend(["-t", str(self.target_size)])
-            
-            if self.size_range is not None:
-                cmd.extend(["-s", str(self.size_range[0]), str(self.size_range[1])])
-            
-            self.progress.emit(f"执行命令: {' '.join(cmd)}")
-            
-            creationflags = 0
-            if sys.platform == "win32":
-                creationflags = subprocess.CREATE_NO_WINDOW
+        result = compress_file(
+            self.input_file, self.output_file, self.quality, self.webp,
+            self.target_size, self.size_range, self.webp_quality, self.cache,
+            self.progress.emit, self.timeout, self.cancel_event, self.backend,
+            preflight=self.preflight, min_saving=self.min_saving, min_ssim=self.min_ssim,
+            auto_format=self.auto_format
+        )
+        if self.cache is not None:
+            self.progress.emit(self.cache.stats_text())
+        if self.metrics is not None:
+            self.metrics.add(result)
+        if result.success and not result.cached and not result.skipped:
+            self.progress.emit(result.metrics_text())
+        self.result_ready.emit(result)
+        
+        if result.skipped:
+            self.finished.emit(True, result.summary())
+        elif result.success:
+            self.finished.emit(True, "压缩完成！(缓存命中)" if result.cached else "压缩完成！")
+        else:
+            self.finished.emit(False, result.message)
 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                creationflags=creationflags
-            )
-            
-            if result.returncode == 0:
-                self.finished.emit(True, "压缩完成！")
-            else:
-                self.finished.emit(False, f"压缩失败: {result.stderr}")
-                
-        except Exception as e:
-            self.finished.emit(False, f"执行错误: {str(e)}")
+class BatchCompressorThread(QThread):
+    """批量压缩线程，通过有限大小的线程池并发执行压缩任务
+
+    传入 journal（任务日志路径）时，中断后再次压缩同一批文件会跳过已完成的部分，
+    失败的文件按指数退避自动重试。async_runner 为真时改为在本线程的 asyncio
+    事件循环中驱动全部子进程，结果按添加顺序返回。
+    jobs 也可以是仍在扫描的文件夹产生的迭代器，这时边扫描边压缩，总数未知，
+    不使用任务日志，也不去重。
+    """
+    progress = Signal(str)
+    file_finished = Signal(int, int, str, bool, str)  # 已完成数, 总数, 输入文件, 是否成功, 消息
+    result_ready = Signal(object)  # 每个文件的最终 CompressResult
+    finished = Signal(bool, str)
+    
+    def __init__(self, jobs, quality, webp=False, target_size=None,
+                 size_range=None, webp_quality=100, workers=None, cache=None,
+                 timeout=None, backend=None, metrics=None, journal=None, preflight=True,
+                 min_saving=0, min_ssim=None, auto_format=False, async_runner=False,
+                 cancel_event=None):
+        super().__init__()
+        self.streaming = not isinstance(jobs, (list, tuple))
+        self.jobs = jobs if self.streaming else list(jobs)  # [(input_file, output_file), ...]
+        self.quality = quality
+        self.webp = webp
+        self.target_size = target_size
+        self.size_range = size_range
+        self.webp_quality = webp_quality
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.cache = cache
+        self.timeout = timeout
+        self.backend = backend
+        self.metrics = metrics
+        self.journal = journal
+        self.preflight = preflight
+        self.min_saving = min_saving
+        self.min_ssim = min_ssim
+        self.auto_format = auto_format
+        self.async_runner = async_runner
+        self.cancel_event = cancel_event or threading.Event()
+    
+    def cancel(self):
+        """终止运行中的任务并跳过所有排队任务"""
+        self.cancel_event.set()
+    
+    def emit_output(self, input_file, line):
+        self.progress.emit(f"{os.path.basename(input_file)}: {line}")
+    
+    def run(self):
+        total = None if self.streaming else len(self.jobs)
+        if total == 0:
+            self.finished.emit(False, "没有需要压缩的图片")
+            return
+        
+        if self.streaming:
+            self.progress.emit(f"开始批量压缩: 文件夹仍在扫描，边扫描边压缩（不使用任务日志，不去重）, "
+                               f"并行任务数 {self.workers}" + (", 异步调度" if self.async_runner else ""))
+        else:
+            self.progress.emit(f"开始批量压缩: 共 {total} 个文件, 并行任务数 {self.workers}"
+                               + (", 异步调度" if self.async_runner else ""))
+        failed = 0
+        done = 0
+        runner = compress_files_ordered if self.async_runner else compress_files
+        queue = None
+        if self.journal and not self.streaming:
+            queue = JobQueue(self.journal)
+            done = queue.add(self.jobs, {
+                "quality": self.quality, "webp": self.webp, "target_size": self.target_size,
+                "size_range": self.size_range, "webp_quality": self.webp_quality,
+                "backend": self.backend, "preflight": self.preflight,
+                "min_saving": self.min_saving, "min_ssim": self.min_ssim,
+                "auto_format": self.auto_format,
+            })
+            if done:
+                self.progress.emit(f"跳过上次已完成的 {done} 个文件")
+            # 跳过的文件同样发出结果，队列中不会一直显示为等待
+            for count, job in enumerate(queue.completed(self.jobs), 1):
+                result = job.result()
+                self.result_ready.emit(result)
+                self.file_finished.emit(count, total, result.input_file, True, result.summary())
+            results = run_queue(queue, self.workers, self.cache, self.emit_output, self.timeout,
+                                self.cancel_event, quality=self.quality, webp=self.webp,
+                                target_size=self.target_size, size_range=self.size_range,
+                                webp_quality=self.webp_quality, backend=self.backend,
+                                preflight=self.preflight, min_saving=self.min_saving,
+                                min_ssim=self.min_ssim, auto_format=self.auto_format,
+                                runner=runner)
+        else:
+            results = ((None, result) for result in runner(
+                self.jobs, quality=self.quality, webp=self.webp, target_size=self.target_size,
+                size_range=self.size_range, webp_quality=self.webp_quality, workers=self.workers,
+                cache=self.cache, on_output=self.emit_output, timeout=self.timeout,
+                cancel_event=self.cancel_event, backend=self.backend, preflight=self.preflight,
+                min_saving=self.min_saving, min_ssim=self.min_ssim, auto_format=self.auto_format,
+                dedup=not self.streaming
+            ))
+        for job, result in results:
+            message = result.summary()
+            if self.metrics is not None:
+                self.metrics.add(result)
+                if result.success and not result.cached and not result.skipped:
+                    message += f" ({result.metrics_text()})"
+            if job is not None and job.will_retry and not self.cancel_event.is_set():
+                self.progress.emit(f"{os.path.basename(result.input_file)} 失败，稍后重试: {message}")
+                continue
+            done += 1
+            if not result.success:
+                failed += 1
+            self.result_ready.emit(result)
+            self.file_finished.emit(done, total or 0, result.input_file, result.success, message)
+        if queue is not None:
+            queue.close()
+        if self.streaming:
+            total = done
+        
+        if self.cache is not None:
+            self.progress.emit(self.cache.stats_text())
+        if self.metrics is not None:
+            for line in self.metrics.summary_lines():
+                self.progress.emit(line)
+        if self.cancel_event.is_set():
+            self.finished.emit(False, f"已取消批量压缩: 成功 {total - failed} 个, 失败或取消 {failed} 个")
+        elif not total:
+            self.finished.emit(False, "没有需要压缩的图片")
+        elif failed:
+            self.finished.emit(False, f"批量压缩完成: 成功 {total - failed} 个, 失败 {failed} 个")
+        else:
+            self.finished.emit(True, f"批量压缩完成: 共 {total} 个文件")
+
+class VariantCompressorThread(QThread):
+    """多尺寸版本线程：每张源图只解码一次，各宽度和格式的版本并行编码"""
+    progress = Signal(str)
+    file_finished = Signal(int, int, str, bool, str)  # 已完成数, 总数, 输入文件, 是否成功, 消息
+    finished = Signal(bool, str)
+    
+    def __init__(self, jobs, widths, formats, quality, webp_quality, template,
+                 workers=None, metrics=None):
+        super().__init__()
+        self.jobs = list(jobs)  # [(input_file, output_dir), ...]
+        self.widths = widths
+        self.formats = formats
+        self.quality = quality
+        self.webp_quality = webp_quality
+        self.template = template
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.metrics = metrics
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def emit_output(self, input_file, line):
+        self.progress.emit(f"{os.path.basename(input_file)}: {line}")
+    
+    def run(self):
+        total = len(self.jobs)
+        self.progress.emit(f"开始生成多尺寸版本: 共 {total} 个文件, 并行任务数 {self.workers}")
+        failed = 0
+        outputs = 0
+        results = compress_variant_files(self.jobs, self.widths, self.formats, self.quality,
+                                         self.webp_quality, self.template, self.workers,
+                                         self.emit_output, self.cancel_event)
+        for done, (input_file, file_results) in enumerate(results, 1):
+            success = all(result.success for result in file_results)
+            if not success:
+                failed += 1
+            parts = []
+            for result in file_results:
+                if self.metrics is not None:
+                    self.metrics.add(result)
+                if result.success:
+                    outputs += 1
+                    parts.append(f"{os.path.basename(result.output_file)} {result.compressed_size / 1024:.1f} KB")
+                else:
+                    parts.append(result.message)
+            self.file_finished.emit(done, total, input_file, success, ", ".join(parts))
+        
+        if self.cancel_event.is_set():
+            self.finished.emit(False, f"已取消: 输出 {outputs} 个文件")
+        elif failed:
+            self.finished.emit(False, f"多尺寸版本完成: 输出 {outputs} 个文件, {failed} 张图片有失败")
+        else:
+            self.finished.emit(True, f"多尺寸版本完成: {total} 张图片, 输出 {outputs} 个文件")
 
 class ImageCompressorApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.input_file = ""
         self.output_file = ""
+        self.input_files = []  # 批量模式下的输入文件列表
+        self.output_dir = ""  # 批量模式下的输出目录，为空则输出到原文件所在目录
+        self.result_cache = None
+        self.active_thread = None  # 正在运行的压缩线程
         self.original_pixmap = None
         self.compressed_pixmap = None
+        self.preview_requests = {}  # 预览位置 -> (请求编号, 加载线程)
+        self.preview_request_id = 0
+        self.preview_threads = set()  # 运行中的加载线程，结束前保持引用
+        self.header_scan_thread = None
+        self.folder_scan_thread = None  # 最近一次文件夹扫描
+        self.folder_name = ""
+        self.scan_threads = set()  # 运行中的扫描线程，结束前保持引用
 
         # 走马灯广告相关属性初始化
         self.ad_marquee_text = "【1/1】测试广告内容"
-        self.ad_marquee_index = 0
-        self.ad_marquee_timer = QTimer()
-        self.ad_marquee_timer.timeout.connect(self.update_ad_marquee)
-        self.ad_marquee_timer.start(80)  # 滚动速度，越小越快
 
         self.ad_data = []  # 广告数据
         self.current_ad_index = 0  # 当前广告索引
+        self.ad_fetcher = None
+        self.background_started = False
 
         self.init_ui()
+        mark_startup("构建界面")
         self.load_settings()
+        mark_startup("加载设置")
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.background_started:
+            # 广告等非必要模块在首次绘制之后再启动
+            self.background_started = True
+            QTimer.singleShot(0, self.start_background_services)
+    
+    def start_background_services(self):
+        """启动广告走马灯、轮播和广告数据加载"""
+        self.ad_label.setText(self.ad_marquee_text)
+        self.ad_timer.start(5000)
         self.load_ad_data()
+        mark_startup("启动广告模块")
         
     def init_ui(self):
         # 设置窗口图标
@@ -342,9 +844,13 @@ class ImageCompressorApp(QMainWindow):
         content_layout = QHBoxLayout()
         main_layout.addLayout(content_layout)
         
+        # 上方为设置和预览，下方为批量队列
+        vertical_splitter = QSplitter(Qt.Vertical)
+        content_layout.addWidget(vertical_splitter)
+        
         # 创建分割器
         splitter = QSplitter(Qt.Horizontal)
-        content_layout.addWidget(splitter)
+        vertical_splitter.addWidget(splitter)
         
         # 左侧控制面板
         left_panel = self.create_control_panel()
@@ -357,6 +863,15 @@ class ImageCompressorApp(QMainWindow):
         # 设置分割器比例
         splitter.setSizes([400, 600])
         
+        # 批量队列，可拖入图片或文件夹
+        self.queue_panel = QueuePanel()
+        self.queue_panel.files_dropped.connect(self.add_input_paths)
+        self.queue_panel.file_selected.connect(self.load_image_info)
+        self.queue_panel.cleared.connect(self.clear_input)
+        vertical_splitter.addWidget(self.queue_panel)
+        vertical_splitter.setStretchFactor(0, 3)
+        vertical_splitter.setStretchFactor(1, 1)
+        
     def create_control_panel(self):
         """创建左侧控制面板"""
         panel = QWidget()
@@ -375,6 +890,10 @@ class ImageCompressorApp(QMainWindow):
         self.select_input_btn = QPushButton("选择图片")
         self.select_input_btn.clicked.connect(self.select_input_file)
         input_layout.addWidget(self.select_input_btn)
+        
+        self.select_folder_btn = QPushButton("选择文件夹")
+        self.select_folder_btn.clicked.connect(self.select_input_folder)
+        input_layout.addWidget(self.select_folder_btn)
         file_layout.addLayout(input_layout)
         
         # 输出文件选择
@@ -425,6 +944,9 @@ class ImageCompressorApp(QMainWindow):
         # WebP转换
         self.webp_checkbox = QCheckBox("转换为WebP格式")
         settings_layout.addWidget(self.webp_checkbox, 1, 0, 1, 2)
+        self.auto_format_checkbox = QCheckBox("自动选择格式")
+        self.auto_format_checkbox.setToolTip("同时编码为 JPEG、WebP（非 JPEG 原图另加 PNG），保留最小的结果并修正扩展名；透明图片不使用 JPEG")
+        settings_layout.addWidget(self.auto_format_checkbox, 1, 2)
         
         # WebP质量
         settings_layout.addWidget(QLabel("WebP质量:"), 2, 0)
@@ -458,9 +980,123 @@ class ImageCompressorApp(QMainWindow):
         # 压缩模式选择
         settings_layout.addWidget(QLabel("压缩模式:"), 5, 0)
         self.compression_mode = QComboBox()
-        self.compression_mode.addItems(["质量优先", "目标大小", "大小范围"])
+        self.compression_mode.addItems(["质量优先", "目标大小", "大小范围", "视觉质量"])
         self.compression_mode.currentTextChanged.connect(self.on_compression_mode_changed)
         settings_layout.addWidget(self.compression_mode, 5, 1)
+        self.ssim_spinbox = QDoubleSpinBox()
+        self.ssim_spinbox.setRange(0.80, 0.999)
+        self.ssim_spinbox.setDecimals(3)
+        self.ssim_spinbox.setSingleStep(0.005)
+        self.ssim_spinbox.setValue(DEFAULT_MIN_SSIM)
+        self.ssim_spinbox.setPrefix("SSIM ≥ ")
+        self.ssim_spinbox.setToolTip("视觉质量模式：每张图片使用与原图 SSIM 不低于该值的最低质量（使用内置引擎，需要 NumPy）")
+        self.ssim_spinbox.setEnabled(False)
+        settings_layout.addWidget(self.ssim_spinbox, 5, 2)
+        
+        # 批量并行任务数
+        settings_layout.addWidget(QLabel("并行任务数:"), 6, 0)
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, 256)
+        self.workers_spinbox.setValue(os.cpu_count() or 1)
+        settings_layout.addWidget(self.workers_spinbox, 6, 1)
+        self.async_checkbox = QCheckBox("异步调度")
+        self.async_checkbox.setToolTip("批量压缩时由一个 asyncio 事件循环驱动全部 imagecomp 子进程，不再每个任务占用一个线程；结果按添加顺序返回")
+        settings_layout.addWidget(self.async_checkbox, 6, 2)
+        
+        # 结果缓存
+        self.cache_checkbox = QCheckBox("启用结果缓存")
+        self.cache_checkbox.setToolTip(f"相同图片和参数直接复用之前的结果，缓存目录: {DEFAULT_CACHE_DIR}")
+        settings_layout.addWidget(self.cache_checkbox, 7, 0)
+        self.cache_size_spinbox = QSpinBox()
+        self.cache_size_spinbox.setRange(16, 102400)
+        self.cache_size_spinbox.setValue(1024)
+        self.cache_size_spinbox.setSuffix(" MB")
+        settings_layout.addWidget(self.cache_size_spinbox, 7, 1)
+        
+        # 单任务超时
+        settings_layout.addWidget(QLabel("单任务超时(秒):"), 8, 0)
+        self.timeout_spinbox = QSpinBox()
+        self.timeout_spinbox.setRange(0, 86400)
+        self.timeout_spinbox.setValue(0)
+        self.timeout_spinbox.setSpecialValueText("不限制")
+        settings_layout.addWidget(self.timeout_spinbox, 8, 1)
+        
+        # 压缩引擎
+        settings_layout.addWidget(QLabel("压缩引擎:"), 9, 0)
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItem("自动", AUTO_BACKEND)
+        for name, backend_class in BACKENDS.items():
+            self.backend_combo.addItem(backend_class.label, name)
+        settings_layout.addWidget(self.backend_combo, 9, 1)
+        
+        # 性能指标
+        self.metrics_checkbox = QCheckBox(f"性能指标写入 {DEFAULT_METRICS_FILE}")
+        self.metrics_checkbox.setToolTip("每个任务的排队、启动、编码、CPU 时间和峰值内存，JSON-lines 格式")
+        settings_layout.addWidget(self.metrics_checkbox, 10, 0, 1, 2)
+        self.journal_checkbox = QCheckBox("断点续传")
+        self.journal_checkbox.setToolTip(f"批量压缩的任务状态写入输出目录的 {JOURNAL_FILE_NAME}，"
+                                         "中断后再次压缩同一批文件时跳过已完成的部分；"
+                                         "取消勾选则每次全部重新压缩")
+        self.journal_checkbox.setChecked(True)
+        settings_layout.addWidget(self.journal_checkbox, 10, 2)
+        
+        # 预检与保留原图
+        self.preflight_checkbox = QCheckBox("跳过无需压缩的图片")
+        self.preflight_checkbox.setToolTip("只读取文件头：已小于目标大小、或 JPEG 质量不高于设定质量的图片直接复制原图")
+        self.preflight_checkbox.setChecked(True)
+        settings_layout.addWidget(self.preflight_checkbox, 11, 0, 1, 2)
+        self.keep_original_checkbox = QCheckBox("未变小时保留原图")
+        self.keep_original_checkbox.setToolTip("压缩结果没有比原图小指定比例时，输出原图（转换为WebP时不检查）")
+        self.keep_original_checkbox.setChecked(True)
+        settings_layout.addWidget(self.keep_original_checkbox, 12, 0)
+        self.min_saving_spinbox = QSpinBox()
+        self.min_saving_spinbox.setRange(0, 90)
+        self.min_saving_spinbox.setPrefix("至少节省 ")
+        self.min_saving_spinbox.setSuffix(" %")
+        settings_layout.addWidget(self.min_saving_spinbox, 12, 1)
+        
+        # 多尺寸版本
+        self.variants_checkbox = QCheckBox("生成多尺寸版本")
+        self.variants_checkbox.setToolTip("源图只解码一次，缩放到各个宽度并以各种格式输出，只使用压缩质量（full 为原图宽度，不放大）")
+        settings_layout.addWidget(self.variants_checkbox, 13, 0)
+        self.variant_widths_edit = QLineEdit("320, 640, 1280, full")
+        self.variant_widths_edit.setToolTip("宽度列表，用逗号分隔")
+        settings_layout.addWidget(self.variant_widths_edit, 13, 1)
+        settings_layout.addWidget(QLabel("版本格式:"), 14, 0)
+        self.variant_formats_edit = QLineEdit("jpeg, webp")
+        self.variant_formats_edit.setToolTip("jpeg、webp、png，用逗号分隔")
+        settings_layout.addWidget(self.variant_formats_edit, 14, 1)
+        settings_layout.addWidget(QLabel("命名模板:"), 15, 0)
+        self.variant_template_edit = QLineEdit(DEFAULT_NAME_TEMPLATE)
+        self.variant_template_edit.setToolTip("字段: {stem} 原文件名, {label} 640w 或 full, {width} 像素宽度, {ext} 扩展名, {format} 格式名")
+        settings_layout.addWidget(self.variant_template_edit, 15, 1)
+        
+        # 文件夹扫描
+        settings_layout.addWidget(QLabel("包含文件:"), 16, 0)
+        self.include_edit = QLineEdit()
+        self.include_edit.setPlaceholderText("全部图片")
+        self.include_edit.setToolTip("选择文件夹时只加入匹配的图片，如 *.jpg, photos/*.png（含 / 时匹配相对路径），用逗号分隔")
+        settings_layout.addWidget(self.include_edit, 16, 1)
+        self.recursive_checkbox = QCheckBox("包含子文件夹")
+        self.recursive_checkbox.setToolTip("递归扫描子文件夹（跳过隐藏的文件夹），找到的图片立即加入队列，扫描未完成时也可以开始压缩")
+        self.recursive_checkbox.setChecked(True)
+        settings_layout.addWidget(self.recursive_checkbox, 16, 2)
+        settings_layout.addWidget(QLabel("排除文件:"), 17, 0)
+        self.exclude_edit = QLineEdit()
+        self.exclude_edit.setToolTip("跳过匹配的图片和文件夹，如 *_compressed.*, raw，用逗号分隔")
+        settings_layout.addWidget(self.exclude_edit, 17, 1)
+        settings_layout.addWidget(QLabel("文件大小(KB):"), 18, 0)
+        scan_size_layout = QHBoxLayout()
+        self.scan_min_kb_spinbox = QSpinBox()
+        self.scan_min_kb_spinbox.setRange(0, 10000000)
+        self.scan_min_kb_spinbox.setSpecialValueText("不限制")
+        scan_size_layout.addWidget(self.scan_min_kb_spinbox)
+        scan_size_layout.addWidget(QLabel("-"))
+        self.scan_max_kb_spinbox = QSpinBox()
+        self.scan_max_kb_spinbox.setRange(0, 10000000)
+        self.scan_max_kb_spinbox.setSpecialValueText("不限制")
+        scan_size_layout.addWidget(self.scan_max_kb_spinbox)
+        settings_layout.addLayout(scan_size_layout, 18, 1)
         
         layout.addWidget(settings_group)
         
@@ -473,6 +1109,11 @@ class ImageCompressorApp(QMainWindow):
         self.compress_btn.setEnabled(False)
         button_layout.addWidget(self.compress_btn)
         
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.clicked.connect(self.cancel_compression)
+        self.cancel_btn.setEnabled(False)
+        button_layout.addWidget(self.cancel_btn)
+        
         self.save_settings_btn = QPushButton("保存设置")
         self.save_settings_btn.clicked.connect(self.save_settings)
         button_layout.addWidget(self.save_settings_btn)
@@ -519,21 +1160,10 @@ class ImageCompressorApp(QMainWindow):
         ad_layout.addWidget(ad_icon)
 
         # 广告文本标签
-        self.ad_label = QLabel("【测试广告】欢迎使用图片压缩工具！")
-        self.ad_label.setStyleSheet("""
-            QLabel {
-                color: #F00;
-                font-size: 18px;  /* 或 20px */
-                font-weight: bold;
-                background: yellow;
-                padding: 4px 12px;
-            }
-        """)
+        self.ad_label = MarqueeLabel("【测试广告】欢迎使用图片压缩工具！")
         self.ad_label.setMinimumWidth(500)
         self.ad_label.setMinimumHeight(40)
-        self.ad_label.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
-        self.ad_label.installEventFilter(self)  # 用于鼠标悬停暂停
-        self.ad_label.mousePressEvent = self.on_ad_clicked
+        self.ad_label.clicked.connect(self.on_ad_clicked)
         self.ad_label.setCursor(QCursor(Qt.PointingHandCursor))
         ad_layout.addWidget(self.ad_label, 1)
 
@@ -575,7 +1205,7 @@ class ImageCompressorApp(QMainWindow):
                 color: #F44336;
             }
         """)
-        close_btn.clicked.connect(lambda: ad_container.setVisible(False))
+        close_btn.clicked.connect(lambda: self.close_ad_banner(ad_container))
         ad_layout.addWidget(close_btn)
 
         parent_layout.addWidget(ad_container)
@@ -583,7 +1213,6 @@ class ImageCompressorApp(QMainWindow):
         # 定时器
         self.ad_timer = QTimer()
         self.ad_timer.timeout.connect(self.show_next_ad)
-        self.ad_timer.start(5000)
     
     def create_image_panel(self):
         """创建右侧图片显示面板"""
@@ -595,7 +1224,7 @@ class ImageCompressorApp(QMainWindow):
         info_layout = QGridLayout(info_group)
         
         self.info_labels = {}
-        info_fields = ["文件名", "文件大小", "图片尺寸", "文件格式", "压缩后大小"]
+        info_fields = ["文件名", "文件大小", "图片尺寸", "文件格式", "颜色", "EXIF方向", "压缩后大小"]
         
         for i, field in enumerate(info_fields):
             info_layout.addWidget(QLabel(f"{field}:"), i, 0)
@@ -659,43 +1288,194 @@ class ImageCompressorApp(QMainWindow):
             self.target_size_spinbox.setEnabled(False)
             self.min_size_spinbox.setEnabled(False)
             self.max_size_spinbox.setEnabled(False)
+            self.ssim_spinbox.setEnabled(False)
         elif mode == "目标大小":
             self.quality_slider.setEnabled(False)
             self.quality_spinbox.setEnabled(False)
             self.target_size_spinbox.setEnabled(True)
             self.min_size_spinbox.setEnabled(False)
             self.max_size_spinbox.setEnabled(False)
+            self.ssim_spinbox.setEnabled(False)
         elif mode == "大小范围":
             self.quality_slider.setEnabled(False)
             self.quality_spinbox.setEnabled(False)
             self.target_size_spinbox.setEnabled(False)
             self.min_size_spinbox.setEnabled(True)
             self.max_size_spinbox.setEnabled(True)
+            self.ssim_spinbox.setEnabled(False)
+        elif mode == "视觉质量":
+            self.quality_slider.setEnabled(False)
+            self.quality_spinbox.setEnabled(False)
+            self.target_size_spinbox.setEnabled(False)
+            self.min_size_spinbox.setEnabled(False)
+            self.max_size_spinbox.setEnabled(False)
+            self.ssim_spinbox.setEnabled(True)
     
     def select_input_file(self):
-        """选择输入文件"""
-        file_path, _ = QFileDialog.getOpenFileName(
+        """选择输入文件（可多选）"""
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self, "选择图片文件", "", 
             "图片文件 (*.jpg *.jpeg *.png *.bmp *.gif *.webp);;所有文件 (*)"
         )
-        if file_path:
-            self.input_file = file_path
-            self.input_label.setText(os.path.basename(file_path))
-            self.load_image_info(file_path)
+        if not file_paths:
+            return
+        if self.active_thread is not None:
+            self.update_log("压缩进行中，不能修改队列")
+            return
+        self.stop_folder_scan()
+        if len(file_paths) == 1:
+            self.input_files = []
+            self.input_file = file_paths[0]
+            self.input_label.setText(os.path.basename(file_paths[0]))
+            self.queue_panel.set_files(file_paths)
+            self.load_image_info(file_paths[0])
+            self.update_compress_button()
+        else:
+            self.set_batch_input(file_paths, f"已选择 {len(file_paths)} 个文件")
+    
+    def select_input_folder(self):
+        """选择输入文件夹：在后台扫描，找到的图片立即加入队列，扫描未完成时也可以开始压缩"""
+        folder = QFileDialog.getExistingDirectory(self, "选择图片文件夹")
+        if not folder:
+            return
+        if self.active_thread is not None:
+            self.update_log("压缩进行中，不能修改队列")
+            return
+        self.stop_folder_scan()
+        self.input_files = []
+        self.input_file = ""
+        self.output_file = ""
+        self.folder_name = os.path.basename(folder) or folder
+        self.input_label.setText(f"{self.folder_name} (扫描中...)")
+        self.output_label.setText(self.output_dir or "原文件所在目录")
+        self.queue_panel.set_files([])
+        self.update_compress_button()
+        
+        min_kb = self.scan_min_kb_spinbox.value()
+        max_kb = self.scan_max_kb_spinbox.value()
+        thread = FolderScanThread(folder, parse_patterns(self.include_edit.text()),
+                                  parse_patterns(self.exclude_edit.text()),
+                                  min_kb * 1024 if min_kb else None,
+                                  max_kb * 1024 if max_kb else None,
+                                  self.recursive_checkbox.isChecked())
+        thread.found.connect(self.folder_files_found)
+        thread.done.connect(self.folder_scan_finished)
+        thread.finished.connect(lambda: self.scan_threads.discard(thread))
+        self.scan_threads.add(thread)
+        self.folder_scan_thread = thread
+        thread.start()
+    
+    def folder_scanning(self):
+        """最近一次文件夹扫描是否仍在进行"""
+        return self.folder_scan_thread is not None and not self.folder_scan_thread.feed.closed
+    
+    def stop_folder_scan(self):
+        """停止正在进行的文件夹扫描，之后找到的文件不再加入队列"""
+        thread = self.folder_scan_thread
+        if thread is None:
+            return
+        self.folder_scan_thread = None
+        thread.found.disconnect(self.folder_files_found)
+        thread.done.disconnect(self.folder_scan_finished)
+        thread.cancel()
+    
+    def folder_files_found(self, file_paths, sizes):
+        """扫描到新的图片：加入队列，压缩进行中时一并扩大进度条"""
+        known = self.queue_panel.model.row_index
+        if any(path in known for path in file_paths):  # 扫描期间拖入过同一文件
+            sizes = [size for path, size in zip(file_paths, sizes) if path not in known]
+            file_paths = [path for path in file_paths if path not in known]
+            if not file_paths:
+                return
+        first = not self.input_files
+        self.input_files.extend(file_paths)
+        self.queue_panel.model.add_files(file_paths, sizes)
+        self.input_label.setText(f"{self.folder_name} (扫描中, 已找到 {len(self.input_files)} 个文件)")
+        if first:
+            self.load_image_info(self.input_files[0])
             self.update_compress_button()
+        if self.active_thread is not None and getattr(self.active_thread, "streaming", False):
+            self.progress_bar.setMaximum(len(self.input_files))
+    
+    def folder_scan_finished(self, complete, message):
+        """文件夹扫描结束，汇总文件头信息"""
+        self.update_log(message)
+        if not self.input_files:
+            self.input_label.setText("未选择文件")
+            if complete:
+                QMessageBox.warning(self, "警告", "该文件夹中没有符合条件的图片文件")
+            return
+        self.input_label.setText(f"{self.folder_name} ({len(self.input_files)} 个文件)")
+        
+        if self.header_scan_thread is not None:
+            self.header_scan_thread.requestInterruption()
+        self.header_scan_thread = HeaderScanThread(self.input_files)
+        self.header_scan_thread.summary.connect(self.update_log)
+        self.header_scan_thread.start()
+    
+    def set_batch_input(self, file_paths, label_text):
+        """进入批量模式"""
+        self.input_files = list(file_paths)
+        self.input_file = ""
+        self.output_file = ""
+        self.input_label.setText(label_text)
+        self.output_label.setText(self.output_dir or "原文件所在目录")
+        self.queue_panel.set_files(self.input_files)
+        self.load_image_info(self.input_files[0])
+        self.update_compress_button()
+    
+    def add_input_paths(self, paths):
+        """拖入文件或文件夹：加入队列，队列中多于一个文件时进入批量模式"""
+        if self.active_thread is not None:
+            self.update_log("压缩进行中，不能修改队列")
+            return
+        file_paths = expand_paths(paths)
+        if not file_paths:
+            self.update_log("拖入的内容中没有图片文件")
+            return
+        current = self.input_files or ([self.input_file] if self.input_file else [])
+        known = set(current)
+        added = [path for path in dict.fromkeys(file_paths) if path not in known]
+        merged = current + added
+        scanning = self.folder_scanning()
+        if scanning:
+            # 同时写入扫描结果，扫描未完成就开始压缩时拖入的文件也会被处理
+            self.folder_scan_thread.feed.put([(path, -1) for path in added])
+        if len(merged) == 1 and not scanning:
+            self.input_files = []
+            self.input_file = merged[0]
+            self.input_label.setText(os.path.basename(merged[0]))
+            self.queue_panel.set_files(merged)
+            self.load_image_info(merged[0])
+            self.update_compress_button()
+        else:
+            self.set_batch_input(merged, f"已选择 {len(merged)} 个文件")
+    
+    def clear_input(self):
+        """清空队列后回到未选择文件的状态"""
+        self.stop_folder_scan()
+        self.input_files = []
+        self.input_file = ""
+        self.output_file = ""
+        self.input_label.setText("未选择文件")
+        self.output_label.setText("未选择输出位置")
+        self.update_compress_button()
     
     def select_output_file(self):
         """选择输出文件"""
+        if self.input_files:
+            folder = QFileDialog.getExistingDirectory(self, "选择输出目录")
+            if folder:
+                self.output_dir = folder
+                self.output_label.setText(folder)
+            return
+        
         if not self.input_file:
             QMessageBox.warning(self, "警告", "请先选择输入文件")
             return
             
         input_path = Path(self.input_file)
-        default_name = input_path.stem + "_compressed"
-        if self.webp_checkbox.isChecked():
-            default_name += ".webp"
-        else:
-            default_name += input_path.suffix
+        default_name = default_output_name(self.input_file, self.webp_checkbox.isChecked())
             
         file_path, _ = QFileDialog.getSaveFileName(
             self, "保存压缩图片", str(input_path.parent / default_name),
@@ -708,11 +1488,13 @@ class ImageCompressorApp(QMainWindow):
     
     def open_output_dir(self):
         """打开压缩后图片所在目录"""
-        if not self.output_file:
+        if self.input_files:
+            folder = self.output_dir or str(Path(self.input_files[0]).parent)
+        elif self.output_file:
+            folder = str(Path(self.output_file).parent)
+        else:
             QMessageBox.information(self, "提示", "请先选择输出文件")
             return
-        output_path = Path(self.output_file)
-        folder = str(output_path.parent)
         try:
             if sys.platform == "win32":
                 os.startfile(folder)
@@ -724,37 +1506,91 @@ class ImageCompressorApp(QMainWindow):
             QMessageBox.warning(self, "错误", f"无法打开目录: {str(e)}")
     
     def load_image_info(self, file_path):
-        """加载图片信息"""
+        """加载图片信息，预览图在后台线程中解码"""
         try:
-            pixmap = QPixmap(file_path)
-            if pixmap.isNull():
-                raise Exception("无法加载图片")
-            
-            self.original_pixmap = pixmap
-            self.display_image(self.original_image_label, pixmap)
-            
-            # 更新图片信息
             file_size = os.path.getsize(file_path) / 1024  # KB
-            self.info_labels["文件名"].setText(os.path.basename(file_path))
-            self.info_labels["文件大小"].setText(f"{file_size:.1f} KB")
-            self.info_labels["图片尺寸"].setText(f"{pixmap.width()} x {pixmap.height()}")
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"加载图片失败: {str(e)}")
+            return
+        
+        # 更新图片信息，格式和尺寸从文件头读取，不依赖扩展名
+        self.info_labels["文件名"].setText(os.path.basename(file_path))
+        self.info_labels["文件大小"].setText(f"{file_size:.1f} KB")
+        header = read_header(file_path)
+        if header is not None and header.width:
+            width, height = header.display_size
+            self.info_labels["图片尺寸"].setText(f"{width} x {height}")
+            file_format = header.format
+            if not header.extension_matches(file_path):
+                file_format += f"（扩展名为 {Path(file_path).suffix.upper() or '空'}）"
+            self.info_labels["文件格式"].setText(file_format)
+            self.info_labels["颜色"].setText(header.describe_color() + ("，带透明" if header.has_alpha else ""))
+            self.info_labels["EXIF方向"].setText(header.describe_orientation())
+        else:
+            self.info_labels["图片尺寸"].setText("读取中...")
             self.info_labels["文件格式"].setText(Path(file_path).suffix.upper())
-            self.original_size_label.setText(f"大小: {file_size:.1f} KB")
-            
-            # 自动设置输出文件
-            if not self.output_file:
-                input_path = Path(file_path)
-                default_name = input_path.stem + "_compressed"
-                if self.webp_checkbox.isChecked():
-                    default_name += ".webp"
+            self.info_labels["颜色"].setText("未知")
+            self.info_labels["EXIF方向"].setText("未知")
+        self.original_size_label.setText(f"大小: {file_size:.1f} KB")
+        self.original_image_label.setText("加载中...")
+        self.request_preview("original", file_path, self.original_image_label)
+        
+        # 自动设置输出文件
+        if not self.output_file and not self.input_files:
+            input_path = Path(file_path)
+            default_name = default_output_name(file_path, self.webp_checkbox.isChecked())
+            self.output_file = str(input_path.parent / default_name)
+            self.output_label.setText(os.path.basename(self.output_file))
+            self.update_compress_button()
+    
+    def request_preview(self, slot, file_path, label):
+        """在后台加载预览图，同一位置的旧请求会被取消"""
+        previous = self.preview_requests.get(slot)
+        if previous is not None:
+            previous[1].requestInterruption()
+        
+        self.preview_request_id += 1
+        thread = PreviewLoaderThread(self.preview_request_id, file_path, label.size())
+        thread.loaded.connect(lambda request_id, image, original_size:
+                              self.preview_loaded(slot, request_id, image, original_size))
+        thread.failed.connect(lambda request_id, error: self.preview_failed(slot, request_id, error))
+        thread.finished.connect(lambda: self.preview_threads.discard(thread))
+        self.preview_requests[slot] = (self.preview_request_id, thread)
+        self.preview_threads.add(thread)
+        thread.start()
+    
+    def is_current_preview(self, slot, request_id):
+        current = self.preview_requests.get(slot)
+        return current is not None and current[0] == request_id
+    
+    def preview_loaded(self, slot, request_id, image, original_size):
+        """预览图加载完成"""
+        if not self.is_current_preview(slot, request_id):
+            return
+        pixmap = QPixmap.fromImage(image)
+        if slot == "original":
+            self.original_pixmap = pixmap
+            self.display_image(self.original_image_label, pixmap)
+            if self.info_labels["图片尺寸"].text() == "读取中...":  # 文件头中没有读到尺寸
+                if original_size.isValid():
+                    self.info_labels["图片尺寸"].setText(f"{original_size.width()} x {original_size.height()}")
                 else:
-                    default_name += input_path.suffix
-                self.output_file = str(input_path.parent / default_name)
-                self.output_label.setText(os.path.basename(self.output_file))
-                self.update_compress_button()
-                
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"加载图片失败: {str(e)}")
+                    self.info_labels["图片尺寸"].setText(f"{image.width()} x {image.height()}")
+        else:
+            self.compressed_pixmap = pixmap
+            self.display_image(self.compressed_image_label, pixmap)
+    
+    def preview_failed(self, slot, request_id, error):
+        """预览图加载失败"""
+        if not self.is_current_preview(slot, request_id):
+            return
+        if slot == "original":
+            self.original_image_label.setText("无法加载图片")
+            self.info_labels["图片尺寸"].setText("未知")
+            QMessageBox.critical(self, "错误", f"加载图片失败: {error}")
+        else:
+            self.compressed_image_label.setText("无法加载图片")
+            self.update_log(f"加载压缩后图片失败: {error}")
     
     def display_image(self, label, pixmap):
         """在标签中显示图片"""
@@ -775,15 +1611,10 @@ class ImageCompressorApp(QMainWindow):
     
     def update_compress_button(self):
         """更新压缩按钮状态"""
-        self.compress_btn.setEnabled(bool(self.input_file and self.output_file))
+        self.compress_btn.setEnabled(bool(self.input_files or (self.input_file and self.output_file)))
     
-    def start_compression(self):
-        """开始压缩"""
-        if not self.input_file or not self.output_file:
-            QMessageBox.warning(self, "警告", "请选择输入和输出文件")
-            return
-        
-        # 获取压缩参数
+    def get_compression_params(self):
+        """根据压缩模式获取 (quality, target_size, size_range)"""
         mode = self.compression_mode.currentText()
         quality = None
         target_size = None
@@ -795,6 +1626,37 @@ class ImageCompressorApp(QMainWindow):
             target_size = self.target_size_spinbox.value()
         elif mode == "大小范围":
             size_range = (self.min_size_spinbox.value(), self.max_size_spinbox.value())
+        return quality, target_size, size_range
+    
+    def get_result_cache(self):
+        """按当前设置获取结果缓存，未启用时返回 None"""
+        if not self.cache_checkbox.isChecked():
+            return None
+        max_bytes = self.cache_size_spinbox.value() * 1024 * 1024
+        if self.result_cache is None:
+            try:
+                self.result_cache = ResultCache(DEFAULT_CACHE_DIR, max_bytes)
+            except OSError as e:
+                self.update_log(f"无法创建缓存目录: {str(e)}")
+                return None
+        self.result_cache.max_bytes = max_bytes
+        return self.result_cache
+    
+    def start_compression(self):
+        """开始压缩"""
+        if self.variants_checkbox.isChecked():
+            self.start_variant_compression()
+            return
+        if self.input_files:
+            self.start_batch_compression()
+            return
+        
+        if not self.input_file or not self.output_file:
+            QMessageBox.warning(self, "警告", "请选择输入和输出文件")
+            return
+        
+        # 获取压缩参数
+        quality, target_size, size_range = self.get_compression_params()
         
         # 创建压缩线程
         self.compressor_thread = ImageCompressorThread(
@@ -804,14 +1666,27 @@ class ImageCompressorApp(QMainWindow):
             self.webp_checkbox.isChecked(),
             target_size,
             size_range,
-            self.webp_quality_spinbox.value()
+            self.webp_quality_spinbox.value(),
+            self.get_result_cache(),
+            self.get_timeout(),
+            self.backend_combo.currentData(),
+            self.get_metrics_recorder(quality, target_size, size_range),
+            self.preflight_checkbox.isChecked(),
+            self.get_min_saving(),
+            self.get_min_ssim(),
+            self.auto_format_checkbox.isChecked()
         )
         
         self.compressor_thread.progress.connect(self.update_log)
+        self.compressor_thread.result_ready.connect(self.queue_panel.model.update_result)
+        self.compressor_thread.result_ready.connect(self.single_result_ready)
         self.compressor_thread.finished.connect(self.compression_finished)
+        self.lock_queue()
         
         # 更新UI状态
+        self.active_thread = self.compressor_thread
         self.compress_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
         self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 0)  # 不确定进度
         self.log_text.clear()
@@ -819,14 +1694,205 @@ class ImageCompressorApp(QMainWindow):
         # 开始压缩
         self.compressor_thread.start()
     
+    def start_batch_compression(self):
+        """开始批量压缩"""
+        quality, target_size, size_range = self.get_compression_params()
+        webp = self.webp_checkbox.isChecked()
+        
+        cancel_event = threading.Event()
+        files = self.input_files
+        if self.folder_scanning():
+            # 文件夹仍在扫描：压缩线程从扫描结果中读取，已找到的和之后找到的文件都会处理
+            files = (path for path, _ in self.folder_scan_thread.feed.follow(cancel_event=cancel_event))
+        output_dir = self.output_dir
+        jobs = ((input_file, os.path.join(output_dir or str(Path(input_file).parent),
+                                          default_output_name(input_file, webp)))
+                for input_file in files)
+        if isinstance(files, list):
+            jobs = list(jobs)
+        
+        self.batch_thread = BatchCompressorThread(
+            jobs,
+            quality,
+            webp,
+            target_size,
+            size_range,
+            self.webp_quality_spinbox.value(),
+            self.workers_spinbox.value(),
+            self.get_result_cache(),
+            self.get_timeout(),
+            self.backend_combo.currentData(),
+            self.get_metrics_recorder(quality, target_size, size_range),
+            self.get_journal_file(),
+            self.preflight_checkbox.isChecked(),
+            self.get_min_saving(),
+            self.get_min_ssim(),
+            self.auto_format_checkbox.isChecked(),
+            self.async_checkbox.isChecked(),
+            cancel_event
+        )
+        self.batch_thread.progress.connect(self.update_log)
+        self.batch_thread.file_finished.connect(self.batch_file_finished)
+        self.batch_thread.result_ready.connect(self.queue_panel.model.update_result)
+        self.batch_thread.finished.connect(self.batch_compression_finished)
+        self.lock_queue()
+        
+        # 更新UI状态
+        self.active_thread = self.batch_thread
+        self.compress_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, len(self.input_files))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%v / %m (%p%)")
+        self.log_text.clear()
+        
+        self.batch_thread.start()
+    
+    def start_variant_compression(self):
+        """为每张输入图片生成多尺寸版本，输出到输出目录（单个文件时为输出文件所在目录）"""
+        try:
+            widths = parse_widths(self.variant_widths_edit.text())
+            formats = parse_formats(self.variant_formats_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        template = self.variant_template_edit.text().strip() or DEFAULT_NAME_TEMPLATE
+        error = check_template(template)
+        if error:
+            QMessageBox.warning(self, "警告", error)
+            return
+        quality, target_size, size_range = self.get_compression_params()
+        if quality is None:
+            QMessageBox.warning(self, "警告", "多尺寸版本只支持质量优先模式")
+            return
+        
+        if self.input_files:
+            jobs = [(input_file, self.output_dir or str(Path(input_file).parent))
+                    for input_file in self.input_files]
+        else:
+            jobs = [(self.input_file, str(Path(self.output_file or self.input_file).parent))]
+        
+        self.variant_thread = VariantCompressorThread(
+            jobs,
+            widths,
+            formats,
+            quality,
+            min(quality, self.webp_quality_spinbox.value()),
+            template,
+            self.workers_spinbox.value(),
+            self.get_metrics_recorder(quality, None, None)
+        )
+        self.variant_thread.progress.connect(self.update_log)
+        self.variant_thread.file_finished.connect(self.variant_file_finished)
+        self.variant_thread.finished.connect(self.batch_compression_finished)
+        self.lock_queue()
+        
+        # 更新UI状态
+        self.active_thread = self.variant_thread
+        self.compress_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, len(jobs))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%v / %m (%p%)")
+        self.log_text.clear()
+        
+        self.variant_thread.start()
+    
+    def get_journal_file(self):
+        """批量模式的任务日志放在输出目录（输出到原文件所在目录时为第一个文件的目录），未启用时返回 None"""
+        if not self.journal_checkbox.isChecked() or not self.input_files:
+            return None
+        folder = self.output_dir or str(Path(self.input_files[0]).parent)
+        return os.path.join(folder, JOURNAL_FILE_NAME)
+    
+    def get_metrics_recorder(self, quality, target_size, size_range):
+        """本次任务的指标汇总，勾选时同时写入 metrics.jsonl"""
+        params = {
+            "quality": quality,
+            "webp": self.webp_checkbox.isChecked(),
+            "target_size": target_size,
+            "size_range": size_range,
+            "webp_quality": self.webp_quality_spinbox.value(),
+            "backend": self.backend_combo.currentData(),
+            "preflight": self.preflight_checkbox.isChecked(),
+            "min_saving": self.get_min_saving(),
+            "min_ssim": self.get_min_ssim(),
+            "auto_format": self.auto_format_checkbox.isChecked(),
+        }
+        path = DEFAULT_METRICS_FILE if self.metrics_checkbox.isChecked() else None
+        return MetricsRecorder(path, params)
+    
+    def get_min_saving(self):
+        """保留原图的阈值（百分比），不检查时为 None"""
+        if not self.keep_original_checkbox.isChecked():
+            return None
+        return self.min_saving_spinbox.value()
+    
+    def get_min_ssim(self):
+        """视觉质量模式的 SSIM 下限，其他模式为 None"""
+        if self.compression_mode.currentText() != "视觉质量":
+            return None
+        return round(self.ssim_spinbox.value(), 3)
+    
+    def get_timeout(self):
+        """单任务超时时间（秒），0 表示不限制"""
+        return self.timeout_spinbox.value() or None
+    
+    def cancel_compression(self):
+        """取消当前压缩任务"""
+        if self.active_thread is not None and self.active_thread.isRunning():
+            self.active_thread.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.update_log("正在取消...")
+    
+    def lock_queue(self):
+        """开始压缩：队列状态全部恢复为等待，压缩结束前不能修改队列"""
+        self.queue_panel.model.reset_status()
+        self.queue_panel.set_locked(True)
+    
+    def batch_file_finished(self, done, total, input_file, success, message):
+        """批量压缩中单个文件完成；结果显示在队列中，日志只记录失败的文件
+        
+        total 为 0 表示边扫描边压缩，以目前找到的文件数为总数。
+        """
+        total = total or len(self.input_files)
+        self.progress_bar.setValue(done)
+        if not success:
+            self.update_log(f"[{done}/{total}] {os.path.basename(input_file)} 失败: {message}")
+    
+    def variant_file_finished(self, done, total, input_file, success, message):
+        self.queue_panel.model.update_row(input_file, STATUS_DONE if success else STATUS_FAILED, message)
+        self.batch_file_finished(done, total, input_file, success, message)
+    
+    def batch_compression_finished(self, success, message):
+        """批量压缩完成"""
+        self.active_thread = None
+        self.queue_panel.set_locked(False)
+        self.compress_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.setVisible(False)
+        self.update_log(message)
+        QMessageBox.information(self, "完成", message)
+    
     def update_log(self, message):
         """更新日志"""
         self.log_text.append(message)
         self.log_text.ensureCursorVisible()
     
+    def single_result_ready(self, result):
+        """自动格式修正了扩展名时改用实际的输出路径"""
+        if result.requested_output:
+            self.output_file = result.output_file
+            self.output_label.setText(os.path.basename(self.output_file))
+    
     def compression_finished(self, success, message):
         """压缩完成"""
+        self.active_thread = None
+        self.queue_panel.set_locked(False)
         self.compress_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
         self.progress_bar.setVisible(False)
         
         self.update_log(message)
@@ -834,21 +1900,18 @@ class ImageCompressorApp(QMainWindow):
         if success:
             # 加载压缩后的图片
             try:
-                compressed_pixmap = QPixmap(self.output_file)
-                if not compressed_pixmap.isNull():
-                    self.compressed_pixmap = compressed_pixmap
-                    self.display_image(self.compressed_image_label, compressed_pixmap)
-                    
-                    # 更新压缩后信息
-                    compressed_size = os.path.getsize(self.output_file) / 1024
-                    self.info_labels["压缩后大小"].setText(f"{compressed_size:.1f} KB")
-                    self.compressed_size_label.setText(f"大小: {compressed_size:.1f} KB")
-                    
-                    # 计算压缩率
-                    original_size = os.path.getsize(self.input_file) / 1024
-                    compression_ratio = (1 - compressed_size / original_size) * 100
-                    self.update_log(f"压缩率: {compression_ratio:.1f}%")
-                    
+                self.request_preview("compressed", self.output_file, self.compressed_image_label)
+                
+                # 更新压缩后信息
+                compressed_size = os.path.getsize(self.output_file) / 1024
+                self.info_labels["压缩后大小"].setText(f"{compressed_size:.1f} KB")
+                self.compressed_size_label.setText(f"大小: {compressed_size:.1f} KB")
+                
+                # 计算压缩率
+                original_size = os.path.getsize(self.input_file) / 1024
+                compression_ratio = (1 - compressed_size / original_size) * 100
+                self.update_log(f"压缩率: {compression_ratio:.1f}%")
+                
             except Exception as e:
                 self.update_log(f"加载压缩后图片失败: {str(e)}")
         
@@ -859,11 +1922,32 @@ class ImageCompressorApp(QMainWindow):
         settings = {
             "quality": self.quality_spinbox.value(),
             "webp": self.webp_checkbox.isChecked(),
+            "auto_format": self.auto_format_checkbox.isChecked(),
             "webp_quality": self.webp_quality_spinbox.value(),
             "target_size": self.target_size_spinbox.value(),
             "min_size": self.min_size_spinbox.value(),
             "max_size": self.max_size_spinbox.value(),
-            "compression_mode": self.compression_mode.currentText()
+            "compression_mode": self.compression_mode.currentText(),
+            "workers": self.workers_spinbox.value(),
+            "async_runner": self.async_checkbox.isChecked(),
+            "cache_enabled": self.cache_checkbox.isChecked(),
+            "cache_size_mb": self.cache_size_spinbox.value(),
+            "timeout": self.timeout_spinbox.value(),
+            "backend": self.backend_combo.currentData(),
+            "metrics_enabled": self.metrics_checkbox.isChecked(),
+            "journal_enabled": self.journal_checkbox.isChecked(),
+            "preflight": self.preflight_checkbox.isChecked(),
+            "min_saving": self.get_min_saving(),
+            "min_ssim": self.ssim_spinbox.value(),
+            "variants": self.variants_checkbox.isChecked(),
+            "variant_widths": self.variant_widths_edit.text(),
+            "variant_formats": self.variant_formats_edit.text(),
+            "variant_template": self.variant_template_edit.text(),
+            "scan_recursive": self.recursive_checkbox.isChecked(),
+            "scan_include": self.include_edit.text(),
+            "scan_exclude": self.exclude_edit.text(),
+            "scan_min_kb": self.scan_min_kb_spinbox.value(),
+            "scan_max_kb": self.scan_max_kb_spinbox.value()
         }
         
         try:
@@ -882,10 +1966,35 @@ class ImageCompressorApp(QMainWindow):
                 
                 self.quality_spinbox.setValue(settings.get("quality", 80))
                 self.webp_checkbox.setChecked(settings.get("webp", False))
+                self.auto_format_checkbox.setChecked(settings.get("auto_format", False))
                 self.webp_quality_spinbox.setValue(settings.get("webp_quality", 100))
                 self.target_size_spinbox.setValue(settings.get("target_size", 100))
                 self.min_size_spinbox.setValue(settings.get("min_size", 50))
                 self.max_size_spinbox.setValue(settings.get("max_size", 200))
+                self.workers_spinbox.setValue(settings.get("workers", os.cpu_count() or 1))
+                self.async_checkbox.setChecked(settings.get("async_runner", False))
+                self.cache_checkbox.setChecked(settings.get("cache_enabled", False))
+                self.cache_size_spinbox.setValue(settings.get("cache_size_mb", 1024))
+                self.timeout_spinbox.setValue(settings.get("timeout", 0))
+                self.metrics_checkbox.setChecked(settings.get("metrics_enabled", False))
+                self.journal_checkbox.setChecked(settings.get("journal_enabled", True))
+                self.preflight_checkbox.setChecked(settings.get("preflight", True))
+                min_saving = settings.get("min_saving", 0)
+                self.keep_original_checkbox.setChecked(min_saving is not None)
+                self.min_saving_spinbox.setValue(int(min_saving or 0))
+                self.ssim_spinbox.setValue(settings.get("min_ssim") or DEFAULT_MIN_SSIM)
+                self.variants_checkbox.setChecked(settings.get("variants", False))
+                self.variant_widths_edit.setText(settings.get("variant_widths", "320, 640, 1280, full"))
+                self.variant_formats_edit.setText(settings.get("variant_formats", "jpeg, webp"))
+                self.variant_template_edit.setText(settings.get("variant_template", DEFAULT_NAME_TEMPLATE))
+                self.recursive_checkbox.setChecked(settings.get("scan_recursive", True))
+                self.include_edit.setText(settings.get("scan_include", ""))
+                self.exclude_edit.setText(settings.get("scan_exclude", ""))
+                self.scan_min_kb_spinbox.setValue(settings.get("scan_min_kb", 0))
+                self.scan_max_kb_spinbox.setValue(settings.get("scan_max_kb", 0))
+                backend_index = self.backend_combo.findData(settings.get("backend", AUTO_BACKEND))
+                if backend_index >= 0:
+                    self.backend_combo.setCurrentIndex(backend_index)
                 
                 mode = settings.get("compression_mode", "质量优先")
                 index = self.compression_mode.findText(mode)
@@ -897,10 +2006,10 @@ class ImageCompressorApp(QMainWindow):
     
     def load_ad_data(self):
         """加载广告数据"""
-        self.ad_thread = AdDataThread()
-        self.ad_thread.data_loaded.connect(self.on_ad_data_loaded)
-        self.ad_thread.error_occurred.connect(self.on_ad_error)
-        self.ad_thread.start()
+        self.ad_fetcher = AdFetcher(self)
+        self.ad_fetcher.ads_loaded.connect(self.on_ad_data_loaded)
+        self.ad_fetcher.ads_failed.connect(self.on_ad_error)
+        self.ad_fetcher.load_ads()
     
     def on_ad_data_loaded(self, data_list):
         """广告数据加载完成"""
@@ -927,26 +2036,25 @@ class ImageCompressorApp(QMainWindow):
             total_ads = len(self.ad_data)
             current_num = self.current_ad_index + 1
             self.ad_marquee_text = f"【{current_num}/{total_ads}】{title}"
-            self.ad_marquee_index = 0
         else:
             self.ad_marquee_text = ""
-            self.ad_marquee_index = 0
+        self.ad_label.setText(self.ad_marquee_text)
     
-    def update_ad_marquee(self):
-        if not self.ad_marquee_text:
-            return
-        # 让内容循环滚动
-        text = self.ad_marquee_text
-        idx = self.ad_marquee_index
-        show_len = 30  # 可视字符数
-        if len(text) <= show_len:
-            self.ad_label.setText(text)
-        else:
-            display = text[idx:idx+show_len]
-            if len(display) < show_len:
-                display += "   " + text[:show_len - len(display)]
-            self.ad_label.setText(display)
-            self.ad_marquee_index = (idx + 1) % len(text)
+    def close_ad_banner(self, ad_container):
+        """关闭广告栏，同时停止轮播"""
+        ad_container.setVisible(False)
+        self.ad_timer.stop()
+    
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            # 最小化时暂停走马灯和轮播
+            minimized = self.isMinimized()
+            self.ad_label.set_paused(minimized)
+            if minimized:
+                self.ad_timer.stop()
+            elif self.background_started and self.ad_label.isVisible():
+                self.ad_timer.start(5000)
     
     def show_next_ad(self):
         """显示下一个广告"""
@@ -964,7 +2072,7 @@ class ImageCompressorApp(QMainWindow):
         self.current_ad_index = (self.current_ad_index - 1) % len(self.ad_data)
         self.update_ad_display()
     
-    def on_ad_clicked(self, event):
+    def on_ad_clicked(self):
         """广告点击事件"""
         if not self.ad_data or not (0 <= self.current_ad_index < len(self.ad_data)):
             return
@@ -981,39 +2089,50 @@ class ImageCompressorApp(QMainWindow):
         
         if is_image:
             # 在客户端内打开图片
-            dialog = ImageViewerDialog(relative_path, self)
+            dialog = ImageViewerDialog(relative_path, self.ad_fetcher, self)
             dialog.exec()
         else:
             # 调用系统默认浏览器打开链接
             try:
+                import webbrowser
                 webbrowser.open(relative_path)
             except Exception as e:
                 QMessageBox.warning(self, "错误", f"无法打开链接: {str(e)}")
 
+class FirstPaintFilter(QObject):
+    """记录窗口首次绘制的时刻，随后输出启动耗时报告并退出"""
     def eventFilter(self, obj, event):
-        if obj == self.ad_label:
-            if event.type() == QEvent.Enter:
-                self.ad_marquee_timer.stop()
-            elif event.type() == QEvent.Leave:
-                self.ad_marquee_timer.start(80)
-        return super().eventFilter(obj, event)
+        if event.type() == QEvent.Paint and not any(p == "首次绘制" for p, _ in startup_phases):
+            mark_startup("首次绘制")
+            # 等广告模块启动后再报告
+            QTimer.singleShot(0, lambda: QTimer.singleShot(0, report_startup))
+        return False
 
-def get_imagecomp_path():
-    if getattr(sys, 'frozen', False):
-        # PyInstaller打包后
-        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
-    else:
-        # 源码运行
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, "imagecomp.exe")
+def report_startup():
+    """打印各启动阶段耗时"""
+    print("启动耗时:")
+    previous = STARTUP_TIME
+    for phase, moment in startup_phases:
+        print(f"  {phase:<14}{(moment - previous) * 1000:8.1f} ms  (累计 {(moment - STARTUP_TIME) * 1000:.1f} ms)")
+        previous = moment
+    QApplication.quit()
 
 def main():
+    profile_startup = "--profile-startup" in sys.argv
+    if profile_startup:
+        sys.argv.remove("--profile-startup")
+    
     app = QApplication(sys.argv)
     app.setApplicationName("图片压缩工具")
     app.setApplicationVersion("1.0")
+    mark_startup("创建 QApplication")
     
     window = ImageCompressorApp()
+    if profile_startup:
+        paint_filter = FirstPaintFilter(window)
+        window.centralWidget().installEventFilter(paint_filter)
     window.show()
+    mark_startup("显示窗口")
     
     sys.exit(app.exec())
 
@@ -0,0 +1,499 @@
+"""批量队列面板：QAbstractTableModel + QTableView，支持拖放文件和文件夹
+
+每行是一个 __slots__ 记录，视图使用固定行高，只绘制可见的行。排序和筛选在后台线程中
+计算新的行顺序，完成后一次性替换，五万行的批量也不会卡住界面。
+"""
+import os
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QThread, QTimer, Signal
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import (QAbstractItemView, QComboBox, QHBoxLayout, QHeaderView, QLabel,
+                               QLineEdit, QPushButton, QTableView, QVBoxLayout, QWidget)
+
+from imgcomp import IMAGE_EXTENSIONS, list_image_files
+
+STATUS_PENDING = "等待"
+STATUS_DONE = "成功"
+STATUS_CACHED = "缓存命中"
+STATUS_SKIPPED = "保留原图"
+STATUS_FAILED = "失败"
+STATUS_CANCELLED = "已取消"
+STATUS_FILTERS = ["全部", STATUS_PENDING, STATUS_DONE, STATUS_CACHED, STATUS_SKIPPED,
+                  STATUS_FAILED, STATUS_CANCELLED]
+
+COL_NAME, COL_ORIGINAL, COL_COMPRESSED, COL_RATIO, COL_STATUS, COL_TIME = range(6)
+COLUMNS = ("文件", "原始大小", "压缩后", "压缩率", "状态", "用时")
+ROW_HEIGHT = 22
+SIZE_CHUNK = 2000  # 后台读取文件大小时每批发送的行数
+FILTER_DELAY = 200  # 筛选输入停止这么多毫秒后才开始筛选
+
+
+class QueueRow:
+    """队列中的一个文件，大小未知时为 -1"""
+    __slots__ = ("path", "name", "original_size", "compressed_size", "status", "elapsed",
+                 "message")
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.original_size = -1
+        self.compressed_size = -1
+        self.status = STATUS_PENDING
+        self.elapsed = -1.0
+        self.message = ""
+
+    @property
+    def ratio(self):
+        if self.original_size <= 0 or self.compressed_size < 0:
+            return None
+        return (1 - self.compressed_size / self.original_size) * 100
+
+
+def status_of(result):
+    """CompressResult 对应的队列状态"""
+    if result.success:
+        if result.cached:
+            return STATUS_CACHED
+        return STATUS_SKIPPED if result.skipped else STATUS_DONE
+    return STATUS_CANCELLED if result.message == "已取消" else STATUS_FAILED
+
+
+def expand_paths(paths):
+    """把拖入的文件和文件夹展开为图片文件列表（文件夹不递归）"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(list_image_files(path))
+        elif os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+            files.append(path)
+    return files
+
+
+def _format_size(size):
+    return "" if size < 0 else f"{size / 1024:.1f} KB"
+
+
+def _sort_key(column):
+    """排序用的键；未知的值排在最后"""
+    if column == COL_NAME:
+        return lambda row: row.name.lower()
+    if column == COL_ORIGINAL:
+        return lambda row: row.original_size
+    if column == COL_COMPRESSED:
+        return lambda row: row.compressed_size
+    if column == COL_RATIO:
+        return lambda row: -1e9 if row.ratio is None else row.ratio
+    if column == COL_STATUS:
+        return lambda row: row.status
+    return lambda row: row.elapsed
+
+
+class SortFilterThread(QThread):
+    """在后台计算筛选和排序后的行顺序，结果为 self.rows 的下标列表"""
+    done = Signal(int, object)  # 版本号, 下标列表
+
+    def __init__(self, rows, generation, column, descending, text, status):
+        super().__init__()
+        self.rows = rows  # 行列表的快照，行对象与模型共享
+        self.generation = generation
+        self.column = column
+        self.descending = descending
+        self.text = text.lower()
+        self.status = status
+
+    def run(self):
+        text, status = self.text, self.status
+        order = [i for i, row in enumerate(self.rows)
+                 if (not text or text in row.name.lower()) and (not status or row.status == status)]
+        if self.column >= 0:
+            key = _sort_key(self.column)
+            rows = self.rows
+            order.sort(key=lambda i: key(rows[i]), reverse=self.descending)
+        self.done.emit(self.generation, order)
+
+
+class SizeScanThread(QThread):
+    """在后台读取文件大小，分批发送 [(行下标, 大小), ...]"""
+    sizes = Signal(int, object)  # 队列版本号, 大小列表
+
+    def __init__(self, paths, first_index, epoch):
+        super().__init__()
+        self.paths = paths
+        self.first_index = first_index
+        self.epoch = epoch
+
+    def run(self):
+        batch = []
+        for i, path in enumerate(self.paths, self.first_index):
+            if self.isInterruptionRequested():
+                return
+            try:
+                batch.append((i, os.path.getsize(path)))
+            except OSError:
+                continue
+            if len(batch) >= SIZE_CHUNK:
+                self.sizes.emit(self.epoch, batch)
+                batch = []
+        if batch:
+            self.sizes.emit(self.epoch, batch)
+
+
+class QueueModel(QAbstractTableModel):
+    """队列数据模型
+
+    rows 按加入顺序保存所有行，visible 为当前显示的行（rows 的下标），
+    排序和筛选只替换 visible。
+    """
+    counts_changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.row_index = {}  # 路径 -> rows 下标
+        self.visible = []
+        self.position = {}  # rows 下标 -> visible 中的位置
+        self.sort_column = -1
+        self.sort_order = Qt.AscendingOrder
+        self.filter_text = ""
+        self.filter_status = ""
+        self.generation = 0  # 排序和筛选请求的版本号
+        self.epoch = 0  # 清空队列时加一，丢弃旧队列的文件大小
+        self.threads = set()  # 运行中的后台线程，结束前保持引用
+        # 按状态筛选或排序时，状态变化后重新筛选；压缩中状态变化频繁，合并处理
+        self.status_timer = QTimer(self)
+        self.status_timer.setSingleShot(True)
+        self.status_timer.setInterval(FILTER_DELAY)
+        self.status_timer.timeout.connect(self.refresh)
+
+    # Qt 模型接口
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.visible)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[self.visible[index.row()]]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == COL_NAME:
+                return row.name
+            if column == COL_ORIGINAL:
+                return _format_size(row.original_size)
+            if column == COL_COMPRESSED:
+                return _format_size(row.compressed_size)
+            if column == COL_RATIO:
+                ratio = row.ratio
+                return "" if ratio is None else f"{ratio:.1f}%"
+            if column == COL_STATUS:
+                return row.status
+            return "" if row.elapsed < 0 else f"{row.elapsed:.2f}s"
+        if role == Qt.ToolTipRole:
+            if column == COL_NAME:
+                return row.path
+            return row.message or None
+        if role == Qt.TextAlignmentRole and column != COL_NAME:
+            return int(Qt.AlignRight | Qt.AlignVCenter) if column != COL_STATUS else int(Qt.AlignCenter)
+        if role == Qt.ForegroundRole and column == COL_STATUS:
+            if row.status == STATUS_FAILED:
+                return QColor("#F44336")
+            if row.status in (STATUS_DONE, STATUS_CACHED):
+                return QColor("#4CAF50")
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.refresh()
+
+    # 数据操作
+
+    def files(self):
+        return [row.path for row in self.rows]
+
+    def path_at(self, visible_row):
+        return self.rows[self.visible[visible_row]].path
+
+    def set_files(self, paths):
+        """替换队列；新列表以当前队列开头时只追加新增的部分"""
+        paths = list(paths)
+        if len(paths) >= len(self.rows) and all(
+                row.path == path for row, path in zip(self.rows, paths)):
+            self.add_files(paths[len(self.rows):])
+            return
+        self.clear()
+        self.add_files(paths)
+
+    def add_files(self, paths, sizes=None):
+        """追加文件（已在队列中的忽略），返回新增数量；没有给出 sizes 时文件大小在后台读取"""
+        new_rows = []
+        for i, path in enumerate(paths):
+            if path not in self.row_index:
+                self.row_index[path] = len(self.rows) + len(new_rows)
+                row = QueueRow(path)
+                if sizes is not None:
+                    row.original_size = sizes[i]
+                new_rows.append(row)
+        if not new_rows:
+            return 0
+        first = len(self.rows)
+        if self.sort_column < 0 and not self.filter_text and not self.filter_status:
+            # 没有排序和筛选时新行直接出现在末尾
+            self.beginInsertRows(QModelIndex(), len(self.visible), len(self.visible) + len(new_rows) - 1)
+            self.rows.extend(new_rows)
+            for i in range(first, len(self.rows)):
+                self.position[i] = len(self.visible)
+                self.visible.append(i)
+            self.endInsertRows()
+        else:
+            self.rows.extend(new_rows)
+            self.refresh()
+        if sizes is None:
+            self._start(SizeScanThread([row.path for row in new_rows], first, self.epoch), "sizes",
+                        self.set_sizes)
+        self.counts_changed.emit()
+        return len(new_rows)
+
+    def clear(self):
+        self.generation += 1  # 丢弃进行中的排序结果
+        self.epoch += 1
+        for thread in list(self.threads):
+            thread.requestInterruption()
+        self.beginResetModel()
+        self.rows = []
+        self.row_index = {}
+        self.visible = []
+        self.position = {}
+        self.endResetModel()
+        self.counts_changed.emit()
+
+    def set_sizes(self, epoch, sizes):
+        if epoch != self.epoch:
+            return
+        for i, size in sizes:
+            self.rows[i].original_size = size
+        if self.visible:
+            self.dataChanged.emit(self.index(0, COL_ORIGINAL),
+                                  self.index(len(self.visible) - 1, COL_RATIO))
+
+    def update_row(self, path, status, message="", compressed_size=None, elapsed=None,
+                   original_size=None):
+        i = self.row_index.get(path)
+        if i is None:
+            return
+        row = self.rows[i]
+        if row.status != status:
+            self.status_changed()
+        row.status = status
+        row.message = message
+        if compressed_size is not None:
+            row.compressed_size = compressed_size
+        if elapsed is not None:
+            row.elapsed = elapsed
+        if original_size:
+            row.original_size = original_size
+        pos = self.position.get(i)
+        if pos is not None:
+            self.dataChanged.emit(self.index(pos, 0), self.index(pos, len(COLUMNS) - 1))
+        self.counts_changed.emit()
+
+    def update_result(self, result):
+        """用 CompressResult 更新对应的行"""
+        self.update_row(result.input_file, status_of(result), result.summary(),
+                        result.compressed_size if result.success else -1, result.elapsed,
+                        result.original_size)
+
+    def reset_status(self):
+        """开始新一轮压缩前把所有行恢复为等待"""
+        for row in self.rows:
+            row.status = STATUS_PENDING
+            row.compressed_size = -1
+            row.elapsed = -1.0
+            row.message = ""
+        if self.visible:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.visible) - 1, len(COLUMNS) - 1))
+        self.status_changed()
+        self.counts_changed.emit()
+
+    def status_changed(self):
+        """行的状态变化后，按状态筛选或排序时稍后重新计算显示的行"""
+        # 已在计时时不重新开始，连续更新时也至少每 FILTER_DELAY 毫秒刷新一次
+        if (self.filter_status or self.sort_column == COL_STATUS) and not self.status_timer.isActive():
+            self.status_timer.start()
+
+    def count_status(self, status):
+        return sum(1 for row in self.rows if row.status == status)
+
+    # 后台排序与筛选
+
+    def set_filter(self, text, status):
+        self.filter_text = text.strip()
+        self.filter_status = status
+        self.refresh()
+
+    def refresh(self):
+        """在后台重新计算 visible，完成前界面继续显示旧的顺序"""
+        self.generation += 1
+        thread = SortFilterThread(list(self.rows), self.generation, self.sort_column,
+                                  self.sort_order == Qt.DescendingOrder, self.filter_text,
+                                  self.filter_status)
+        self._start(thread, "done", self.apply_order)
+
+    def apply_order(self, generation, order):
+        if generation != self.generation:
+            return  # 已有更新的排序或筛选请求
+        self.layoutAboutToBeChanged.emit()
+        old = {pos: i for i, pos in self.position.items()}
+        self.visible = order
+        self.position = {i: pos for pos, i in enumerate(order)}
+        # 选中项和当前项跟随原来的行
+        changed_from, changed_to = [], []
+        for index in self.persistentIndexList():
+            i = old.get(index.row())
+            pos = self.position.get(i) if i is not None else None
+            changed_from.append(index)
+            changed_to.append(self.index(pos, index.column()) if pos is not None else QModelIndex())
+        self.changePersistentIndexList(changed_from, changed_to)
+        self.layoutChanged.emit()
+
+    def _start(self, thread, signal_name, slot):
+        getattr(thread, signal_name).connect(slot)
+        thread.finished.connect(lambda: self.threads.discard(thread))
+        self.threads.add(thread)
+        thread.start()
+
+
+class QueueView(QTableView):
+    """接受拖入文件和文件夹的表格视图"""
+    files_dropped = Signal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAcceptDrops(True)
+        self.setDragDropMode(QAbstractItemView.DropOnly)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSortingEnabled(True)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setAlternatingRowColors(True)
+        # 固定行高，视图不需要为每一行计算尺寸
+        header = self.verticalHeader()
+        header.setVisible(False)
+        header.setSectionResizeMode(QHeaderView.Fixed)
+        header.setDefaultSectionSize(ROW_HEIGHT)
+
+    def setModel(self, model):
+        super().setModel(model)
+        header = self.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(COL_NAME, QHeaderView.Stretch)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super().dragEnterEvent(event)
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super().dragMoveEvent(event)
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            event.acceptProposedAction()
+            self.files_dropped.emit(paths)
+
+
+class QueuePanel(QWidget):
+    """队列面板：筛选栏 + 表格 + 计数"""
+    files_dropped = Signal(list)  # 拖入的路径（未展开文件夹）
+    file_selected = Signal(str)
+    cleared = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = QueueModel(self)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        bar = QHBoxLayout()
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("按文件名筛选...")
+        self.filter_edit.setClearButtonEnabled(True)
+        bar.addWidget(self.filter_edit, 1)
+        self.status_combo = QComboBox()
+        self.status_combo.addItems(STATUS_FILTERS)
+        bar.addWidget(self.status_combo)
+        self.count_label = QLabel()
+        bar.addWidget(self.count_label)
+        self.clear_btn = QPushButton("清空队列")
+        self.clear_btn.clicked.connect(self.clear)
+        bar.addWidget(self.clear_btn)
+        layout.addLayout(bar)
+
+        self.view = QueueView()
+        self.view.setModel(self.model)
+        self.view.files_dropped.connect(self.files_dropped)
+        self.view.selectionModel().currentRowChanged.connect(self.on_current_changed)
+        layout.addWidget(self.view)
+
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_edit.textChanged.connect(self.filter_timer.start)
+        self.status_combo.currentIndexChanged.connect(self.apply_filter)
+
+        # 压缩过程中每个文件都会更新计数，合并到下一次事件循环再刷新
+        self.count_timer = QTimer(self)
+        self.count_timer.setSingleShot(True)
+        self.count_timer.setInterval(100)
+        self.count_timer.timeout.connect(self.update_count)
+        self.model.counts_changed.connect(self.count_timer.start)
+        self.update_count()
+
+    def apply_filter(self):
+        status = self.status_combo.currentText()
+        self.model.set_filter(self.filter_edit.text(), "" if status == STATUS_FILTERS[0] else status)
+
+    def update_count(self):
+        total = len(self.model.rows)
+        if not total:
+            self.count_label.setText("拖入图片或文件夹")
+            return
+        failed = self.model.count_status(STATUS_FAILED)
+        pending = self.model.count_status(STATUS_PENDING)
+        text = f"共 {total} 个, 等待 {pending} 个"
+        if failed:
+            text += f", 失败 {failed} 个"
+        self.count_label.setText(text)
+
+    def on_current_changed(self, current, previous):
+        if current.isValid():
+            self.file_selected.emit(self.model.path_at(current.row()))
+
+    def set_files(self, paths):
+        self.model.set_files(paths)
+
+    def clear(self):
+        self.model.clear()
+        self.cleared.emit()
+
+    def set_locked(self, locked):
+        """压缩进行中不允许修改队列"""
+        self.clear_btn.setEnabled(not locked)
+        self.view.setAcceptDrops(not locked)
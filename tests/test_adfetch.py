@@ -0,0 +1,41 @@
+"""广告请求缓存的测试，网络请求用假的响应代替（需要 requests）"""
+import json
+
+import pytest
+
+pytest.importorskip("requests")
+
+from adfetch import CachedFetcher, FetchError, parse_ad_list  # noqa: E402
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self.content = json.dumps(payload).encode("utf-8")
+
+    def raise_for_status(self):
+        pass
+
+
+def test_api_error_does_not_replace_cached_list(tmp_path, monkeypatch):
+    fetcher = CachedFetcher(str(tmp_path))
+    good = {"code": 0, "data": {"dataList": [{"id": 1}]}}
+    responses = [FakeResponse(good), FakeResponse({"code": 500, "msg": "busy"})]
+    monkeypatch.setattr(fetcher.session, "request", lambda *a, **k: responses.pop(0))
+
+    content, cached = fetcher.fetch("http://ad", validate=parse_ad_list)
+    assert not cached and parse_ad_list(content) == [{"id": 1}]
+    content, cached = fetcher.fetch("http://ad", validate=parse_ad_list)
+    assert cached and parse_ad_list(content) == [{"id": 1}]
+    assert parse_ad_list(fetcher.cached("http://ad")) == [{"id": 1}]
+
+
+def test_api_error_without_cache_raises(tmp_path, monkeypatch):
+    fetcher = CachedFetcher(str(tmp_path))
+    monkeypatch.setattr(fetcher.session, "request",
+                        lambda *a, **k: FakeResponse({"code": 500, "msg": "busy"}))
+    with pytest.raises(FetchError):
+        fetcher.fetch("http://ad", validate=parse_ad_list)
+    assert fetcher.cached("http://ad") is None
@@ -0,0 +1,45 @@
+"""PillowBackend 的编码回归测试（需要 Pillow）"""
+import pytest
+
+from imgcomp import compress_file, compress_variants
+
+Image = pytest.importorskip("PIL.Image")
+
+FRAMES = 5
+
+
+@pytest.fixture
+def anim_gif(tmp_path):
+    path = tmp_path / "anim.gif"
+    frames = [Image.new("RGB", (120, 90), (i * 50, 100, 200 - i * 40)) for i in range(FRAMES)]
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=100, loop=0)
+    return path
+
+
+@pytest.mark.parametrize("params", [{"quality": 70}, {"quality": 70, "webp": True},
+                                    {"quality": 70, "auto_format": True}])
+def test_animation_keeps_all_frames(anim_gif, tmp_path, params):
+    output = tmp_path / ("out.webp" if params.get("webp") else "out.gif")
+    result = compress_file(str(anim_gif), str(output), backend="pillow", preflight=False,
+                           min_saving=None, **params)
+    assert result.success, result.message
+    with Image.open(result.output_file) as img:
+        assert img.n_frames == FRAMES
+
+
+def test_animation_variants_refused(anim_gif, tmp_path):
+    results = compress_variants(str(anim_gif), str(tmp_path / "variants"))
+    assert len(results) == 1 and not results[0].success
+
+
+def test_16bit_grayscale_scaled_not_clipped(tmp_path):
+    np = pytest.importorskip("numpy")
+    source = tmp_path / "gray16.png"
+    data = (np.indices((120, 160)).sum(0) * 230).astype(np.uint16)
+    Image.fromarray(data).save(source)
+    result = compress_file(str(source), str(tmp_path / "out.png"), backend="pillow",
+                           preflight=False, min_saving=None, quality=70, min_ssim=0.95)
+    assert result.success, result.message
+    with Image.open(result.output_file) as img:
+        mean = np.asarray(img.convert("L")).mean() / 255
+    assert abs(mean - data.mean() / 65535) < 0.02
@@ -0,0 +1,15 @@
+"""ResultCache 的回归测试"""
+import os
+
+from imgcomp import ResultCache
+
+
+def test_scan_ignores_files_outside_shard_layout(tmp_path):
+    key = "ab" + "0" * 62
+    os.makedirs(tmp_path / "ab")
+    (tmp_path / "ab" / key).write_bytes(b"x" * 10)
+    os.makedirs(tmp_path / "http")
+    (tmp_path / "http" / "cd12.body").write_bytes(b"y" * 1000)
+    (tmp_path / "stray.bin").write_bytes(b"z" * 1000)
+    cache = ResultCache(str(tmp_path))
+    assert cache.total_bytes == 10
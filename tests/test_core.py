@@ -0,0 +1,61 @@
+"""compress_file、compress_files 的回归测试（需要 Pillow）"""
+import os
+
+import pytest
+
+from imgcomp import (Backend, EncodeStats, compress_file, compress_files, compress_files_ordered,
+                     default_output_name)
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _photo_pair(folder):
+    """同名的 photo.jpg 与 photo.png，自动格式下 PNG 会改为 JPEG 输出"""
+    np = pytest.importorskip("numpy")
+    noise = np.random.default_rng(0).integers(0, 60, (120, 160, 3), dtype=np.uint8)
+    pixels = Image.fromarray(noise + np.linspace(0, 180, 160, dtype=np.uint8)[None, :, None])
+    pixels.save(folder / "photo.jpg", quality=95)
+    pixels.save(folder / "photo.png")
+    out = folder / "out"
+    out.mkdir()
+    return [(str(folder / name), str(out / default_output_name(name)))
+            for name in ("photo.jpg", "photo.png")]
+
+
+@pytest.mark.parametrize("runner", [compress_files, compress_files_ordered])
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("reverse", [False, True])
+def test_auto_format_rename_does_not_overwrite(tmp_path, runner, lazy, reverse):
+    jobs = _photo_pair(tmp_path)[::-1 if reverse else 1]
+    results = list(runner(iter(jobs) if lazy else jobs, workers=1, backend="pillow",
+                          auto_format=True, dedup=False, preflight=False, min_saving=None))
+    assert all(result.success for result in results), [r.message for r in results]
+    outputs = {result.output_file for result in results}
+    assert len(outputs) == 2
+    for result in results:
+        with Image.open(result.output_file) as img:
+            assert img.format == result.output_format == "JPEG"
+    assert sum(bool(result.collision) for result in results) == 1
+
+
+class InPlaceBackend(Backend):
+    """像 imagecomp.exe --force 一样直接覆盖写入输出路径"""
+    name = "inplace"
+
+    def compress(self, input_file, output_file, *args, **kwargs):
+        with open(input_file, "rb") as src, open(output_file, "wb") as dst:
+            dst.write(src.read()[:100])
+        return EncodeStats()
+
+
+def test_in_place_backend_does_not_rewrite_linked_outputs(tmp_path):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"\xff\xd8" + b"a" * 500)
+    first, second = tmp_path / "a_out.jpg", tmp_path / "b_out.jpg"
+    first.write_bytes(b"old output")
+    os.link(first, second)  # 上一次去重留下的硬链接
+    result = compress_file(str(source), str(first), backend=InPlaceBackend(), preflight=False,
+                           min_saving=None)
+    assert result.success, result.message
+    assert second.read_bytes() == b"old output"
+    assert first.read_bytes() == source.read_bytes()[:100]
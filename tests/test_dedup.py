@@ -0,0 +1,46 @@
+"""批量去重的测试"""
+import os
+
+from imgcomp.dedup import group_duplicates, link_or_copy
+
+
+def _jobs(tmp_path, contents):
+    jobs = []
+    for name, data in contents.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        jobs.append((str(path), str(tmp_path / f"out_{name}")))
+    return jobs
+
+
+def test_same_size_different_bytes_not_merged(tmp_path):
+    jobs = _jobs(tmp_path, {"a.jpg": b"a" * 1000, "b.jpg": b"b" * 1000, "c.jpg": b"c" * 999})
+    representatives, duplicates = group_duplicates(jobs)
+    assert representatives == jobs and duplicates == {}
+
+
+def test_identical_inputs_grouped_in_order(tmp_path):
+    jobs = _jobs(tmp_path, {"a.jpg": b"x" * 1000, "b.jpg": b"y" * 1000, "c.jpg": b"x" * 1000,
+                            "d.jpg": b"x" * 1000})
+    representatives, duplicates = group_duplicates(jobs)
+    assert representatives == jobs[:2]
+    assert duplicates == {jobs[0]: [jobs[2], jobs[3]]}
+
+
+def test_unreadable_input_kept_as_representative(tmp_path):
+    jobs = _jobs(tmp_path, {"a.jpg": b"x" * 10, "b.jpg": b"x" * 10})
+    missing = (str(tmp_path / "missing.jpg"), str(tmp_path / "out_missing.jpg"))
+    representatives, duplicates = group_duplicates(jobs + [missing])
+    assert representatives == [jobs[0], missing]
+    assert duplicates == {jobs[0]: [jobs[1]]}
+
+
+def test_link_or_copy_replaces_output(tmp_path):
+    source = tmp_path / "result.jpg"
+    source.write_bytes(b"new")
+    output = tmp_path / "sub" / "out.jpg"
+    link_or_copy(str(source), str(output))
+    assert output.read_bytes() == b"new"
+    link_or_copy(str(source), str(source))  # 同一文件时不做任何事
+    assert source.read_bytes() == b"new"
+    assert [name for name in os.listdir(tmp_path / "sub") if name.endswith(".tmp")] == []
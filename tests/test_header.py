@@ -0,0 +1,83 @@
+"""文件头解析与 Pillow 的结果对照（需要 Pillow）"""
+import io
+import struct
+
+import pytest
+
+from imgcomp.header import parse_header
+
+Image = pytest.importorskip("PIL.Image")
+
+SIZE = (37, 21)
+
+
+def _save(mode, fmt, **kwargs):
+    img = Image.new(mode, SIZE)
+    if mode == "P":  # 用满 256 色，否则保存时调色板会被缩减为更少的位数
+        img.putdata([i % 256 for i in range(SIZE[0] * SIZE[1])])
+        img.putpalette(list(range(256)) * 3)
+    buf = io.BytesIO()
+    img.save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _gif_without_color_table():
+    """低 3 位不为 0 但没有全局颜色表的 GIF，图像只带局部颜色表"""
+    width, height = SIZE
+    data = b"GIF89a" + struct.pack("<HHBBB", width, height, 0x07, 0, 0)
+    data += b"," + struct.pack("<HHHHB", 0, 0, width, height, 0x80) + b"\0\0\0\xff\xff\xff"
+    data += b"\x02\x02\x44\x01\x00;"
+    return data
+
+
+def _bmp_v5_with_alpha():
+    width, height = SIZE
+    pixels = b"\x10\x20\x30\x80" * width * height
+    info = struct.pack("<IiiHHIIiiII", 124, width, height, 1, 32, 3, len(pixels), 2835, 2835, 0, 0)
+    info += struct.pack("<IIII", 0xFF0000, 0xFF00, 0xFF, 0xFF000000) + b"BGRs" + bytes(48)
+    info += struct.pack("<IIII", 4, 0, 0, 0)
+    offset = 14 + len(info)
+    return b"BM" + struct.pack("<IHHI", offset + len(pixels), 0, 0, offset) + info + pixels
+
+
+# (名称, 文件内容, 期望的 color_type, 期望的 bit_depth)；color_type 为 None 时使用 Pillow 的 mode
+CASES = [
+    ("jpeg-rgb", lambda: _save("RGB", "JPEG", quality=75), None, 8),
+    ("jpeg-l", lambda: _save("L", "JPEG"), None, 8),
+    ("jpeg-cmyk", lambda: _save("CMYK", "JPEG"), None, 8),
+    ("png-rgb", lambda: _save("RGB", "PNG"), None, 8),
+    ("png-rgba", lambda: _save("RGBA", "PNG"), None, 8),
+    ("png-la", lambda: _save("LA", "PNG"), None, 8),
+    ("png-p", lambda: _save("P", "PNG"), None, 8),
+    ("png-p-trns", lambda: _save("P", "PNG", transparency=0), None, 8),
+    ("png-16", lambda: _save("I;16", "PNG"), "L", 16),
+    ("gif", lambda: _save("P", "GIF"), None, 8),
+    ("gif-no-table", _gif_without_color_table, "P", 0),
+    ("bmp-rgb", lambda: _save("RGB", "BMP"), None, 8),
+    ("bmp-p", lambda: _save("P", "BMP"), None, 8),
+    ("bmp-rgba-bi-rgb", lambda: _save("RGBA", "BMP"), None, 8),
+    ("bmp-v5-alpha", _bmp_v5_with_alpha, None, 8),
+    ("webp-lossy", lambda: _save("RGB", "WEBP", quality=80), None, 8),
+    ("webp-lossless-rgba", lambda: _save("RGBA", "WEBP", lossless=True), None, 8),
+    ("webp-lossy-rgba", lambda: _save("RGBA", "WEBP", quality=80), None, 8),
+]
+
+
+@pytest.mark.parametrize("build, color_type, bit_depth",
+                         [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_matches_pillow(build, color_type, bit_depth):
+    data = build()
+    header = parse_header(data)
+    with Image.open(io.BytesIO(data)) as img:
+        assert header.format == img.format
+        assert (header.width, header.height) == img.size
+        assert header.color_type == (color_type or img.mode)
+        assert header.has_alpha == (img.mode in ("RGBA", "LA", "PA")
+                                    or "transparency" in img.info)
+    assert header.bit_depth == bit_depth
+
+
+def test_jpeg_quality_estimate():
+    for quality in (30, 75, 95):
+        estimate = parse_header(_save("RGB", "JPEG", quality=quality)).jpeg_quality
+        assert abs(estimate - quality) <= 1
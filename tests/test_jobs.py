@@ -0,0 +1,57 @@
+"""任务日志的测试（需要 Pillow）"""
+import pytest
+
+from imgcomp import JobQueue, run_queue
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_skipped_jobs_report_results(tmp_path):
+    source = tmp_path / "a.png"
+    Image.linear_gradient("L").save(source)
+    jobs = [(str(source), str(tmp_path / "a_out.png"))]
+    params = {"quality": 60, "backend": "pillow"}
+    journal = str(tmp_path / "jobs.jsonl")
+
+    queue = JobQueue(journal)
+    queue.add(jobs, params)
+    finished = [result for _, result in run_queue(queue, workers=1, **params)]
+    queue.close()
+    assert finished[0].success
+
+    queue = JobQueue(journal)
+    assert queue.add(jobs, params) == 1
+    skipped = [job.result() for job in queue.completed(jobs)]
+    queue.close()
+    assert len(skipped) == 1 and skipped[0].resumed and skipped[0].success
+    assert skipped[0].compressed_size == finished[0].compressed_size
+    assert "上次已完成" in skipped[0].summary()
+
+
+def test_second_run_only_processes_its_own_jobs(tmp_path):
+    for name in ("a", "b", "c"):
+        Image.linear_gradient("L").save(tmp_path / f"{name}.png")
+
+    def job(name):
+        return str(tmp_path / f"{name}.png"), str(tmp_path / f"{name}_out.png")
+
+    journal = str(tmp_path / "jobs.jsonl")
+    params = {"quality": 60, "backend": "pillow"}
+
+    queue = JobQueue(journal)
+    queue.add([job("a"), job("b")], params)  # 中断：a、b 一直没有执行
+    queue.close()
+
+    queue = JobQueue(journal)
+    other = dict(params, quality=90)
+    queue.add([job("c")], other)
+    processed = [result.input_file for _, result in run_queue(queue, workers=1, **other)]
+    assert queue.next_wakeup() is None
+    queue.close()
+    assert processed == [job("c")[0]]
+
+    queue = JobQueue(journal)
+    queue.add([job("a"), job("b")], params)  # 原来的批次再次运行时继续
+    processed = sorted(result.input_file for _, result in run_queue(queue, workers=1, **params))
+    queue.close()
+    assert processed == [job("a")[0], job("b")[0]]
@@ -0,0 +1,46 @@
+"""预检与保留原图的测试"""
+import os
+import shutil
+import threading
+
+import pytest
+
+from imgcomp.preflight import copy_original
+
+
+def test_concurrent_copies_to_one_output(tmp_path):
+    sources = []
+    for i in range(8):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(bytes([i]) * 1000000)
+        sources.append(path)
+    output = tmp_path / "out.jpg"
+    errors = []
+
+    def copy(source):
+        try:
+            copy_original(str(source), str(output))
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=copy, args=(source,)) for source in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert output.read_bytes() in [source.read_bytes() for source in sources]
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_failed_copy_leaves_no_temp_file(tmp_path, monkeypatch):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"a" * 100)
+    output = tmp_path / "out.jpg"
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(shutil, "copymode", fail)
+    with pytest.raises(OSError):
+        copy_original(str(source), str(output))
+    assert sorted(os.listdir(tmp_path)) == ["a.jpg"]
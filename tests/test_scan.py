@@ -0,0 +1,76 @@
+"""递归扫描的测试"""
+import os
+
+import pytest
+
+from imgcomp.scan import ScanFeed, iter_images, parse_patterns
+
+
+def _touch(path, size=10):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def _scan(root, **kwargs):
+    return sorted(os.path.relpath(path, root).replace(os.sep, "/")
+                  for path, _, _ in iter_images([str(root)], **kwargs))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name, size in [("a.jpg", 10), ("b.PNG", 2000), ("notes.txt", 10), ("raw/c.jpg", 10),
+                       ("raw/deep/d.webp", 500), ("thumbs/e.jpg", 10), (".hidden/f.jpg", 10),
+                       (".g.jpg", 10)]:
+        _touch(tmp_path / name, size)
+    return tmp_path
+
+
+def test_recursive_skips_hidden_and_non_images(tree):
+    assert _scan(tree) == ["a.jpg", "b.PNG", "raw/c.jpg", "raw/deep/d.webp", "thumbs/e.jpg"]
+    assert _scan(tree, recursive=False) == ["a.jpg", "b.PNG"]
+    assert ".hidden/f.jpg" in _scan(tree, hidden=True)
+
+
+def test_include_exclude_and_size_filters(tree):
+    assert _scan(tree, include=parse_patterns("*.jpg")) == ["a.jpg", "raw/c.jpg", "thumbs/e.jpg"]
+    assert _scan(tree, exclude=parse_patterns("thumbs; raw/deep/*")) == ["a.jpg", "b.PNG",
+                                                                          "raw/c.jpg"]
+    assert _scan(tree, include=["raw/*"]) == ["raw/c.jpg", "raw/deep/d.webp"]  # * 也匹配 /
+    assert _scan(tree, include=["RAW/*.JPG"]) == ["raw/c.jpg"]
+    assert _scan(tree, min_size=100, max_size=1000) == ["raw/deep/d.webp"]
+    assert _scan(tree, exclude_dirs=[str(tree / "raw")]) == ["a.jpg", "b.PNG", "thumbs/e.jpg"]
+
+
+def test_parse_patterns():
+    assert parse_patterns("*.jpg； raw/*，*.png") == ["*.jpg", "raw/*", "*.png"]
+    assert parse_patterns("") == []
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符号链接")
+def test_symlink_loops_not_followed(tree):
+    try:
+        os.symlink(tree, tree / "raw" / "loop", target_is_directory=True)
+        os.symlink(tree / "raw", tree / "thumbs" / "raw_again", target_is_directory=True)
+    except OSError:
+        pytest.skip("无法创建符号链接")
+    found = _scan(tree)
+    assert len(found) == len(set(os.path.realpath(tree / f) for f in found)) == 5
+    assert _scan(tree, follow_symlinks=False) == ["a.jpg", "b.PNG", "raw/c.jpg",
+                                                  "raw/deep/d.webp", "thumbs/e.jpg"]
+
+
+def test_many_files_streamed_in_chunks(tmp_path):
+    for i in range(600):  # 超过 CHUNK，分批产出
+        _touch(tmp_path / "big" / f"{i}.jpg")
+    assert len(_scan(tmp_path, workers=2)) == 600
+
+
+def test_scan_feed_follow():
+    feed = ScanFeed()
+    feed.put([1, 2])
+    reader = feed.follow()
+    assert [next(reader), next(reader)] == [1, 2]
+    feed.put([3])
+    feed.close()
+    assert list(reader) == [3]
+    assert list(feed.follow(start=1)) == [2, 3]
@@ -0,0 +1,28 @@
+"""质量搜索的编码次数测试，不需要 Pillow"""
+from imgcomp.search import MIN_QUALITY, QualitySearch
+
+
+def _counting_encoder(size_at):
+    calls = []
+
+    def encode(quality):
+        calls.append(quality)
+        return bytes(size_at(quality))
+    return encode, calls
+
+
+def test_each_quality_encoded_once():
+    encode, calls = _counting_encoder(lambda q: 1000 + q * 100)
+    search = QualitySearch(encode, 5000)
+    quality, data = search.solve()
+    assert len(calls) == len(set(calls)) == search.attempts
+    assert len(data) <= 5000 and quality == 40
+
+
+def test_unreachable_target_reuses_lowest_encode():
+    encode, calls = _counting_encoder(lambda q: 10000 + q * 100)
+    search = QualitySearch(encode, 5000)
+    quality, data = search.solve()
+    assert quality == MIN_QUALITY and len(data) == 10100
+    assert calls.count(MIN_QUALITY) == 1
+    assert len(calls) == search.attempts
@@ -0,0 +1,62 @@
+"""分片模式的测试：多个本地 worker 进程共用一个临时目录（需要 Pillow）"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from imgcomp import ShardWorker, shard_status, shard_submit
+from imgcomp.shard import DONE_DIR, LEASE_DIR, job_id
+
+Image = pytest.importorskip("PIL.Image")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARAMS = {"quality": 60, "backend": "pillow", "preflight": False, "min_saving": None}
+
+
+def _submit(tmp_path, count):
+    source = tmp_path / "in"
+    source.mkdir()
+    jobs = []
+    for i in range(count):
+        path = source / f"{i}.png"
+        Image.linear_gradient("L").rotate(i * 7).save(path)
+        jobs.append((str(path), str(tmp_path / "out" / f"{i}.png")))
+    workdir = str(tmp_path / "work")
+    shard_submit(workdir, jobs, PARAMS)
+    return workdir, jobs
+
+
+def test_worker_processes_share_one_workdir(tmp_path):
+    workdir, jobs = _submit(tmp_path, 30)
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    workers = [subprocess.Popen([sys.executable, "-m", "imgcomp", "--shard-worker", workdir,
+                                 "--json", "-j", "2"], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, env=env, cwd=ROOT, text=True)
+               for _ in range(3)]
+    processed = []
+    for worker in workers:
+        out, _ = worker.communicate(timeout=120)
+        assert worker.returncode == 0
+        processed += [json.loads(line)["input_file"] for line in out.splitlines() if line]
+
+    assert sorted(processed) == sorted(input_file for input_file, _ in jobs)
+    assert shard_status(workdir) == {"total": 30, "done": 30, "failed": 0, "leased": 0}
+    assert os.listdir(os.path.join(workdir, LEASE_DIR)) == []
+    assert all(os.path.exists(output_file) for _, output_file in jobs)
+
+
+def test_stale_lease_is_reclaimed(tmp_path):
+    workdir, jobs = _submit(tmp_path, 3)
+    jid = job_id(*jobs[0])
+    lease = os.path.join(workdir, LEASE_DIR, jid)
+    with open(lease, "w", encoding="utf-8") as f:
+        f.write("crashed-worker")
+    old = os.stat(lease).st_mtime - 10
+    os.utime(lease, (old, old))
+
+    results = list(ShardWorker(workdir, workers=2, lease_ttl=5).run())
+    assert sorted(result.input_file for result in results) == sorted(i for i, _ in jobs)
+    assert os.path.exists(os.path.join(workdir, DONE_DIR, jid + ".json"))
+    assert os.listdir(os.path.join(workdir, LEASE_DIR)) == []
@@ -0,0 +1,53 @@
+"""SSIM 与视觉质量搜索的测试（需要 Pillow 和 NumPy）"""
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from imgcomp.search import VisualSearch  # noqa: E402
+from imgcomp.ssim import SSIMReference  # noqa: E402
+
+
+def _photo(size=(240, 160)):
+    rng = np.random.default_rng(2)
+    base = np.linspace(0, 200, size[0])[None, :, None] + rng.normal(0, 25, (size[1], size[0], 3))
+    return Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+
+
+def _encode(img, fmt, **kwargs):
+    buf = io.BytesIO()
+    img.save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+def test_identical_image_scores_one():
+    img = _photo()
+    assert SSIMReference(img).score(_encode(img, "PNG")) == pytest.approx(1.0)
+
+
+def test_lower_quality_scores_lower():
+    img = _photo()
+    reference = SSIMReference(img)
+    high = reference.score(_encode(img, "JPEG", quality=95))
+    low = reference.score(_encode(img, "JPEG", quality=10))
+    assert 0 < low < high < 1
+
+
+def test_size_mismatch_rejected():
+    with pytest.raises(ValueError):
+        SSIMReference(_photo()).score(_encode(_photo((120, 80)), "PNG"))
+
+
+@pytest.mark.parametrize("min_ssim", [0.8, 0.9, 0.95])
+def test_visual_search_meets_min_ssim(min_ssim):
+    img = _photo()
+    reference = SSIMReference(img)
+    search = VisualSearch(lambda q: _encode(img, "JPEG", quality=q), reference.score, min_ssim)
+    quality, data, score = search.solve()
+    assert score >= min_ssim and reference.score(data) == pytest.approx(score)
+    if quality > 1:  # 最低的满足下限的质量：低一级就达不到
+        below = reference.score(_encode(img, "JPEG", quality=quality - 1))
+        assert below < min_ssim
+    assert search.attempts <= 8
@@ -0,0 +1,52 @@
+"""多尺寸版本的测试（需要 Pillow）"""
+import pytest
+
+from imgcomp import DEFAULT_NAME_TEMPLATE, check_template, compress_variants, read_header
+
+Image = pytest.importorskip("PIL.Image")
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / "photo.png"
+    noise = np.random.default_rng(1).integers(0, 255, (300, 500, 3), dtype=np.uint8)
+    Image.fromarray(noise).save(path)
+    return path
+
+
+def test_decodes_source_once(photo, tmp_path, monkeypatch):
+    opened = []
+    original_open = Image.open
+
+    def counting_open(*args, **kwargs):
+        opened.append(args)
+        return original_open(*args, **kwargs)
+    monkeypatch.setattr(Image, "open", counting_open)
+    results = compress_variants(str(photo), str(tmp_path / "out"), widths=(100, 200, None))
+    assert all(result.success for result in results), [r.message for r in results]
+    assert len(results) == 3 * 2
+    assert len(opened) == 1
+
+
+def test_skips_widths_larger_than_source(photo, tmp_path):
+    results = compress_variants(str(photo), str(tmp_path / "out"), widths=(320, 640, 1280, None),
+                                formats=("JPEG",))
+    assert [Image.open(result.output_file).width for result in results] == [320, 500]
+    assert [result.output_file.rsplit("_", 1)[1] for result in results] == ["320w.jpg", "full.jpg"]
+
+
+def test_parallel_formats_use_their_own_settings(photo, tmp_path):
+    results = compress_variants(str(photo), str(tmp_path / "out"), widths=(200, None),
+                                formats=("JPEG", "WEBP", "PNG"), quality=40, webp_quality=90)
+    jpegs = [result.output_file for result in results if result.output_file.endswith(".jpg")]
+    assert len(jpegs) == 2
+    assert all(abs(read_header(path).jpeg_quality - 40) <= 1 for path in jpegs)
+
+
+def test_template_collisions_rejected():
+    assert check_template(DEFAULT_NAME_TEMPLATE) is None
+    assert check_template("{stem}_{width}.{format}") is None
+    assert check_template("{stem}.{ext}") is not None  # 各宽度互相覆盖
+    assert check_template("{stem}_{label}.jpg") is not None  # 各格式互相覆盖
+    assert check_template("../{stem}_{label}.{ext}") is not None
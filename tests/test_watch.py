@@ -0,0 +1,67 @@
+"""监控模式的测试（需要 Pillow）"""
+import os
+
+import pytest
+
+from imgcomp.watch import FolderWatcher
+
+Image = pytest.importorskip("PIL.Image")
+
+PARAMS = {"quality": 60, "backend": "pillow", "preflight": False, "min_saving": None}
+
+
+def _image(path, angle=0):
+    Image.linear_gradient("L").rotate(angle).save(path)
+
+
+def _watcher(tmp_path, params=PARAMS, settle=0.0):
+    return FolderWatcher([str(tmp_path / "spool")], str(tmp_path / "out"), params, settle=settle,
+                         workers=1)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    (tmp_path / "spool").mkdir()
+    return tmp_path / "spool"
+
+
+def test_waits_until_file_settles(tmp_path, spool):
+    _image(spool / "a.png")
+    watcher = _watcher(tmp_path, settle=10.0)
+    assert watcher.ready_jobs(now=0.0) == []
+    assert watcher.ready_jobs(now=5.0) == []
+    _image(spool / "a.png", angle=30)  # 还在写入：重新开始计时
+    os.utime(spool / "a.png", ns=(1, 10 ** 9))
+    assert watcher.ready_jobs(now=12.0) == []
+    assert watcher.ready_jobs(now=20.0) == []
+    assert [job[0] for job in watcher.ready_jobs(now=22.0)] == [str(spool / "a.png")]
+
+
+def _poll(watcher):
+    watcher.ready_jobs()  # settle 为 0：第一次看到，下一轮处理
+    return [result.input_file for result in watcher.poll_once()]
+
+
+def test_modified_file_is_recompressed(tmp_path, spool):
+    path = spool / "a.png"
+    _image(path)
+    watcher = _watcher(tmp_path)
+    assert _poll(watcher) == [str(path)]
+    assert _poll(watcher) == []
+    _image(path, angle=45)
+    os.utime(path, ns=(1, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert _poll(watcher) == [str(path)]
+
+
+def test_state_pruned_and_keyed_by_params(tmp_path, spool):
+    for name in ("a", "b"):
+        _image(spool / f"{name}.png")
+    watcher = _watcher(tmp_path)
+    assert len(_poll(watcher)) == 2
+    os.remove(spool / "a.png")
+    _poll(watcher)
+    assert list(watcher.state) == [str(spool / "b.png")]
+    assert list(_watcher(tmp_path).load_state()) == [str(spool / "b.png")]
+
+    restarted = _watcher(tmp_path, dict(PARAMS, quality=90))  # 参数改变后重新压缩
+    assert _poll(restarted) == [str(spool / "b.png")]